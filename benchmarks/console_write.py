@@ -0,0 +1,62 @@
+"""Benchmark for how fast ConsolePrEdit can add ``print`` output to its document.
+
+Each line is written the way ``print`` does it, the text then a separate newline.
+This compares adding every write to the document immediately(``writeInterval = 0``)
+against buffering the writes and flushing them once per frame.
+
+Usage::
+
+    python benchmarks/console_write.py [line_count]
+"""
+from __future__ import absolute_import, print_function
+
+import sys
+import time
+
+from Qt.QtWidgets import QApplication
+
+from preditor.gui.console import ConsolePrEdit
+from preditor.stream import STDOUT
+
+
+def run(console, line_count, interval):
+    console.clear()
+    console.writeInterval = interval
+    app = QApplication.instance()
+    start = time.time()
+    last_frame = start
+    for i in range(line_count):
+        console.write(u'Line number {}'.format(i), STDOUT)
+        console.write(u'\n', STDOUT)
+        # Give the event loop a chance to run about once per frame like it would
+        # when a script is printing while the gui is processing events.
+        now = time.time()
+        if now - last_frame > 0.016:
+            app.processEvents()
+            last_frame = now
+    console.flush()
+    app.processEvents()
+    return time.time() - start
+
+
+def main(line_count=20000):
+    app = QApplication.instance() or QApplication(sys.argv)
+    console = ConsolePrEdit(None)
+    console.resize(800, 600)
+    console.show()
+    app.processEvents()
+
+    results = []
+    for name, interval in (('per write', 0), ('per frame', 16)):
+        duration = run(console, line_count, interval)
+        results.append((name, line_count / duration))
+
+    for name, rate in results:
+        sys.__stdout__.write('{: <10} {: >12,.0f} lines/sec\n'.format(name, rate))
+    sys.__stdout__.write(
+        'speedup    {: >12.1f}x\n'.format(results[1][1] / results[0][1])
+    )
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,104 @@
+"""Benchmark for how long the console takes to rehighlight its document.
+
+Compares `CodeHighlighter` against the previous implementation that built a new
+``QRegExp`` and ``QTextCharFormat`` for every rule, on every block.
+
+Usage::
+
+    python benchmarks/highlighter.py [line_count]
+"""
+from __future__ import absolute_import, print_function
+
+import re
+import sys
+import time
+
+from Qt.QtCore import QRegExp
+from Qt.QtWidgets import QApplication, QTextEdit
+
+from preditor.gui.codehighlighter import CodeHighlighter
+
+
+class RegExpHighlighter(CodeHighlighter):
+    """The previous implementation of `CodeHighlighter.highlightBlock`."""
+
+    def highlightBlock(self, text):
+        if not self.isConsoleMode() or str(text).startswith('>>>'):
+            format = self.resultFormat()
+            parent = self.parent()
+            if parent and hasattr(parent, 'outputPrompt'):
+                self.highlightText(
+                    text,
+                    QRegExp('%s[^\\n]*' % re.escape(parent.outputPrompt())),
+                    format,
+                )
+            format = self.keywordFormat()
+            for kwd in self._keywords:
+                self.highlightText(text, QRegExp(r'\b%s\b' % kwd), format)
+            format = self.stringFormat()
+            for string in self._strings:
+                self.highlightText(
+                    text,
+                    QRegExp('%s[^%s]*' % (string, string)),
+                    format,
+                    includeLast=True,
+                )
+            format = self.commentFormat()
+            for comment in self._comments:
+                self.highlightText(text, QRegExp(comment), format)
+
+    def highlightText(self, text, expr, format, includeLast=False):
+        pos = expr.indexIn(text, 0)
+        while pos != -1:
+            pos = expr.pos(0)
+            length = len(expr.cap(0))
+            if includeLast:
+                length += 1
+            self.setFormat(pos, length, format)
+            matched = expr.matchedLength()
+            if includeLast:
+                matched += 1
+            pos = expr.indexIn(text, pos + matched)
+
+
+class Console(QTextEdit):
+    """Provides the outputPrompt the highlighter expects from a ConsolePrEdit."""
+
+    def outputPrompt(self):
+        return '#Result: '
+
+
+def run(cls, text):
+    edit = Console()
+    edit.setPlainText(text)
+    highlighter = cls(edit)
+    highlighter.setLanguage('Python')
+    start = time.time()
+    highlighter.rehighlight()
+    return time.time() - start
+
+
+def main(line_count=100000):
+    app = QApplication.instance() or QApplication(sys.argv)  # noqa: F841
+    lines = (
+        ">>> for i in range(10): print('value', i)  # loop",
+        'Traceback (most recent call last):',
+        '  File "<ConsolePrEdit>", line 1, in <module>',
+        "#Result: {'key': True, 'other': False}",
+        'plain output without anything to highlight',
+    )
+    text = '\n'.join(lines[i % len(lines)] for i in range(line_count))
+
+    results = []
+    for name, cls in (('QRegExp', RegExpHighlighter), ('compiled', CodeHighlighter)):
+        results.append((name, run(cls, text)))
+
+    for name, duration in results:
+        sys.__stdout__.write('{: <10} {: >8.2f} sec\n'.format(name, duration))
+    sys.__stdout__.write(
+        'speedup    {: >8.1f}x\n'.format(results[0][1] / results[1][1])
+    )
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
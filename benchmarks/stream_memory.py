@@ -0,0 +1,60 @@
+"""Benchmark for the memory used to store captured writes.
+
+Compares storing the same writes in a ``Manager``, which keeps a tuple and str
+object per write, against a ``CompactManager`` which stores them in a few flat
+arrays. Requires python 3 for ``tracemalloc``.
+
+Usage::
+
+    python benchmarks/stream_memory.py [record_count]
+"""
+from __future__ import absolute_import, print_function
+
+import sys
+import time
+import tracemalloc
+
+from preditor.stream import STDERR, STDOUT, CompactManager, Manager
+
+
+def measure(manager, record_count):
+    tracemalloc.start()
+    start = time.time()
+    for i in range(record_count):
+        manager.write(u'Line number {}\n'.format(i), STDERR if i % 10 else STDOUT)
+    duration = time.time() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Make sure everything was stored
+    assert len(manager) == record_count
+    return current, duration
+
+
+def main(record_count=1000000):
+    results = []
+    for name, cls, kwargs in (
+        ('Manager', Manager, {}),
+        ('Compact', CompactManager, {}),
+        ('Compact+ts', CompactManager, {'timestamps': True}),
+    ):
+        manager = cls(maxlen=None, **kwargs)
+        results.append((name,) + measure(manager, record_count))
+        del manager
+
+    fmt = '{: <12} {: >8.1f} MB {: >6.1f} bytes/record {: >10,.0f} writes/sec\n'
+    for name, memory, duration in results:
+        sys.stdout.write(
+            fmt.format(
+                name,
+                memory / 1024.0 / 1024.0,
+                memory / float(record_count),
+                record_count / duration,
+            )
+        )
+    sys.stdout.write(
+        'reduction    {: >8.1f}x\n'.format(results[0][1] / float(results[1][1]))
+    )
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -3,14 +3,26 @@ from __future__ import absolute_import
 import json
 import os
 import re
+from bisect import bisect_left
 
-from Qt.QtCore import QRegExp
 from Qt.QtGui import QColor, QSyntaxHighlighter, QTextCharFormat
 
 from .. import resourcePath
 
+# Matches characters that QString stores as two code units
+_WIDE_CHARS = re.compile(u'[^\u0000-\uffff]')
+
 
 class CodeHighlighter(QSyntaxHighlighter):
+    """Highlights text using the keywords, strings and comments defined by a
+    language's json definition.
+
+    All of the rules are combined into a single regular expression that is
+    compiled by `setLanguage`, so each block is highlighted in a single pass. When
+    rules overlap the first match wins, for example a ``#`` inside a string is not
+    treated as a comment.
+    """
+
     def __init__(self, widget):
         super(CodeHighlighter, self).__init__(widget)
 
@@ -18,7 +30,10 @@ class CodeHighlighter(QSyntaxHighlighter):
         self._keywords = []
         self._strings = []
         self._comments = []
+        self._pattern = None
         self._consoleMode = False
+        # The formats used for each group of _pattern, see `formats`
+        self._formats = None
         # color storage
         self._commentColor = QColor(0, 206, 52)
         self._keywordColor = QColor(17, 154, 255)
@@ -45,6 +60,7 @@ class CodeHighlighter(QSyntaxHighlighter):
         if parent and hasattr(parent, 'setCommentColor'):
             parent.setCommentColor(color)
         self._commentColor = color
+        self._formats = None
 
     def commentFormat(self):
         """returns the comments QTextCharFormat for this highlighter"""
@@ -54,6 +70,54 @@ class CodeHighlighter(QSyntaxHighlighter):
 
         return format
 
+    def compilePattern(self):
+        """Combine all of the rules into the pattern used by `highlightBlock`."""
+        rules = []
+        parent = self.parent()
+        if parent and hasattr(parent, 'outputPrompt'):
+            rules.append(('result', '%s[^\\n]*' % re.escape(parent.outputPrompt())))
+        if self._comments:
+            rules.append(('comment', '|'.join(self._comments)))
+        if self._strings:
+            rules.append(
+                (
+                    'string',
+                    '|'.join(
+                        '{0}[^{0}]*{0}?'.format(re.escape(string))
+                        for string in self._strings
+                    ),
+                )
+            )
+        if self._keywords:
+            rules.append(('keyword', r'\b(?:%s)\b' % '|'.join(self._keywords)))
+
+        if rules:
+            self._pattern = re.compile(
+                '|'.join('(?P<{}>{})'.format(name, rule) for name, rule in rules)
+            )
+        else:
+            self._pattern = None
+
+    def formats(self):
+        """Returns the QTextCharFormat to use for each group of the pattern.
+
+        The formats are cached, they are rebuilt when a color is set on this
+        highlighter or `rehighlight` is called.
+        """
+        if self._formats is None:
+            self._formats = {
+                'result': self.resultFormat(),
+                'comment': self.commentFormat(),
+                'string': self.stringFormat(),
+                'keyword': self.keywordFormat(),
+            }
+        return self._formats
+
+    def rehighlight(self):
+        # Pick up any colors that were changed on the parent
+        self._formats = None
+        super(CodeHighlighter, self).rehighlight()
+
     def isConsoleMode(self):
         """checks to see if this highlighter is in console mode"""
         return self._consoleMode
@@ -61,66 +125,35 @@ class CodeHighlighter(QSyntaxHighlighter):
     def highlightBlock(self, text):
         """highlights the inputed text block based on the rules of this code
         highlighter"""
-        if not self.isConsoleMode() or str(text).startswith('>>>'):
-            # format the result lines
-            format = self.resultFormat()
-            parent = self.parent()
-            if parent and hasattr(parent, 'outputPrompt'):
-                self.highlightText(
-                    text,
-                    QRegExp('%s[^\\n]*' % re.escape(parent.outputPrompt())),
-                    format,
-                )
-
-            # format the keywords
-            format = self.keywordFormat()
-            for kwd in self._keywords:
-                self.highlightText(text, QRegExp(r'\b%s\b' % kwd), format)
-
-            # format the strings
-            format = self.stringFormat()
-            for string in self._strings:
-                self.highlightText(
-                    text,
-                    QRegExp('%s[^%s]*' % (string, string)),
-                    format,
-                    includeLast=True,
-                )
-
-            # format the comments
-            format = self.commentFormat()
-            for comment in self._comments:
-                self.highlightText(text, QRegExp(comment), format)
-
-    def highlightText(self, text, expr, format, offset=0, includeLast=False):
-        """Highlights a text group with an expression and format
+        if self._pattern is None:
+            return
+        if self.isConsoleMode() and not text.startswith('>>>'):
+            return
+
+        self.formatSpans(
+            text,
+            (
+                match.span() + (match.lastgroup,)
+                for match in self._pattern.finditer(text)
+            ),
+        )
+
+    def formatSpans(self, text, spans):
+        """Apply the format of each group to text.
 
         Args:
-            text (str): text to highlight
-            expr (QRegExp): search parameter
-            format (QTextCharFormat): formatting rule
-            offset (int): number of characters to offset by when highlighting
-            includeLast (bool): whether or not the last character should be highlighted
+            text (str): The text of the block being highlighted.
+            spans (iterable): A (start, end, group) tuple for each part of text to
+                format. group is a key of `formats`.
         """
-        pos = expr.indexIn(text, 0)
-
-        # highlight all the given matches to the expression in the text
-        while pos != -1:
-            pos = expr.pos(offset)
-            length = len(expr.cap(offset))
-
-            # use the last character if desired
-            if includeLast:
-                length += 1
-
-            # set the formatting
-            self.setFormat(pos, length, format)
-
-            matched = expr.matchedLength()
-            if includeLast:
-                matched += 1
-
-            pos = expr.indexIn(text, pos + matched)
+        formats = self.formats()
+        wide = [match.start() for match in _WIDE_CHARS.finditer(text)]
+        for start, end, group in spans:
+            if wide:
+                # Convert python indexes to QString indexes
+                start += bisect_left(wide, start)
+                end += bisect_left(wide, end)
+            self.setFormat(start, end - start, formats[group])
 
     def keywordColor(self):
         # pull the color from the parent if possible because this doesn't support
@@ -137,6 +170,7 @@ class CodeHighlighter(QSyntaxHighlighter):
         if parent and hasattr(parent, 'setKeywordColor'):
             parent.setKeywordColor(color)
         self._keywordColor = color
+        self._formats = None
 
     def keywordFormat(self):
         """returns the keywords QTextCharFormat for this highlighter"""
@@ -160,6 +194,7 @@ class CodeHighlighter(QSyntaxHighlighter):
         if parent and hasattr(parent, 'setResultColor'):
             parent.setResultColor(color)
         self._resultColor = color
+        self._formats = None
 
     def resultFormat(self):
         """returns the result QTextCharFormat for this highlighter"""
@@ -182,6 +217,7 @@ class CodeHighlighter(QSyntaxHighlighter):
             self._keywords = data.get('keywords', [])
             self._comments = data.get('comments', [])
             self._strings = data.get('strings', [])
+            self.compilePattern()
 
             return True
         return False
@@ -201,6 +237,7 @@ class CodeHighlighter(QSyntaxHighlighter):
         if parent and hasattr(parent, 'setStringColor'):
             parent.setStringColor(color)
         self._stringColor = color
+        self._formats = None
 
     def stringFormat(self):
         """returns the keywords QTextCharFormat for this highligter"""
@@ -1,32 +1,66 @@
 """ LoggerWindow class is an overloaded python interpreter for preditor"""
 from __future__ import absolute_import, print_function
 
+import cProfile
+import fnmatch
 import os
 import re
 import string
 import subprocess
 import sys
+import threading
 import time
 import traceback
+import zlib
 from builtins import str as text
+from contextlib import contextmanager
 
 import __main__
 from Qt import QtCompat
-from Qt.QtCore import QPoint, Qt
+from Qt.QtCore import QPoint, Qt, QTimer, Signal
 from Qt.QtGui import QColor, QFontMetrics, QTextCharFormat, QTextCursor, QTextDocument
-from Qt.QtWidgets import QAction, QApplication, QTextEdit
+from Qt.QtWidgets import (
+    QAction,
+    QApplication,
+    QDialog,
+    QPlainTextEdit,
+    QTextEdit,
+    QToolButton,
+    QVBoxLayout,
+)
 
 from .. import debug, settings, stream
+from ..kernel import Kernel
 from ..streamhandler_helper import StreamHandlerHelper
-from .codehighlighter import CodeHighlighter
+from ..utils.execution_history import thread_time
+from ..utils.script_thread import ScriptThread
+from ..utils.traceback_links import TracebackLinks
 from .completer import PythonCompleter
+from .console_archive import ConsoleArchive
+from .python_highlighter import PythonHighlighter
 
 
 class ConsolePrEdit(QTextEdit):
     # Ensure the error prompt only shows up once.
     _errorPrompted = False
+    # The prefix of the anchor href used by flood markers
+    floodHref = 'preditor-flood:'
+    # The prefix of the anchor href used to link to lines in the archive
+    archiveHref = 'preditor-archive:'
     # the color error messages are displayed in, can be set by stylesheets
     _errorMessageColor = QColor(Qt.red)
+    # Emitted from any thread when the stream manager queues writes made outside of
+    # the gui thread. It is connected using a queued connection so the writes are
+    # always added to the console from the gui thread.
+    streamWritesQueued = Signal()
+    # Emitted from the script thread when it finishes running code. It is connected
+    # using a queued connection so the results are handled on the gui thread.
+    scriptThreadFinished = Signal()
+    # Emitted when code starts and stops running on the script thread or kernel.
+    scriptRunningChanged = Signal(bool)
+    # Emitted from the kernel's reader thread with a KernelReply when it finishes
+    # running code. It is connected using a queued connection.
+    kernelReplied = Signal(object)
 
     def __init__(self, parent):
         super(ConsolePrEdit, self).__init__(parent)
@@ -48,6 +82,25 @@ class ConsolePrEdit(QTextEdit):
         self._outputPrompt = '#Result: '
         # Method used to update the gui when code is executed
         self.reportExecutionTime = None
+        # Method called with the code, filename, wall and cpu seconds of each
+        # successful execution, used to record the execution history.
+        self.recordExecution = None
+        # If enabled, code run from workboxes is executed on a worker thread so
+        # the gui stays responsive and the code can be stopped.
+        self.executeInThread = False
+        self.scriptThread = None
+        self._scriptFinished = None
+        self._scriptCode = (None, None)
+        # If set, all code is executed in this out of process Kernel.
+        self.kernel = None
+        self._kernelRequests = {}
+        # If set, the profiler enabled while executeString runs code, see
+        # `profiling`.
+        self.profiler = None
+        # If set, an AllocationTracer used to report the memory allocated by
+        # each run of code.
+        self.allocationTracer = None
+        self._allocationSnapshot = None
 
         self._firstShow = True
 
@@ -70,14 +123,76 @@ class ConsolePrEdit(QTextEdit):
         self.stderr = None
         self._errorLog = None
 
+        # Text written to the console is buffered and added to the document at most
+        # once every writeInterval milliseconds(about once per frame). This prevents
+        # updating the document for every small write. Set to zero to add each
+        # write to the document immediately.
+        self.writeInterval = 16
+        self._pendingWrites = []
+        self._writeTimer = QTimer(self)
+        self._writeTimer.setSingleShot(True)
+        self._writeTimer.timeout.connect(self.flush)
+
+        # If a script prints faster than the console can display it, only show
+        # periodic sample lines and a marker with the amount of text suppressed.
+        # The suppressed text is still stored on the stream manager.
+        self.floodGuard = stream.FloodGuard(self.bufferWrite, self.writeFloodMarker)
+        # Output captured from child processes is shown in a color picked for each
+        # process. If set, only the output of child processes whose name matches
+        # this fnmatch pattern is shown.
+        self.processFilter = ''
+        self._floodStart = None
+        # Makes the stream manager store the output written during a flood
+        self._floodCursor = None
+        self._floodTimer = QTimer(self)
+        self._floodTimer.setInterval(250)
+        self._floodTimer.timeout.connect(self.pollFlood)
+
+        # Limit the number of lines kept in the document to keep layout fast. The
+        # lines removed from the top are stored in the archive and a link to
+        # view them is shown on the first line. Set to zero for no limit.
+        self.maximumBlockCount = 20000
+        self.archive = ConsoleArchive()
+        # Finds traceback File-info lines in the output for the Error Hyperlinks
+        # option. It remembers the incomplete last line so lines split across
+        # writes are still found.
+        self.tracebackLinks = TracebackLinks()
+
+        # Output is added without moving the text cursor or the view. The view only
+        # follows new output if it was showing the end of the output, otherwise a
+        # button is shown that scrolls to the new output.
+        self._pinnedToBottom = True
+        self.uiNewOutputBTN = QToolButton(self)
+        self.uiNewOutputBTN.setText('New output below')
+        self.uiNewOutputBTN.setArrowType(Qt.DownArrow)
+        self.uiNewOutputBTN.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
+        self.uiNewOutputBTN.setCursor(Qt.PointingHandCursor)
+        self.uiNewOutputBTN.hide()
+        self.uiNewOutputBTN.clicked.connect(self.scrollToBottom)
+        self.connectOutputScrollBar(self.verticalScrollBar())
+        # Output is not editable so there is no need to store a undo history
+        self.setUndoRedoEnabled(False)
+
         # overload the sys logger
         self.stream_manager = stream.install_to_std()
         # Redirect future writes directly to the console, add any previous writes
         # to the console and free up the memory consumed by previous writes as we
         # assume this is likely to be the only callback added to the manager.
+        # Managers that retain their history for other consumers are left alone.
+        # The history is written all at once so don't treat it as a flood.
+        release = not self.stream_manager.retain_history
+        lineLimit, self.floodGuard.line_limit = self.floodGuard.line_limit, 0
         self.stream_manager.add_callback(
-            self.write, replay=True, disable_writes=True, clear=True
+            self.write, replay=True, disable_writes=release, clear=release
         )
+        self.floodGuard.line_limit = lineLimit
+        # Only modify the QTextDocument from the gui thread. Writes from other
+        # threads are queued and added in a single batch on the next event loop.
+        self.streamWritesQueued.connect(self.dispatchStreamWrites, Qt.QueuedConnection)
+        self.stream_manager.dispatch_thread = threading.current_thread()
+        self.stream_manager.wakeup = self.wakeStreamDispatch
+        self.scriptThreadFinished.connect(self.finishScript, Qt.QueuedConnection)
+        self.kernelReplied.connect(self.finishKernelRequest, Qt.QueuedConnection)
         # Store the current outputs
         self.stdout = sys.stdout
         self.stderr = sys.stderr
@@ -89,8 +204,10 @@ class ConsolePrEdit(QTextEdit):
         StreamHandlerHelper.replace_stream(self.stderr, sys.stderr)
 
         # create the highlighter
-        highlight = CodeHighlighter(self)
+        highlight = PythonHighlighter(self)
         highlight.setLanguage('Python')
+        # Only highlight the commands typed at the prompt, not the output
+        highlight.setConsoleMode(True)
         self.uiCodeHighlighter = highlight
 
         self.uiClearToLastPromptACT = QAction('Clear to Last', self)
@@ -135,7 +252,12 @@ class ConsolePrEdit(QTextEdit):
         samePos = event.pos() == self.clickPos
         left = event.button() == Qt.LeftButton
         if samePos and left and self.anchor:
-            self.errorHyperlink()
+            if self.anchor.startswith(self.floodHref):
+                self.showFloodOutput(self.anchor)
+            elif self.anchor.startswith(self.archiveHref):
+                self.showArchive(self.anchor)
+            else:
+                self.errorHyperlink()
 
         self.clickPos = None
         self.anchor = None
@@ -256,6 +378,7 @@ class ConsolePrEdit(QTextEdit):
         if self._prevCommandIndex:
             prevCommand = self._prevCommands[self._prevCommandIndex]
 
+        self.flush()
         cursor = self.textCursor()
         cursor.select(QTextCursor.LineUnderCursor)
         if cursor.selectedText().startswith(self._consolePrompt):
@@ -265,10 +388,16 @@ class ConsolePrEdit(QTextEdit):
 
     def clear(self):
         """clears the text in the editor"""
+        # Discard any buffered writes, they were written before the clear
+        self._pendingWrites = []
+        self._writeTimer.stop()
+        self.archive.clear()
+        self.tracebackLinks.reset()
         QTextEdit.clear(self)
         self.startInputLine()
 
     def clearToLastPrompt(self):
+        self.flush()
         # store the current cursor position so we can restore when we are done
         currentCursor = self.textCursor()
         # move to the end of the document so we can search backwards
@@ -300,6 +429,11 @@ class ConsolePrEdit(QTextEdit):
     def setCommentColor(self, color):
         self._commentColor = color
 
+    def connectOutputScrollBar(self, scrollBar):
+        """Track if scrollBar is showing the end of the output, see `outputAdded`."""
+        scrollBar.valueChanged.connect(self.updatePinnedToBottom)
+        scrollBar.rangeChanged.connect(self.followOutput)
+
     def completer(self):
         """returns the completer instance that is associated with this editor"""
         return self._completer
@@ -316,35 +450,297 @@ class ConsolePrEdit(QTextEdit):
     def setForegroundColor(self, color):
         self._foregroundColor = color
 
-    def executeString(self, commandText, filename='<ConsolePrEdit>', extraPrint=True):
+    def dispatchStreamWrites(self):
+        """Add any writes the stream manager queued from other threads."""
+        if QtCompat.isValid(self):
+            self.stream_manager.dispatch_queued()
+
+    def writeFloodMarker(self, lines, chars):
+        """Add a marker to the console showing how much output was suppressed.
+
+        Clicking on the marker shows the output written since the flood started.
+        """
+        self.flush()
+        if not QtCompat.isValid(self):
+            return
+        msg = '[{:,} lines ({:.2f} MB) suppressed, click to view]'.format(
+            lines, chars / (1024.0 * 1024.0)
+        )
+        charFormat = QTextCharFormat()
+        charFormat.setForeground(self.errorMessageColor())
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.End)
+        if cursor.block().text():
+            cursor.insertText('\n', charFormat)
+        linkFormat = QTextCharFormat(charFormat)
+        if self._floodStart is not None:
+            linkFormat.setAnchor(True)
+            linkFormat.setAnchorHref(
+                '{}{},{}'.format(self.floodHref, *self._floodStart)
+            )
+            linkFormat.setFontUnderline(True)
+            linkFormat.setToolTip('Show the output written since the flood started')
+        cursor.insertText(msg, linkFormat)
+        cursor.insertText('\n', charFormat)
+        self.outputAdded()
+
+    def trimScrollback(self):
+        """Move lines exceeding `maximumBlockCount` to the archive.
+
+        Lines are trimmed in batches once the limit is exceeded by 10% so this
+        doesn't need to modify the top of the document for every write. The
+        first line of the document is a link to view the archive.
+        """
+        document = self.document()
+        limit = self.maximumBlockCount
+        if not limit or document.blockCount() <= limit + limit // 10:
+            return
+
+        # The first block is the archive link once lines have been archived
+        first = 1 if self.archive.line_count else 0
+        count = document.blockCount() - limit
+        start = document.findBlockByNumber(first)
+        end = document.findBlockByNumber(first + count)
+        # Keep the lines the user is reading in place if not following the output
+        layout = document.documentLayout()
+        pinned = self._pinnedToBottom
+        topBlock = self.cursorForPosition(QPoint(0, 0)).block()
+        if topBlock.blockNumber() < end.blockNumber():
+            # The lines being read are being archived
+            pinned = True
+        topOffset = (
+            self.verticalScrollBar().value() - layout.blockBoundingRect(topBlock).top()
+        )
+        cursor = QTextCursor(start)
+        cursor.setPosition(end.position(), QTextCursor.KeepAnchor)
+        cursor.beginEditBlock()
+        self.archive.append(cursor.selection().toPlainText())
+        cursor.removeSelectedText()
+
+        # Update the link to the archive
+        cursor.movePosition(QTextCursor.Start)
+        if first:
+            cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+        charFormat = QTextCharFormat()
+        charFormat.setForeground(self.commentColor())
+        linkFormat = QTextCharFormat(charFormat)
+        linkFormat.setAnchor(True)
+        linkFormat.setAnchorHref(self.archiveHref)
+        linkFormat.setFontUnderline(True)
+        linkFormat.setToolTip(self.archive.path)
+        cursor.insertText(
+            '[{:,} older lines were archived, click to view]'.format(
+                self.archive.line_count
+            ),
+            linkFormat,
+        )
+        if not first:
+            cursor.insertText('\n', charFormat)
+        cursor.endEditBlock()
+        if not pinned:
+            # The scroll bar may have been clamped while removing the text
+            top = layout.blockBoundingRect(topBlock).top() + topOffset
+            self.verticalScrollBar().setValue(int(top))
+
+    def warnRunsInProcess(self):
+        """Warn that code is run in this process instead of `kernel`, because it
+        is being profiled or its memory allocations are traced."""
+        reasons = []
+        if self.profiler is not None:
+            reasons.append('profiled')
+        if self.allocationTracer is not None:
+            reasons.append('having its memory allocations traced')
+        print(
+            'Warning: The code is run in this process instead of the kernel '
+            'because it is {}.'.format(' and '.join(reasons)),
+            file=sys.stderr,
+        )
+
+    def wakeStreamDispatch(self):
+        """Called by the stream manager from the writing thread when it queues a
+        write. Schedules `dispatchStreamWrites` on the gui thread.
+
+        Returns False if this console was deleted so the manager stops queueing
+        writes for it.
+        """
+        # This can be called while shutting down a QApplication like Nuke.
+        if not QtCompat.isValid(self):
+            return False
+        self.streamWritesQueued.emit()
+        return True
+
+    def detachStreamManager(self):
+        """Stop receiving writes from the stream manager. Call this before the
+        console is deleted."""
+        manager = self.stream_manager
+        if self.write in manager.callbacks:
+            manager.remove_callback(self.write)
+        if manager.wakeup == self.wakeStreamDispatch:
+            manager.stop_dispatch()
+        self.releaseFloodCursor()
+
+    def compileString(self, commandText, filename='<ConsolePrEdit>'):
+        """Compile code so the value of expressions can be returned.
+
+        Returns:
+            code: The compiled code.
+            bool: If the code was compiled in eval mode.
+        """
+        # https://stackoverflow.com/a/29456463
+        # If you want to get the result of the code, you have to call eval
+        # however eval does not accept multiple statements. For that you need
+        # exec which has no Return.
+        try:
+            return compile(commandText, filename, 'eval'), True
+        except Exception:
+            return compile(commandText, filename, 'exec'), False
+
+    def startExecutionOutput(self):
+        """Start a new line if the cursor is on a prompt so the output of the
+        code being executed doesn't follow the prompt."""
         cursor = self.textCursor()
         cursor.select(QTextCursor.BlockUnderCursor)
         line = cursor.selectedText()
         if line and line[0] not in string.printable:
             line = line[1:]
 
-        if line.startswith(self.prompt()) and extraPrint:
+        if line.startswith(self.prompt()):
             print("")
 
+    def executeString(self, commandText, filename='<ConsolePrEdit>', extraPrint=True):
+        if extraPrint:
+            self.startExecutionOutput()
+
+        if self.kernel is not None:
+            if not self.runsInProcess():
+                # The result is only available once the kernel has run the code
+                self.executeInKernel(commandText, filename)
+                return None, False
+            self.warnRunsInProcess()
+
         cmdresult = None
-        # https://stackoverflow.com/a/29456463
-        # If you want to get the result of the code, you have to call eval
-        # however eval does not accept multiple statements. For that you need
-        # exec which has no Return.
-        wasEval = False
         startTime = time.time()
+        startCpu = thread_time()
+        compiled, wasEval = self.compileString(commandText, filename)
+        snapshot = None
+        if self.allocationTracer is not None:
+            snapshot = self.allocationTracer.snapshot()
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.enable()
         try:
-            compiled = compile(commandText, filename, 'eval')
-            wasEval = True
-        except Exception:
-            compiled = compile(commandText, filename, 'exec')
-        if wasEval:
-            cmdresult = eval(compiled, __main__.__dict__, __main__.__dict__)
-        else:
-            exec(compiled, __main__.__dict__, __main__.__dict__)
+            if wasEval:
+                cmdresult = eval(compiled, __main__.__dict__, __main__.__dict__)
+            else:
+                exec(compiled, __main__.__dict__, __main__.__dict__)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            if snapshot is not None:
+                self.reportAllocations(snapshot)
+
+        self.executionFinished(
+            time.time() - startTime, thread_time() - startCpu, commandText, filename
+        )
+        return cmdresult, wasEval
+
+    def executeWorkboxString(self, commandText, filename, finished=None):
+        """Execute code from a workbox.
+
+        If `executeInThread` is enabled, the code is run on `scriptThread` and
+        this returns immediately. Its output is added to the console as it is
+        written and `stopScript` can be used to stop it. Only one script can run
+        on the thread at a time.
+
+        Args:
+            commandText (str): The code to execute.
+            filename (str): The filename shown in tracebacks.
+            finished (callable, optional): If the code doesn't raise an
+                exception, called with the result of the code and if it was
+                evaluated once it has finished.
+
+        Returns:
+            bool: False if the code wasn't run because a script is still running.
+        """
+        if threading.current_thread() is self.scriptThread:
+            # Called by the script itself, for example using run_workbox. Run the
+            # code on this thread without updating the gui.
+            compiled, wasEval = self.compileString(commandText, filename)
+            if wasEval:
+                cmdresult = eval(compiled, __main__.__dict__, __main__.__dict__)
+            else:
+                exec(compiled, __main__.__dict__, __main__.__dict__)
+                cmdresult = None
+            if finished is not None:
+                finished(cmdresult, wasEval)
+            return True
+
+        # Profilers like cProfile only profile the current thread, so always run
+        # profiled code on the gui thread.
+        profiling = self.profiler is not None
+        if self.kernel is not None and not self.runsInProcess():
+            self.startExecutionOutput()
+            self.executeInKernel(commandText, filename, finished=finished)
+            return True
+
+        if not self.executeInThread or profiling:
+            cmdresult, wasEval = self.executeString(commandText, filename=filename)
+            if finished is not None:
+                finished(cmdresult, wasEval)
+            return True
+
+        if self.isScriptRunning():
+            print('Unable to run code, a script is already running.')
+            return False
+
+        self.startExecutionOutput()
+        if self.kernel is not None:
+            self.warnRunsInProcess()
+        # Compile on the gui thread so syntax errors are reported like normal.
+        compiled, wasEval = self.compileString(commandText, filename)
+        self._scriptFinished = finished
+        self._scriptCode = (commandText, filename)
+        if self.allocationTracer is not None:
+            self._allocationSnapshot = self.allocationTracer.snapshot()
+        self.scriptThread = ScriptThread(
+            compiled,
+            __main__.__dict__,
+            was_eval=wasEval,
+            callback=self.scriptThreadFinished.emit,
+        )
+        self.scriptThread.start()
+        self.scriptRunningChanged.emit(True)
+        return True
+
+    def executeInKernel(self, commandText, filename, finished=None, failed=None):
+        """Run code in `kernel`. Code is run in the order this is called.
 
+        Args:
+            commandText (str): The code to execute.
+            filename (str): The filename shown in tracebacks.
+            finished (callable, optional): If the code doesn't raise an
+                exception, called with a `RemoteValue` of the result of the code
+                and if it was evaluated once it has finished.
+            failed (callable, optional): Called with no arguments if the code
+                raised an exception or the kernel stopped before it finished.
+        """
+        running = self.isScriptRunning()
+        requestId = self.kernel.execute(commandText, filename)
+        self._kernelRequests[requestId] = (finished, failed, commandText, filename)
+        if not running:
+            self.scriptRunningChanged.emit(True)
+
+    def executionFinished(self, delta, cpu=None, commandText=None, filename=None):
+        """Provide user feedback after code that took delta seconds has run.
+
+        Args:
+            delta (float): The number of seconds it took to run the code.
+            cpu (float, optional): The seconds of cpu time used to run the code.
+            commandText (str, optional): The code that was run. If provided the
+                run is passed to `recordExecution`.
+            filename (str, optional): The filename the code was compiled with.
+        """
         # Provide user feedback when running long code execution.
-        delta = time.time() - startTime
         if self.flash_window and self.flash_time and delta >= self.flash_time:
             if settings.OS_TYPE == "Windows":
                 try:
@@ -359,10 +755,124 @@ class ConsolePrEdit(QTextEdit):
         # Report the total time it took to execute this code.
         if self.reportExecutionTime is not None:
             self.reportExecutionTime(delta)
-        return cmdresult, wasEval
+        if self.recordExecution is not None and commandText is not None:
+            self.recordExecution(commandText, filename, delta, cpu)
+
+    def finishScript(self):
+        """Called on the gui thread once `scriptThread` has finished running."""
+        thread, self.scriptThread = self.scriptThread, None
+        if thread is None:
+            return
+        thread.join()
+        finished, self._scriptFinished = self._scriptFinished, None
+        commandText, filename = self._scriptCode
+        self._scriptCode = (None, None)
+        if thread.exc_info:
+            # Only record the time of code that finished
+            commandText = None
+        self.executionFinished(thread.elapsed, thread.cpu_time, commandText, filename)
+        snapshot, self._allocationSnapshot = self._allocationSnapshot, None
+        if snapshot is not None and self.allocationTracer is not None:
+            self.reportAllocations(snapshot)
+        if thread.exc_info:
+            # Report the exception the same way as code run on the gui thread
+            sys.excepthook(*thread.exc_info)
+        elif finished is not None:
+            finished(thread.result, thread.was_eval)
+        self.scriptRunningChanged.emit(False)
+
+    def finishKernelRequest(self, reply):
+        """Called on the gui thread with the `KernelReply` of each request."""
+        finished, failed, commandText, filename = self._kernelRequests.pop(
+            reply.id, (None, None, None, None)
+        )
+        if reply.error:
+            # Only record the time of code that finished
+            commandText = None
+        self.executionFinished(reply.elapsed, reply.cpu, commandText, filename)
+        if reply.error:
+            if failed is not None:
+                failed()
+        elif finished is not None:
+            finished(reply.result, reply.was_eval)
+        if not self._kernelRequests:
+            self.scriptRunningChanged.emit(False)
+
+    def isScriptRunning(self):
+        """Returns True if code is running on `scriptThread` or in `kernel`."""
+        return self.scriptThread is not None or bool(self._kernelRequests)
+
+    @contextmanager
+    def profiling(self, profiler=None):
+        """Profile all code run by `executeString` in this context.
+
+        While profiling, code is always run on the gui thread of this process
+        even if `executeInThread` or `kernel` are used.
+
+        Args:
+            profiler (optional): The profiler to use. This can be any object
+                with the `enable` and `disable` methods of `cProfile.Profile`,
+                like a `LineTimer`. Defaults to a new `cProfile.Profile`.
+
+        Yields:
+            The profiler.
+        """
+        self.profiler = cProfile.Profile() if profiler is None else profiler
+        try:
+            yield self.profiler
+        finally:
+            self.profiler = None
+
+    def reportAllocations(self, before):
+        """Print the lines of code that allocated the most memory since the
+        `before` snapshot was taken by `allocationTracer`."""
+        tracer = self.allocationTracer
+        stats = tracer.compare(before)
+        if stats:
+            print('Memory allocated by this run:')
+            print(tracer.format(stats))
+
+    def restartKernel(self):
+        """Start a new `kernel` process, discarding its namespace."""
+        if self.kernel is not None:
+            self.kernel.restart()
+
+    def runsInProcess(self):
+        """Returns True if code has to be run in this process even if `kernel` is
+        set, because it is being profiled or its memory allocations are traced.
+        `warnRunsInProcess` is called each time this happens."""
+        return self.profiler is not None or self.allocationTracer is not None
+
+    def scriptElapsed(self):
+        """Returns the seconds the current script has been running for."""
+        if self.scriptThread is not None:
+            return self.scriptThread.elapsed
+        if self.kernel is not None:
+            return self.kernel.elapsed
+        return 0.0
+
+    def setKernelEnabled(self, state):
+        """Execute all code in a separate worker process using a `Kernel`."""
+        if state and self.kernel is None:
+            self.kernel = Kernel(
+                manager=self.stream_manager, callback=self.kernelReplied.emit
+            )
+            self.kernel.start()
+        elif not state and self.kernel is not None:
+            kernel, self.kernel = self.kernel, None
+            kernel.shutdown()
+
+    def stopScript(self):
+        """Stop the code running on `scriptThread` or in `kernel` by raising
+        KeyboardInterrupt."""
+        if self.scriptThread is not None:
+            self.scriptThread.interrupt()
+        elif self.kernel is not None:
+            self.kernel.interrupt()
 
     def executeCommand(self):
         """executes the current line of code"""
+        self.flush()
         # grab the command from the line
         block = self.textCursor().block().text()
         p = '{prompt}(.*)'.format(prompt=re.escape(self.prompt()))
@@ -385,18 +895,17 @@ class ConsolePrEdit(QTextEdit):
                 self._prevCommands = self._prevCommands[-1 * self._prevCommandsMax :]
 
                 # evaluate the command
+                if self.kernel is not None and not self.runsInProcess():
+                    # The prompt is started once the kernel has run the command
+                    self.executeInKernel(
+                        commandText,
+                        '<ConsolePrEdit>',
+                        finished=self.commandFinished,
+                        failed=self.startInputLine,
+                    )
+                    return
                 cmdresult, wasEval = self.executeString(commandText)
-
-                # print the resulting commands
-                if cmdresult is not None:
-                    # When writing to additional stdout's not including a new line
-                    # makes the output not match the formatting you get inside the
-                    # console.
-                    self.write(u'{}\n'.format(cmdresult))
-                    # NOTE: I am using u'' above so unicode strings in python 2
-                    # don't get converted to str objects.
-
-                self.startInputLine()
+                self.commandFinished(cmdresult, wasEval)
 
             # otherwise, move the command to the end of the line
             else:
@@ -407,8 +916,65 @@ class ConsolePrEdit(QTextEdit):
         else:
             self.startInputLine()
 
+    def commandFinished(self, cmdresult, wasEval):
+        """Show the result of a command run by `executeCommand` and start the
+        next prompt."""
+        # print the resulting commands
+        if cmdresult is not None:
+            # When writing to additional stdout's not including a new line
+            # makes the output not match the formatting you get inside the
+            # console.
+            self.write(u'{}\n'.format(cmdresult))
+            # NOTE: I am using u'' above so unicode strings in python 2
+            # don't get converted to str objects.
+
+        self.startInputLine()
+
     def flush(self):
-        pass
+        """Add all buffered writes to the document in a single edit block."""
+        self._writeTimer.stop()
+        if not self._pendingWrites:
+            return
+        pending, self._pendingWrites = self._pendingWrites, []
+        # Check that we haven't been garbage collected before trying to write.
+        # This can happen while shutting down a QApplication like Nuke.
+        if not QtCompat.isValid(self):
+            return
+
+        window = self.window()
+        doHyperlink = (
+            hasattr(window, 'uiErrorHyperlinksACT')
+            and window.uiErrorHyperlinksACT.isChecked()
+        )
+        stdoutFormat = QTextCharFormat()
+        stdoutFormat.setForeground(self.stdoutColor())
+        errorFormat = QTextCharFormat()
+        errorFormat.setForeground(self.errorMessageColor())
+
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.End)
+        partial = self.tracebackLinks.partial
+        if doHyperlink and partial and not cursor.block().text().endswith(partial):
+            # Something other than a write, like a prompt, changed the last line
+            self.tracebackLinks.reset()
+        links = []
+        cursor.beginEditBlock()
+        for chunks, error in pending:
+            if isinstance(error, stream.ProcessState) and not error.state:
+                charFormat = QTextCharFormat(stdoutFormat)
+                charFormat.setForeground(self.processColor(error.name))
+            else:
+                charFormat = errorFormat if error else stdoutFormat
+            msg = ''.join(chunks)
+            if doHyperlink:
+                links.extend(self.findHyperlinks(cursor.position(), msg))
+            cursor.insertText(msg, charFormat)
+        # Underline all of the filenames at once instead of splitting each insert
+        if links:
+            self.applyHyperlinks(cursor, links)
+        cursor.endEditBlock()
+        self.trimScrollback()
+        self.outputAdded()
 
     def focusInEvent(self, event):
         """overload the focus in event to ensure the completer has the proper widget"""
@@ -475,6 +1041,8 @@ class ConsolePrEdit(QTextEdit):
 
     def keyPressEvent(self, event):
         """overload the key press event to handle custom events"""
+        # Ensure any buffered output is added before the user's input
+        self.flush()
 
         completer = self.completer()
 
@@ -609,6 +1177,28 @@ class ConsolePrEdit(QTextEdit):
         cursor.movePosition(QTextCursor.Right, mode, len(self.prompt()))
         self.setTextCursor(cursor)
 
+    def followOutput(self, minimum=None, maximum=None):
+        """Keep showing the end of the output as it grows if it was already shown."""
+        if self._pinnedToBottom:
+            self.scrollToBottom()
+
+    def outputAdded(self):
+        """Called after output is added. Follows the output if the end of the output
+        was shown, otherwise `uiNewOutputBTN` is shown."""
+        if self._pinnedToBottom:
+            self.scrollToBottom()
+        elif self.uiNewOutputBTN.isHidden():
+            self.positionNewOutputButton()
+            self.uiNewOutputBTN.show()
+
+    def outputGeometry(self):
+        """The rect output is shown in, in this widget's coordinates."""
+        return self.viewport().geometry()
+
+    def outputScrollBar(self):
+        """The scroll bar used to scroll through the output."""
+        return self.verticalScrollBar()
+
     def outputPrompt(self):
         """The prompt used to output a result."""
         return self._outputPrompt
@@ -616,12 +1206,32 @@ class ConsolePrEdit(QTextEdit):
     def prompt(self):
         return self._consolePrompt
 
+    def positionNewOutputButton(self):
+        """Move `uiNewOutputBTN` to the bottom right corner of the output."""
+        button = self.uiNewOutputBTN
+        button.adjustSize()
+        rect = self.outputGeometry()
+        button.move(
+            rect.right() - button.width() - 10, rect.bottom() - button.height() - 10
+        )
+        button.raise_()
+
+    def resizeEvent(self, event):
+        super(ConsolePrEdit, self).resizeEvent(event)
+        if self.uiNewOutputBTN.isVisible():
+            self.positionNewOutputButton()
+
     def resultColor(self):
         return self._resultColor
 
     def setResultColor(self, color):
         self._resultColor = color
 
+    def scrollToBottom(self):
+        """Scroll to the end of the output without moving the text cursor."""
+        scrollBar = self.outputScrollBar()
+        scrollBar.setValue(scrollBar.maximum())
+
     def setCompleter(self, completer):
         """sets the completer instance for this widget"""
         if completer:
@@ -648,6 +1258,7 @@ class ConsolePrEdit(QTextEdit):
             prompt(str): The prompt to start the line with. If this prompt
                 is already the only text on the last line this function does nothing.
         """
+        self.flush()
         self.moveCursor(QTextCursor.End)
 
         # if this is not already a new line
@@ -668,6 +1279,20 @@ class ConsolePrEdit(QTextEdit):
     def stdoutColor(self):
         return self._stdoutColor
 
+    def processColor(self, name):
+        """Returns the color used for the output of the child process name.
+
+        The color is the stdout color with its hue rotated by an amount picked
+        from the name, so each process keeps the same color.
+        """
+        color = self.stdoutColor()
+        steps = zlib.crc32(name.encode('utf-8')) % 11 + 1
+        return QColor.fromHsl(
+            (max(color.hslHue(), 0) + steps * 30) % 360,
+            color.hslSaturation(),
+            color.lightness(),
+        )
+
     def setStdoutColor(self, color):
         self._stdoutColor = color
 
@@ -677,7 +1302,15 @@ class ConsolePrEdit(QTextEdit):
     def setStringColor(self, color):
         self._stringColor = color
 
+    def updatePinnedToBottom(self, value=None):
+        """Update if new output should be followed when the output is scrolled."""
+        scrollBar = self.outputScrollBar()
+        self._pinnedToBottom = scrollBar.value() >= scrollBar.maximum()
+        if self._pinnedToBottom:
+            self.uiNewOutputBTN.hide()
+
     def removeCurrentLine(self):
+        self.flush()
         self.moveCursor(QTextCursor.End, QTextCursor.MoveAnchor)
         self.moveCursor(QTextCursor.StartOfLine, QTextCursor.MoveAnchor)
         self.moveCursor(QTextCursor.End, QTextCursor.KeepAnchor)
@@ -685,117 +1318,216 @@ class ConsolePrEdit(QTextEdit):
         self.textCursor().deletePreviousChar()
         self.insertPlainText("\n")
 
-    def parseErrorHyperLinkInfo(self, txt):
-        """Determine if txt is a File-info line from a traceback, and if so, return info
-        dict.
+    def hyperlinkHref(self, filename, lineNum):
+        """Returns the anchor href and tool tip used for a traceback hyperlink.
+
+        Args:
+            filename (str): The filename shown in the traceback.
+            lineNum (str): The line number shown in the traceback.
+
+        Returns:
+            tuple: The href that `errorHyperlink` parses and the tool tip text.
+        """
+        isWorkbox = '<WorkboxSelection>' in filename or '<Workbox>' in filename
+        if isWorkbox:
+            split = filename.split(':')
+            workboxIdx = split[-1]
+            filename = ''
+        else:
+            workboxIdx = ''
+        href = '{}, {}, {}'.format(filename, workboxIdx, lineNum)
+        toolTip = "Open {} at line number {}".format(filename, lineNum)
+        return href, toolTip
+
+    def applyHyperlinks(self, cursor, links):
+        """Convert the filenames of traceback File-info lines to hyperlinks.
+
+        Args:
+            cursor (QTextCursor): A cursor used to select the filenames.
+            links (list): A (start, end, `Link`) tuple for each hyperlink, start
+                and end are the document positions of the filename.
+        """
+        for start, end, link in links:
+            # Exclude ConsolePrEdits
+            if '<ConsolePrEdit>' in link.filename:
+                continue
+            href, toolTip = self.hyperlinkHref(link.filename, link.line_num)
+            fmt = QTextCharFormat()
+            fmt.setAnchor(True)
+            fmt.setAnchorHref(href)
+            fmt.setFontUnderline(True)
+            fmt.setToolTip(toolTip)
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.KeepAnchor)
+            cursor.mergeCharFormat(fmt)
+
+    def findHyperlinks(self, position, msg):
+        """Pass msg to `tracebackLinks` and return the links it completed.
+
+        Args:
+            position (int): The document position msg is inserted at.
+            msg (str): The text being inserted.
+
+        Returns:
+            list: The (start, end, `Link`) tuples used by `applyHyperlinks`.
+        """
+        prefix = self.tracebackLinks.partial
+        found = self.tracebackLinks.feed(msg)
+        if not found:
+            return []
+        # QTextDocument positions count utf-16 code units, convert the python
+        # string indexes one link at a time so msg is only measured once.
+        text = prefix + msg
+        position -= _utf16Length(prefix)
+        index = 0
+        links = []
+        for link in found:
+            start = link.start + len(prefix)
+            end = link.end + len(prefix)
+            position += _utf16Length(text[index:start])
+            links.append((position, position + _utf16Length(text[start:end]), link))
+            index = start
+        return links
+
+    def bufferWrite(self, msg, error=False):
+        """Buffer the message so it is added to the console by the next `flush`.
+
+        The buffer is flushed automatically after `writeInterval` milliseconds.
+        Consecutive writes with the same state are merged into a single insert.
+
+        Args:
+            msg (str): The text to add.
+            error (bool or stream.ProcessState): If msg is error output. Output
+                of child processes is passed as a ProcessState whose state is
+                this bool so it can be shown in the color of its process.
+        """
+        pending = self._pendingWrites
+        if pending and pending[-1][1] == error:
+            pending[-1][0].append(msg)
+        else:
+            pending.append(([msg], error))
+
+        if not self.writeInterval:
+            self.flush()
+        elif not self._writeTimer.isActive():
+            self._writeTimer.start(self.writeInterval)
+
+    def pollFlood(self):
+        """Check if a flood of output has ended, see `floodGuard`."""
+        if not QtCompat.isValid(self):
+            return
+        if not self.floodGuard.poll():
+            self._floodTimer.stop()
+            self._floodStart = None
+            self.releaseFloodCursor()
+
+    def releaseFloodCursor(self):
+        """Let the stream manager stop storing writes once a flood has ended. The
+        output stored during the flood can still be viewed using its marker."""
+        if self._floodCursor is not None:
+            self._floodCursor.close()
+            self._floodCursor = None
+
+    def showFloodOutput(self, href):
+        """Show the output written since a flood started in a separate window.
+
+        Args:
+            href (str): The anchor href of a flood marker. It stores the position
+                of the stream manager when the flood started.
+        """
+        index, offset = href[len(self.floodHref) :].split(',')
+        cursor = stream.Cursor(self.stream_manager, int(index), int(offset))
+        records = cursor.read()
+        msg = ''.join(record[0] for record in records)
+        if cursor.missed_records:
+            msg = (
+                '[{:,} writes were discarded from the history]\n'.format(
+                    cursor.missed_records
+                )
+                + msg
+            )
+
+        self.showTextDialog('Suppressed Output', msg)
+
+    def showArchive(self, href=None):
+        """Show the text trimmed from the console in a separate window.
+
+        Args:
+            href (str, optional): A archive anchor href. If it ends with a line
+                number that line is selected.
+        """
+        lineNum = None
+        if href and href[len(self.archiveHref) :]:
+            # Zero is used to link to the archive itself
+            lineNum = int(href[len(self.archiveHref) :]) or None
+        self.showTextDialog('Console Archive', self.archive.read(), lineNum)
+
+    def showTextDialog(self, title, msg, lineNum=None):
+        """Show text in a read only window.
+
+        Args:
+            title (str): The window title.
+            msg (str): The text to show.
+            lineNum (int, optional): If provided, scroll to and select this line
+                number. The first line is 1.
         """
-        lineMarker = '", line '
-        ret = None
-
-        filenameEnd = txt.find(lineMarker)
-        if txt[:8] == '  File "' and filenameEnd >= 0:
-            filename = txt[8:filenameEnd]
-            lineNumStart = filenameEnd + len(lineMarker)
-            lineNumEnd = txt.find(',', lineNumStart)
-            if lineNumEnd == -1:
-                lineNumEnd = len(txt)
-            lineNum = txt[lineNumStart:lineNumEnd]
-            ret = {
-                'filename': filename,
-                'fileStart': 8,
-                'fileEnd': filenameEnd,
-                'lineNum': lineNum,
-            }
-
-        return ret
+        dialog = QDialog(self)
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        dialog.setWindowTitle(title)
+        view = QPlainTextEdit(dialog)
+        view.setReadOnly(True)
+        view.setUndoRedoEnabled(False)
+        view.setFont(self.font())
+        view.setPlainText(msg)
+        if lineNum is not None:
+            block = view.document().findBlockByNumber(lineNum - 1)
+            cursor = QTextCursor(block)
+            cursor.select(QTextCursor.LineUnderCursor)
+            view.setTextCursor(cursor)
+            view.centerCursor()
+        layout = QVBoxLayout(dialog)
+        layout.addWidget(view)
+        dialog.resize(self.width(), self.height())
+        dialog.show()
+        return dialog
 
     def write(self, msg, error=False):
-        """write the message to the logger"""
-        # Convert the stream_manager's stream to the boolean value this function expects
+        """Add the message to the console.
+
+        The message is passed through `floodGuard` to `bufferWrite`.
+        """
+        # Convert the stream_manager's stream to the boolean value this function
+        # expects. Output captured from child processes uses a ProcessState, its
+        # name is kept so the output is shown in the color of its process.
+        process = None
+        if isinstance(error, stream.ProcessState):
+            process, error = error
+            if self.processFilter and not fnmatch.fnmatchcase(
+                process, self.processFilter
+            ):
+                return
         error = error == stream.STDERR
+        state = error if process is None else stream.ProcessState(process, error)
         # Check that we haven't been garbage collected before trying to write.
         # This can happen while shutting down a QApplication like Nuke.
         if QtCompat.isValid(self):
-            window = self.window()
-            doHyperlink = (
-                hasattr(window, 'uiErrorHyperlinksACT')
-                and window.uiErrorHyperlinksACT.isChecked()
-            )
-            self.moveCursor(QTextCursor.End)
-
-            charFormat = QTextCharFormat()
-            if not error:
-                charFormat.setForeground(self.stdoutColor())
-            else:
-                charFormat.setForeground(self.errorMessageColor())
-            self.setCurrentCharFormat(charFormat)
-
-            # If showing Error Hyperlinks... Sometimes (when a syntax error, at least),
-            # the last File-Info line of a traceback is issued in multiple messages
-            # starting with unicode paragraph separator (r"\u2029") and followed by a
-            # newline, so our normal string checks search won't work. Instead, we'll
-            # manually reconstruct the line. If msg is a newline, grab that current line
-            # and check it. If it matches,proceed using that line as msg
-            cursor = self.textCursor()
-            info = None
-
-            if doHyperlink and msg == '\n':
-                cursor.select(QTextCursor.BlockUnderCursor)
-                line = cursor.selectedText()
-
-                # Remove possible leading unicode paragraph separator, which really
-                # messes up the works
-                if line and line[0] not in string.printable:
-                    line = line[1:]
-
-                info = self.parseErrorHyperLinkInfo(line)
-                if info:
-                    cursor.insertText("\n")
-                    msg = "{}\n".format(line)
-
-            # If showing Error Hyperlinks, display underline output, otherwise
-            # display normal output. Exclude ConsolePrEdits
-            info = info if info else self.parseErrorHyperLinkInfo(msg)
-            filename = info.get("filename", "") if info else ""
-            isConsolePrEdit = '<ConsolePrEdit>' in filename
-
-            if info and doHyperlink and not isConsolePrEdit:
-                fileStart = info.get("fileStart")
-                fileEnd = info.get("fileEnd")
-                lineNum = info.get("lineNum")
-
-                isWorkbox = '<WorkboxSelection>' in filename or '<Workbox>' in filename
-                if isWorkbox:
-                    split = filename.split(':')
-                    workboxIdx = split[-1]
-                    filename = ''
-                else:
-                    filename = filename
-                    workboxIdx = ''
-                href = '{}, {}, {}'.format(filename, workboxIdx, lineNum)
-
-                # Insert initial, non-underlined text
-                cursor.insertText(msg[:fileStart])
-
-                # Insert hyperlink
-                fmt = cursor.charFormat()
-                fmt.setAnchor(True)
-                fmt.setAnchorHref(href)
-                fmt.setFontUnderline(True)
-                toolTip = "Open {} at line number {}".format(filename, lineNum)
-                fmt.setToolTip(toolTip)
-                cursor.insertText(msg[fileStart:fileEnd], fmt)
-
-                # Insert the rest of the msg
-                fmt.setAnchor(False)
-                fmt.setAnchorHref('')
-                fmt.setFontUnderline(False)
-                fmt.setToolTip('')
-                cursor.insertText(msg[fileEnd:], fmt)
-            else:
-                # Non-hyperlink output
-                self.insertPlainText(msg)
+            flooding = self.floodGuard.flooding
+            self.floodGuard.write(msg, state)
+            if self.floodGuard.flooding and not flooding:
+                # Remember where the suppressed text starts in the stream manager
+                # so it can be viewed by clicking on the flood marker. While the
+                # cursor is open the manager retains a bounded history.
+                self.releaseFloodCursor()
+                cursor = self.stream_manager.cursor(from_start=False)
+                self._floodCursor = cursor
+                self._floodStart = (cursor.index, cursor.offset)
+                self._floodTimer.start()
 
         # if a outputPipe was provided, write the message to that pipe
         if self.outputPipe:
             self.outputPipe(msg, error=error)
+
+
+def _utf16Length(txt):
+    """Returns the length of txt as a QString."""
+    return len(txt.encode('utf-16-le')) // 2
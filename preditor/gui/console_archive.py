@@ -0,0 +1,52 @@
+from __future__ import absolute_import, print_function
+
+import atexit
+import io
+import os
+import tempfile
+
+
+class ConsoleArchive(object):
+    """Stores the text trimmed from the top of a `ConsolePrEdit` in a temporary file
+    so it can still be viewed and searched without keeping it in the document.
+
+    The file is created when text is first appended and removed by `clear` or when
+    python exits.
+
+    Properties:
+        path (str): The file the text is stored in. None until text is appended.
+        line_count (int): The number of lines stored in the archive.
+    """
+
+    def __init__(self):
+        self.path = None
+        self.line_count = 0
+        atexit.register(self.clear)
+
+    def append(self, text):
+        """Add text to the end of the archive."""
+        if self.path is None:
+            handle, self.path = tempfile.mkstemp(
+                prefix='preditor_console_', suffix='.log'
+            )
+            os.close(handle)
+        with io.open(self.path, 'a', encoding='utf-8') as fle:
+            fle.write(text)
+        self.line_count += text.count('\n')
+
+    def clear(self):
+        """Remove all archived text and delete the file."""
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        self.path = None
+        self.line_count = 0
+
+    def read(self):
+        """Returns all of the archived text."""
+        if self.path is None:
+            return ''
+        with io.open(self.path, encoding='utf-8') as fle:
+            return fle.read()
@@ -0,0 +1,225 @@
+from __future__ import absolute_import, print_function
+
+from datetime import datetime
+
+from Qt.QtCore import QPointF, Qt
+from Qt.QtGui import QColor, QPainter, QPen, QPolygonF
+from Qt.QtWidgets import (
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QSplitter,
+    QToolTip,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from ..utils.line_timer import format_duration
+
+
+class StatsItem(QTreeWidgetItem):
+    """Sorts the numeric columns by their value instead of their text."""
+
+    def __lt__(self, other):
+        column = self.treeWidget().sortColumn()
+        mine = self.data(column, Qt.UserRole)
+        theirs = other.data(column, Qt.UserRole)
+        if mine is None or theirs is None:
+            return super(StatsItem, self).__lt__(other)
+        return mine < theirs
+
+
+class TimingChart(QWidget):
+    """Draws the wall and cpu time of a list of `ExecutionRun`s, oldest on the
+    left. A dashed line marks each run where the code changed."""
+
+    wallColor = QColor(40, 120, 220)
+    cpuColor = QColor(150, 150, 150)
+    changeColor = QColor(220, 120, 40)
+    margin = 6
+
+    def __init__(self, parent=None):
+        super(TimingChart, self).__init__(parent)
+        self.runs = []
+        self.setMinimumHeight(80)
+        self.setMouseTracking(True)
+
+    def mouseMoveEvent(self, event):
+        index = self.runAt(event.pos().x())
+        if index is None:
+            QToolTip.hideText()
+            return
+        run = self.runs[index]
+        lines = [
+            datetime.fromtimestamp(run.timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+            'Wall: {}'.format(format_duration(run.wall)),
+        ]
+        if run.cpu is not None:
+            lines.append('CPU: {}'.format(format_duration(run.cpu)))
+        lines.append('Code: {}'.format(run.code_hash))
+        QToolTip.showText(event.globalPos(), '\n'.join(lines), self)
+
+    def paintEvent(self, event):
+        if not self.runs:
+            return
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        top = self.margin + painter.fontMetrics().height()
+        bottom = self.height() - self.margin
+        scale = max(run.wall for run in self.runs) or 1.0
+        painter.drawText(
+            self.margin,
+            self.margin,
+            self.width(),
+            top,
+            Qt.AlignLeft,
+            'Max: {}'.format(format_duration(scale)),
+        )
+
+        def y(value):
+            return bottom - (bottom - top) * value / scale
+
+        changePen = QPen(self.changeColor)
+        changePen.setStyle(Qt.DashLine)
+        painter.setPen(changePen)
+        for index in range(1, len(self.runs)):
+            if self.runs[index].code_hash != self.runs[index - 1].code_hash:
+                x = self.runX(index)
+                painter.drawLine(QPointF(x, top), QPointF(x, bottom))
+
+        for attr, color in (('cpu', self.cpuColor), ('wall', self.wallColor)):
+            points = [
+                QPointF(self.runX(index), y(getattr(run, attr)))
+                for index, run in enumerate(self.runs)
+                if getattr(run, attr) is not None
+            ]
+            painter.setPen(QPen(color, 2))
+            if len(points) > 1:
+                painter.drawPolyline(QPolygonF(points))
+            for point in points:
+                painter.drawEllipse(point, 2, 2)
+
+    def runAt(self, x):
+        """Returns the index of the run drawn closest to x."""
+        if not self.runs:
+            return None
+        return min(range(len(self.runs)), key=lambda index: abs(self.runX(index) - x))
+
+    def runX(self, index):
+        width = self.width() - self.margin * 2
+        if len(self.runs) < 2:
+            return self.margin + width / 2.0
+        return self.margin + width * index / float(len(self.runs) - 1)
+
+    def setRuns(self, runs):
+        self.runs = runs
+        self.update()
+
+
+class ExecutionHistoryWidget(QWidget):
+    """Shows the statistics of the code run from each workbox and the console
+    recorded in an `ExecutionHistory`, and a chart of the recent runs of the
+    selected one."""
+
+    # The number of runs shown in the chart
+    chartRuns = 100
+
+    def __init__(self, history, parent=None):
+        super(ExecutionHistoryWidget, self).__init__(parent)
+        self.history = history
+
+        self.uiStatusLBL = QLabel(self)
+        self.uiRefreshBTN = QPushButton('Refresh', self)
+        self.uiRefreshBTN.clicked.connect(self.refresh)
+        self.uiClearBTN = QPushButton('Clear', self)
+        self.uiClearBTN.setToolTip('Remove the recorded runs of the selected source')
+        self.uiClearBTN.clicked.connect(self.clearSelected)
+
+        self.uiStatsTREE = QTreeWidget(self)
+        self.uiStatsTREE.setHeaderLabels(
+            ['Source', 'Runs', 'p50', 'p95', 'Max', 'Trend', 'Last Run']
+        )
+        self.uiStatsTREE.headerItem().setToolTip(
+            5,
+            'How much slower the median of the last 5 runs is than the 5 runs '
+            'before them',
+        )
+        self.uiStatsTREE.setRootIsDecorated(False)
+        self.uiStatsTREE.setSortingEnabled(True)
+        self.uiStatsTREE.sortByColumn(0, Qt.AscendingOrder)
+        self.uiStatsTREE.itemSelectionChanged.connect(self.updateChart)
+
+        self.uiTimingChartWGT = TimingChart(self)
+        self.uiSplitterSPLIT = QSplitter(Qt.Vertical, self)
+        self.uiSplitterSPLIT.addWidget(self.uiStatsTREE)
+        self.uiSplitterSPLIT.addWidget(self.uiTimingChartWGT)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.uiStatusLBL, 1)
+        buttons.addWidget(self.uiRefreshBTN)
+        buttons.addWidget(self.uiClearBTN)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(3, 3, 3, 3)
+        layout.addLayout(buttons)
+        layout.addWidget(self.uiSplitterSPLIT)
+
+    def clearSelected(self):
+        source = self.selectedSource()
+        if source is not None:
+            self.history.clear(source)
+            self.refresh()
+
+    def refresh(self):
+        """Reload the statistics from the history, keeping the selection."""
+        selected = self.selectedSource()
+        stats = self.history.stats()
+        tree = self.uiStatsTREE
+        tree.setSortingEnabled(False)
+        tree.clear()
+        for stat in stats:
+            last = datetime.fromtimestamp(stat.last)
+            trend = '' if stat.trend is None else '{:+.0%}'.format(stat.trend)
+            item = StatsItem(
+                [
+                    stat.source,
+                    str(stat.runs),
+                    format_duration(stat.p50),
+                    format_duration(stat.p95),
+                    format_duration(stat.max),
+                    trend,
+                    last.strftime('%Y-%m-%d %H:%M'),
+                ]
+            )
+            for column, value in enumerate(stat[1:], start=1):
+                item.setData(column, Qt.UserRole, value)
+                item.setTextAlignment(column, Qt.AlignRight)
+            tree.addTopLevelItem(item)
+            if stat.source == selected:
+                item.setSelected(True)
+        tree.setSortingEnabled(True)
+        for column in range(tree.columnCount()):
+            tree.resizeColumnToContents(column)
+        self.uiStatusLBL.setText(
+            '{} runs recorded'.format(sum(stat.runs for stat in stats))
+        )
+        self.updateChart()
+
+    def selectedSource(self):
+        items = self.uiStatsTREE.selectedItems()
+        if not items:
+            return None
+        return items[0].text(0)
+
+    def showEvent(self, event):
+        super(ExecutionHistoryWidget, self).showEvent(event)
+        self.refresh()
+
+    def updateChart(self):
+        source = self.selectedSource()
+        self.uiClearBTN.setEnabled(source is not None)
+        runs = []
+        if source is not None:
+            runs = self.history.runs(source, limit=self.chartRuns)
+        self.uiTimingChartWGT.setRuns(runs)
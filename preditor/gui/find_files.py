@@ -78,6 +78,11 @@ class FindFiles(QWidget):
                 workbox_id = '{},{}'.format(group_index, tab_index)
                 self.find_in_editor(editor, path, workbox_id)
 
+        # Search the lines trimmed from the top of the console
+        archive = getattr(self.console, 'archive', None)
+        if archive is not None and archive.line_count:
+            self.finder.search_text(archive.read(), 'Console Archive', None)
+
         self.insert_text(
             '\n{} matches in {} workboxes\n'.format(
                 self.finder.match_count, self.match_files_count
@@ -95,7 +100,11 @@ class FindFiles(QWidget):
             self.match_files_count += 1
 
     def insert_found_text(self, text, workbox_id, line_num, tool_tip):
-        href = ', {}, {}'.format(workbox_id, line_num)
+        if workbox_id is None:
+            # This match is in the console archive
+            href = '{}{}'.format(self.console.archiveHref, line_num)
+        else:
+            href = ', {}, {}'.format(workbox_id, line_num)
         cursor = self.console.textCursor()
         # Insert hyperlink
         fmt = cursor.charFormat()
@@ -0,0 +1,237 @@
+from __future__ import absolute_import, print_function
+
+import os
+import zlib
+
+from Qt import QtCompat
+from Qt.QtCore import QRectF, Qt
+from Qt.QtGui import QColor, QPainter
+from Qt.QtWidgets import (
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QScrollArea,
+    QToolTip,
+    QVBoxLayout,
+    QWidget,
+)
+
+from ..utils.line_timer import format_duration
+
+
+class FlameGraph(QWidget):
+    """Draws the stacks recorded by a `SamplingProfiler` as an icicle graph.
+
+    Each function is drawn below the function that called it with a width
+    proportional to the time it was sampled for. Clicking a function zooms in
+    on it, clicking the top row zooms back out.
+    """
+
+    rowHeight = 18
+
+    def __init__(self, parent=None):
+        super(FlameGraph, self).__init__(parent)
+        self.root = None
+        # The nodes from the root to the node that is zoomed in on
+        self._zoom = []
+        # The rect, node and zoom path of each drawn node, used for hit testing
+        self._rects = []
+        self.setMouseTracking(True)
+
+    def depth(self, node):
+        """Returns the number of rows needed to draw `node` and its children."""
+        if not node.children:
+            return 1
+        return 1 + max(self.depth(child) for child in node.children.values())
+
+    def layoutNodes(self):
+        """Calculate the rects of the visible nodes."""
+        self._rects = []
+        if not self._zoom:
+            return
+        width = float(self.width())
+        # The callers of the zoomed node are drawn full width above it
+        for row, node in enumerate(self._zoom[:-1]):
+            rect = QRectF(0, row * self.rowHeight, width, self.rowHeight)
+            self._rects.append((rect, node, self._zoom[: row + 1]))
+        self._layoutNode(self._zoom[-1], self._zoom, 0, width, len(self._zoom) - 1)
+
+    def _layoutNode(self, node, path, x, width, row):
+        rect = QRectF(x, row * self.rowHeight, width, self.rowHeight)
+        self._rects.append((rect, node, path))
+        if not node.time:
+            return
+        scale = width / node.time
+        children = sorted(node.children.values(), key=lambda child: child.name)
+        for child in children:
+            childWidth = child.time * scale
+            # Functions that are too narrow to see are not drawn
+            if childWidth >= 1:
+                self._layoutNode(child, path + [child], x, childWidth, row + 1)
+            x += childWidth
+
+    def mousePressEvent(self, event):
+        item = self.itemAt(event.pos())
+        if item is None or event.button() != Qt.LeftButton:
+            return super(FlameGraph, self).mousePressEvent(event)
+        _, node, path = item
+        if node is self._zoom[-1] and len(path) > 1:
+            # Clicking the zoomed node zooms out to its caller
+            path = path[:-1]
+        self._zoom = path
+        self.updateSize()
+
+    def mouseMoveEvent(self, event):
+        item = self.itemAt(event.pos())
+        if item is None:
+            QToolTip.hideText()
+            return
+        _, node, path = item
+        total = self.root.time or 1
+        text = '{}\n{} ({:.1f}%), {} samples'.format(
+            node.name,
+            format_duration(node.time),
+            node.time * 100.0 / total,
+            node.count,
+        )
+        QToolTip.showText(event.globalPos(), text, self)
+
+    def itemAt(self, pos):
+        """Returns the rect, node and zoom path drawn at `pos` if any."""
+        for item in self._rects:
+            if item[0].contains(pos.x(), pos.y()):
+                return item
+        return None
+
+    def nodeColor(self, node):
+        """Returns a warm color that is the same each time a function is drawn."""
+        if node is self.root:
+            return QColor(200, 200, 200)
+        value = zlib.crc32(node.name.encode('utf-8')) & 0xFFFFFFFF
+        return QColor.fromHsv(value % 50, 110 + value % 80, 230)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        metrics = painter.fontMetrics()
+        exposed = event.rect()
+        for rect, node, _ in self._rects:
+            if not rect.intersects(QRectF(exposed)):
+                continue
+            painter.fillRect(rect, self.nodeColor(node))
+            painter.setPen(Qt.white)
+            painter.drawRect(rect)
+            if rect.width() > 20:
+                painter.setPen(Qt.black)
+                width = int(rect.width()) - 6
+                text = metrics.elidedText(node.name, Qt.ElideRight, width)
+                painter.drawText(
+                    rect.adjusted(3, 0, -3, 0), Qt.AlignLeft | Qt.AlignVCenter, text
+                )
+
+    def resetZoom(self):
+        self._zoom = [self.root] if self.root is not None else []
+        self.updateSize()
+
+    def resizeEvent(self, event):
+        super(FlameGraph, self).resizeEvent(event)
+        self.layoutNodes()
+
+    def setRoot(self, root):
+        """Show the stacks of a `StackNode`."""
+        self.root = root
+        self.resetZoom()
+
+    def updateSize(self):
+        """Resize to fit the rows of the zoomed stacks and redraw them."""
+        rows = 0
+        if self._zoom:
+            rows = len(self._zoom) - 1 + self.depth(self._zoom[-1])
+        self.setMinimumHeight(rows * self.rowHeight)
+        self.layoutNodes()
+        self.update()
+
+
+class FlameGraphPanel(QWidget):
+    """Shows the `FlameGraph` of a `SamplingProfiler` and lets it be exported."""
+
+    def __init__(self, parent=None):
+        super(FlameGraphPanel, self).__init__(parent)
+        self.profiler = None
+
+        self.uiSummaryLBL = QLabel(self)
+        self.uiResetZoomBTN = QPushButton('Reset Zoom', self)
+        self.uiResetZoomBTN.clicked.connect(self.resetZoom)
+        self.uiExportSpeedscopeBTN = QPushButton('Export Speedscope...', self)
+        self.uiExportSpeedscopeBTN.setToolTip(
+            'Save the samples as json that can be opened by https://www.speedscope.app'
+        )
+        self.uiExportSpeedscopeBTN.clicked.connect(self.exportSpeedscope)
+        self.uiExportCollapsedBTN = QPushButton('Export Collapsed...', self)
+        self.uiExportCollapsedBTN.setToolTip(
+            'Save the samples in the collapsed stack format used by flamegraph.pl'
+        )
+        self.uiExportCollapsedBTN.clicked.connect(self.exportCollapsed)
+
+        self.uiFlameGraphWGT = FlameGraph(self)
+        self.uiScrollAREA = QScrollArea(self)
+        self.uiScrollAREA.setWidgetResizable(True)
+        self.uiScrollAREA.setWidget(self.uiFlameGraphWGT)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.uiSummaryLBL, 1)
+        buttons.addWidget(self.uiResetZoomBTN)
+        buttons.addWidget(self.uiExportSpeedscopeBTN)
+        buttons.addWidget(self.uiExportCollapsedBTN)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(3, 3, 3, 3)
+        layout.addLayout(buttons)
+        layout.addWidget(self.uiScrollAREA)
+        self.setProfiler(None)
+
+    def export(self, caption, fileFilter, data):
+        path, _ = QtCompat.QFileDialog.getSaveFileName(self, caption, "", fileFilter)
+        if not path:
+            return
+        path = os.path.normpath(path)
+        with open(path, 'w') as fle:
+            fle.write(data)
+        print('Samples saved to: "{}"'.format(path))
+
+    def exportCollapsed(self):
+        if self.profiler is None:
+            return
+        self.export(
+            'Export Collapsed Stacks',
+            'Collapsed Stacks (*.txt *.folded);;All Files (*.*)',
+            self.profiler.collapsed(),
+        )
+
+    def exportSpeedscope(self):
+        if self.profiler is None:
+            return
+        self.export(
+            'Export Speedscope',
+            'Speedscope (*.speedscope.json *.json);;All Files (*.*)',
+            self.profiler.speedscope(),
+        )
+
+    def resetZoom(self):
+        self.uiFlameGraphWGT.resetZoom()
+
+    def setProfiler(self, profiler):
+        """Show the samples recorded by a `SamplingProfiler`."""
+        self.profiler = profiler
+        enabled = profiler is not None
+        self.uiResetZoomBTN.setEnabled(enabled)
+        self.uiExportSpeedscopeBTN.setEnabled(enabled)
+        self.uiExportCollapsedBTN.setEnabled(enabled)
+        if not enabled:
+            self.uiSummaryLBL.setText('No samples')
+            self.uiFlameGraphWGT.setRoot(None)
+            return
+        self.uiSummaryLBL.setText(
+            '{} samples over {}'.format(
+                profiler.root.count, format_duration(profiler.duration)
+            )
+        )
+        self.uiFlameGraphWGT.setRoot(profiler.root)
@@ -3,7 +3,9 @@ from __future__ import absolute_import, print_function
 import itertools
 import json
 import os
+import pstats
 import re
+import sqlite3
 import sys
 import warnings
 from builtins import bytes
@@ -17,9 +19,11 @@ from Qt.QtCore import QByteArray, Qt, QTimer, Signal, Slot
 from Qt.QtGui import QCursor, QFont, QFontDatabase, QIcon, QTextCursor
 from Qt.QtWidgets import (
     QApplication,
+    QDockWidget,
     QInputDialog,
     QLabel,
     QMessageBox,
+    QStyle,
     QTextBrowser,
     QToolTip,
     QVBoxLayout,
@@ -34,6 +38,7 @@ from .. import (
     plugins,
     prefs,
     resourcePath,
+    stream,
 )
 from ..delayable_engine import DelayableEngine
 from ..gui import Dialog, Window, loadUi
@@ -41,8 +46,16 @@ from ..gui.fuzzy_search.fuzzy_search import FuzzySearch
 from ..gui.group_tab_widget.grouped_tab_models import GroupTabListItemModel
 from ..logging_config import LoggingConfig
 from ..utils import stylesheets
+from ..utils.allocation_tracer import AllocationTracer
+from ..utils.execution_history import ExecutionHistory
+from ..utils.line_timer import LineTimer, format_duration
+from ..utils.sampling_profiler import SamplingProfiler
+from ..utils.stall_watchdog import StallWatchdog
 from .completer import CompleterMode
+from .execution_history import ExecutionHistoryWidget
+from .flame_graph import FlameGraphPanel
 from .level_buttons import LoggingLevelButton
+from .object_census import ObjectCensusWidget
 from .set_text_editor_path_dialog import SetTextEditorPathDialog
 
 
@@ -56,10 +69,13 @@ class WorkboxPages:
 class LoggerWindow(Window):
     _instance = None
     styleSheetChanged = Signal(str)
+    # Emitted from the StallWatchdog's thread with a StallReport
+    stallReported = Signal(object)
 
     def __init__(self, parent, name=None, run_workbox=False, standalone=False):
         super(LoggerWindow, self).__init__(parent=parent)
         self.name = name if name else DEFAULT_CORE_NAME
+        self.standalone = standalone
         self.aboutToClearPathsEnabled = False
         self._stylesheet = 'Bright'
 
@@ -72,10 +88,21 @@ class LoggerWindow(Window):
         self.previousFontResizeTime = datetime.now()
 
         self.setWindowIcon(QIcon(resourcePath('img/preditor.png')))
+        # The virtualized console has to replace the console before anything
+        # connects to it, so this preference is read before restorePrefs.
+        virtualConsole = self.load_prefs().get('virtualConsole', False)
+        history = None
+        if virtualConsole:
+            # Keep the console created by loadUi from clearing the stream
+            # manager's history so it can be replayed into the virtual console.
+            history = stream.install_to_std().cursor()
         loadUi(__file__, self)
+        if virtualConsole:
+            self.useVirtualConsole(history)
 
         self.uiConsoleTXT.flash_window = self
         self.uiConsoleTXT.reportExecutionTime = self.reportExecutionTime
+        self.uiConsoleTXT.recordExecution = self.recordExecution
         self.uiClearToLastPromptACT.triggered.connect(
             self.uiConsoleTXT.clearToLastPrompt
         )
@@ -120,6 +147,82 @@ class LoggerWindow(Window):
 
         self.uiRunAllACT.triggered.connect(self.execAll)
         self.uiRunSelectedACT.triggered.connect(self.execSelected)
+        self.uiRunAllProfiledACT.triggered.connect(self.execAllProfiled)
+        self.uiRunSelectedProfiledACT.triggered.connect(self.execSelectedProfiled)
+        self.uiSaveProfileACT.triggered.connect(self.saveProfile)
+        self.uiRunAllLineTimedACT.triggered.connect(self.execAllLineTimed)
+        self.uiSaveProfileACT.setEnabled(False)
+        # The profile of the last code run using the Run Profiled actions
+        self.lastProfile = None
+        # How the Run Profiled stats are sorted and how many rows are shown
+        self.profileSortKey = 'cumulative'
+        self.profileRowLimit = 40
+        self.uiRunAllSampledACT.triggered.connect(self.execAllSampled)
+        self.uiSampleMainThreadACT.toggled.connect(self.setSampleMainThread)
+        # How many times per second the sampling profiler samples the stack
+        self.samplingRate = 200
+        self.sampler = None
+        # Show the samples of the last sampled run as a flame graph
+        self.uiFlameGraphPNL = FlameGraphPanel(self)
+        self.uiFlameGraphDOCK = QDockWidget('Flame Graph', self)
+        self.uiFlameGraphDOCK.setObjectName('uiFlameGraphDOCK')
+        self.uiFlameGraphDOCK.setWidget(self.uiFlameGraphPNL)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.uiFlameGraphDOCK)
+        self.uiFlameGraphDOCK.hide()
+        self.menu_Run.insertAction(
+            self.uiSampleMainThreadACT, self.uiFlameGraphDOCK.toggleViewAction()
+        )
+        self.uiTraceAllocationsACT.toggled.connect(self.setTraceAllocations)
+        self.uiTraceAllocationsACT.setEnabled(AllocationTracer.is_available())
+        # How many lines are reported by Trace Memory Allocations
+        self.allocationLimit = 10
+        # Find leaked objects by comparing the number of objects of each type
+        self.uiObjectCensusWGT = ObjectCensusWidget(self)
+        self.uiObjectCensusDOCK = QDockWidget('Object Census', self)
+        self.uiObjectCensusDOCK.setObjectName('uiObjectCensusDOCK')
+        self.uiObjectCensusDOCK.setWidget(self.uiObjectCensusWGT)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.uiObjectCensusDOCK)
+        self.uiObjectCensusDOCK.hide()
+        # Report what blocked the main thread when the ui stops responding
+        self.stallWatchdog = None
+        self.stallThreshold = 1.0
+        self.stallHeartbeatTimer = QTimer(self)
+        self.stallHeartbeatTimer.setInterval(100)
+        self.stallReported.connect(self.reportStall, Qt.QueuedConnection)
+        self.uiStallWatchdogACT.toggled.connect(self.setStallWatchdogEnabled)
+        self.uiSetStallThresholdACT.triggered.connect(self.setStallThreshold)
+        actions = self.menu_Run.actions()
+        self.menu_Run.insertAction(
+            actions[actions.index(self.uiTraceAllocationsACT) + 1],
+            self.uiObjectCensusDOCK.toggleViewAction(),
+        )
+        # Keep the timing of each run of the console and workboxes across sessions
+        self.executionHistory = ExecutionHistory(
+            prefs.prefs_path('execution_history.sqlite', core_name=self.name)
+        )
+        self.uiExecutionHistoryWGT = ExecutionHistoryWidget(self.executionHistory, self)
+        self.uiExecutionHistoryDOCK = QDockWidget('Execution History', self)
+        self.uiExecutionHistoryDOCK.setObjectName('uiExecutionHistoryDOCK')
+        self.uiExecutionHistoryDOCK.setWidget(self.uiExecutionHistoryWGT)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.uiExecutionHistoryDOCK)
+        self.uiExecutionHistoryDOCK.hide()
+        actions = self.menu_Run.actions()
+        self.menu_Run.insertAction(
+            actions[actions.index(self.uiRecordExecutionHistoryACT) + 1],
+            self.uiExecutionHistoryDOCK.toggleViewAction(),
+        )
+        self.uiStopACT.triggered.connect(self.uiConsoleTXT.stopScript)
+        self.uiStopACT.setEnabled(False)
+        self.uiExecuteInThreadACT.toggled.connect(self.setExecuteInThread)
+        self.uiUseKernelACT.toggled.connect(self.setUseKernel)
+        self.uiRestartKernelACT.triggered.connect(self.uiConsoleTXT.restartKernel)
+        self.uiRestartKernelACT.setEnabled(False)
+        self.uiConsoleTXT.scriptRunningChanged.connect(self.updateScriptRunning)
+        # Show how long a script running on a thread has been running for
+        self._promptAfterScript = False
+        self.scriptStatusTimer = QTimer(self)
+        self.scriptStatusTimer.setInterval(100)
+        self.scriptStatusTimer.timeout.connect(self.updateScriptStatus)
 
         self.uiAutoCompleteEnabledACT.toggled.connect(self.setAutoCompleteEnabled)
 
@@ -210,6 +313,10 @@ class LoggerWindow(Window):
         self.uiAboutPreditorACT.triggered.connect(self.show_about)
         core.aboutToClearPaths.connect(self.pathsAboutToBeCleared)
         self.uiSetFlashWindowIntervalACT.triggered.connect(self.setFlashWindowInterval)
+        self.uiSetFloodLineLimitACT.triggered.connect(self.setFloodLineLimit)
+        self.uiSetProcessFilterACT.triggered.connect(self.setProcessFilter)
+        self.uiSetMaximumBlockCountACT.triggered.connect(self.setMaximumBlockCount)
+        self.uiSetSamplingRateACT.triggered.connect(self.setSamplingRate)
 
         self.uiSetPreferredTextEditorPathACT.triggered.connect(
             self.openSetPreferredTextEditorDialog
@@ -230,6 +337,7 @@ class LoggerWindow(Window):
         self.uiAboutPreditorACT.setIcon(QIcon(resourcePath('img/information.png')))
         self.uiRestartACT.setIcon(QIcon(resourcePath('img/restart.svg')))
         self.uiCloseLoggerACT.setIcon(QIcon(resourcePath('img/close-thick.png')))
+        self.uiStopACT.setIcon(self.style().standardIcon(QStyle.SP_MediaStop))
 
         # Make action shortcuts available anywhere in the Logger
         self.addAction(self.uiClearLogACT)
@@ -279,8 +387,10 @@ class LoggerWindow(Window):
         self.setup_run_workbox()
 
         if not standalone:
-            # This action only is valid when running in standalone mode
+            # These actions are only valid when running in standalone mode
             self.uiRestartACT.setVisible(False)
+            self.uiUseKernelACT.setVisible(False)
+            self.uiRestartKernelACT.setVisible(False)
 
         # Run the current workbox after the LoggerWindow is shown.
         if run_workbox:
@@ -608,6 +718,19 @@ class LoggerWindow(Window):
 
     def closeEvent(self, event):
         self.recordPrefs()
+        self.uiSampleMainThreadACT.setChecked(False)
+        self.uiTraceAllocationsACT.setChecked(False)
+        # The heartbeat timer stops with the window, don't leave the watchdog
+        # thread sampling the main thread as if it had stalled.
+        self.uiStallWatchdogACT.setChecked(False)
+        self.executionHistory.close()
+        if self.uiConsoleTXT.kernel is not None:
+            # Stop the worker process, it is restarted if more code is run
+            self.uiConsoleTXT.kernel.shutdown()
+        if self.testAttribute(Qt.WA_DeleteOnClose):
+            # The console is about to be deleted, writes from other threads
+            # can no longer be dispatched to it.
+            self.uiConsoleTXT.detachStreamManager()
         # Save the logger configuration
         lcfg = LoggingConfig(core_name=self.name)
         lcfg.build()
@@ -632,6 +755,10 @@ class LoggerWindow(Window):
 
         if self.uiAutoPromptACT.isChecked():
             console = self.console()
+            if console.isScriptRunning():
+                # Show the prompt after the script's output
+                self._promptAfterScript = True
+                return
             prompt = console.prompt()
             console.startPrompt(prompt)
 
@@ -641,6 +768,202 @@ class LoggerWindow(Window):
             self.clearLog()
         self.current_workbox().__exec_selected__()
 
+    def execAllProfiled(self):
+        """Execute all workbox code with cProfile and print its stats."""
+        self.execProfiled(selected=False)
+
+    def execSelectedProfiled(self):
+        """Execute the selected workbox code with cProfile and print its stats."""
+        self.execProfiled(selected=True)
+
+    def execProfiled(self, selected=False):
+        """Execute workbox code with cProfile and print the stats of the code
+        sorted by `profileSortKey`. The profile can be saved using `saveProfile`.
+
+        Args:
+            selected (bool, optional): Run the selected code instead of all code.
+        """
+        if self.uiClearBeforeRunningACT.isChecked():
+            self.clearLog()
+        workbox = self.current_workbox()
+        with self.console().profiling() as profiler:
+            try:
+                if selected:
+                    workbox.__exec_selected__()
+                else:
+                    workbox.__exec_all__()
+            finally:
+                self.printProfile(profiler)
+
+    def execAllLineTimed(self):
+        """Execute all workbox code while timing each line of it. The times are
+        shown next to each line of the workbox until it is edited."""
+        if self.uiClearBeforeRunningACT.isChecked():
+            self.clearLog()
+        workbox = self.current_workbox()
+        filename = workbox.__workbox_filename__()
+        timer = LineTimer(filename)
+        with self.console().profiling(timer):
+            try:
+                workbox.__exec_all__()
+            finally:
+                if not workbox.__line_times__(timer.hits, timer.times):
+                    self.printLineTimes(filename, timer)
+
+    def execAllSampled(self):
+        """Execute all workbox code with a `SamplingProfiler` and show its samples
+        in the flame graph."""
+        if self.uiClearBeforeRunningACT.isChecked():
+            self.clearLog()
+        sampler = SamplingProfiler(interval=1.0 / self.samplingRate)
+        with self.console().profiling(sampler):
+            try:
+                self.current_workbox().__exec_all__()
+            finally:
+                if sampler.root.count:
+                    self.showSamples(sampler)
+
+    def printLineTimes(self, filename, timer, limit=20):
+        """Print the slowest lines timed by a `LineTimer`, used for workboxes that
+        can't show the line times themselves."""
+        lines = sorted(timer.times, key=timer.times.get, reverse=True)[:limit]
+        if not lines:
+            return
+        self.console().startExecutionOutput()
+        for line in lines:
+            print(
+                '  File "{}", line {}: {} {}x'.format(
+                    filename,
+                    line,
+                    format_duration(timer.times[line]),
+                    timer.hits.get(line, 0),
+                )
+            )
+
+    def printProfile(self, profiler):
+        """Print the stats of a profile and store it as the `lastProfile`."""
+        try:
+            stats = pstats.Stats(profiler, stream=sys.stdout)
+        except TypeError:
+            # The code didn't run, most likely it had a syntax error
+            return
+        self.lastProfile = profiler
+        self.uiSaveProfileACT.setEnabled(True)
+        self.console().startExecutionOutput()
+        stats.sort_stats(self.profileSortKey).print_stats(self.profileRowLimit)
+
+    def saveProfile(self):
+        """Save `lastProfile` to a .prof file that can be opened by tools like
+        snakeviz."""
+        if self.lastProfile is None:
+            return
+        path, _ = QtCompat.QFileDialog.getSaveFileName(
+            self, "Save Profile", "", "Profile (*.prof);;All Files (*.*)"
+        )
+        if not path:
+            return
+        path = os.path.normpath(path)
+        self.lastProfile.dump_stats(path)
+        print('Profile saved to: "{}"'.format(path))
+
+    def setSampleMainThread(self, state):
+        """Start sampling the main thread, when stopped show the samples in the
+        flame graph. This includes any code run by the application, not just code
+        run from PrEditor."""
+        if state:
+            self.sampler = SamplingProfiler(interval=1.0 / self.samplingRate)
+            self.sampler.start()
+            self.setStatusText('Sampling the main thread')
+            return
+
+        if self.sampler is None:
+            return
+        self.sampler.stop()
+        self.showSamples(self.sampler)
+        self.sampler = None
+        self.setStatusText('')
+
+    def setTraceAllocations(self, state):
+        """Start or stop reporting the memory allocated each time code is run."""
+        console = self.uiConsoleTXT
+        if state:
+            console.allocationTracer = AllocationTracer(limit=self.allocationLimit)
+            console.allocationTracer.start()
+        elif console.allocationTracer is not None:
+            console.allocationTracer.stop()
+            console.allocationTracer = None
+
+    def reportStall(self, report):
+        """Print a `StallReport` and add it to the stalls.log file."""
+        text = report.format()
+        console = self.console()
+        console.startExecutionOutput()
+        print(text)
+        if self.uiAutoPromptACT.isChecked():
+            console.startPrompt(console.prompt())
+        filename = prefs.prefs_path('stalls.log', core_name=self.name)
+        try:
+            if not os.path.exists(os.path.dirname(filename)):
+                os.makedirs(os.path.dirname(filename))
+            with open(filename, 'a') as fle:
+                fle.write('{}: {}\n'.format(datetime.now().isoformat(), text))
+        except OSError as error:
+            print('Unable to write to "{}": {}'.format(filename, error))
+
+    def setStallThreshold(self):
+        msg = (
+            'If the ui stops responding for this many seconds, report where\n'
+            'the main thread was blocked.'
+        )
+        value, success = QInputDialog.getDouble(
+            self, 'Set UI stall threshold', msg, self.stallThreshold, 0.2, 3600, 1
+        )
+        if success:
+            self.stallThreshold = value
+            if self.stallWatchdog is not None:
+                self.stallWatchdog.threshold = value
+
+    def setStallWatchdogEnabled(self, state):
+        """Start or stop reporting when the main thread stops responding."""
+        if state:
+            if self.stallWatchdog is None:
+                self.stallWatchdog = StallWatchdog(
+                    self.stallReported.emit, threshold=self.stallThreshold
+                )
+                self.stallHeartbeatTimer.timeout.connect(self.stallWatchdog.heartbeat)
+                self.stallWatchdog.start()
+                self.stallHeartbeatTimer.start()
+        elif self.stallWatchdog is not None:
+            self.stallHeartbeatTimer.stop()
+            self.stallHeartbeatTimer.timeout.disconnect(self.stallWatchdog.heartbeat)
+            self.stallWatchdog.stop()
+            self.stallWatchdog = None
+
+    def showSamples(self, sampler):
+        """Show the samples of a `SamplingProfiler` in the flame graph."""
+        self.uiFlameGraphPNL.setProfiler(sampler)
+        self.uiFlameGraphDOCK.show()
+        self.uiFlameGraphDOCK.raise_()
+
+    def updateScriptRunning(self, running):
+        """Update the gui when a script starts or stops running on a thread."""
+        self.uiStopACT.setEnabled(running)
+        if running:
+            self.updateScriptStatus()
+            self.scriptStatusTimer.start()
+            return
+
+        self.scriptStatusTimer.stop()
+        if self._promptAfterScript:
+            self._promptAfterScript = False
+            console = self.console()
+            console.startPrompt(console.prompt())
+
+    def updateScriptStatus(self):
+        """Show how long the current script has been running for."""
+        elapsed = self.uiConsoleTXT.scriptElapsed()
+        self.setStatusText('Running: {:0.01f} Seconds'.format(elapsed))
+
     def keyPressEvent(self, event):
         # Fix 'Maya : Qt tools lose focus' https://redmine.blur.com/issues/34430
         if event.modifiers() & (Qt.AltModifier | Qt.ControlModifier | Qt.ShiftModifier):
@@ -656,6 +979,43 @@ class LoggerWindow(Window):
         """Update status text with seconds passed in."""
         self.setStatusText('Exec: {:0.04f} Seconds'.format(seconds))
 
+    def executionSource(self, filename):
+        """Returns the name runs of code compiled with filename are recorded
+        under in the execution history."""
+        if filename == '<ConsolePrEdit>':
+            return 'Console'
+        match = re.match(r'<(Workbox|WorkboxSelection)>:(\d+),(\d+)$', filename)
+        if match is None:
+            return filename
+        group = self.uiWorkboxTAB.widget(int(match.group(2)))
+        if group is None:
+            return filename
+        source = '{}/{}'.format(
+            self.uiWorkboxTAB.tabText(int(match.group(2))),
+            group.tabText(int(match.group(3))),
+        )
+        if match.group(1) == 'WorkboxSelection':
+            source += ' (selection)'
+        return source
+
+    def recordExecution(self, commandText, filename, wall, cpu):
+        """Add a run of code to the execution history."""
+        if not self.uiRecordExecutionHistoryACT.isChecked():
+            return
+        try:
+            self.executionHistory.record(
+                self.executionSource(filename), commandText, wall, cpu=cpu
+            )
+        except sqlite3.Error as error:
+            # Another session may have the database locked, this run is skipped
+            print(
+                'Unable to record execution history: {}'.format(error),
+                file=sys.stderr,
+            )
+            return
+        if self.uiExecutionHistoryDOCK.isVisible():
+            self.uiExecutionHistoryWGT.refresh()
+
     def recordPrefs(self, manual=False):
         if not manual and not self.uiAutoSaveSettingssACT.isChecked():
             return
@@ -685,6 +1045,18 @@ class LoggerWindow(Window):
                 'textEditorCmdTempl': self.textEditorCmdTempl,
                 'currentStyleSheet': self._stylesheet,
                 'flash_time': self.uiConsoleTXT.flash_time,
+                'floodLineLimit': self.uiConsoleTXT.floodGuard.line_limit,
+                'processFilter': self.uiConsoleTXT.processFilter,
+                'maximumBlockCount': self.uiConsoleTXT.maximumBlockCount,
+                'virtualConsole': self.uiVirtualConsoleACT.isChecked(),
+                'executeInThread': self.uiExecuteInThreadACT.isChecked(),
+                'useKernel': self.uiUseKernelACT.isChecked(),
+                'samplingRate': self.samplingRate,
+                'stallWatchdog': self.uiStallWatchdogACT.isChecked(),
+                'stallThreshold': self.stallThreshold,
+                'recordExecutionHistory': (
+                    self.uiRecordExecutionHistoryACT.isChecked()
+                ),
                 'find_files_regex': self.uiFindInWorkboxesWGT.uiRegexBTN.isChecked(),
                 'find_files_cs': (
                     self.uiFindInWorkboxesWGT.uiCaseSensitiveBTN.isChecked()
@@ -827,6 +1199,19 @@ class LoggerWindow(Window):
         else:
             self.setStyleSheet(self._stylesheet)
         self.uiConsoleTXT.flash_time = pref.get('flash_time', 1.0)
+        self.uiConsoleTXT.floodGuard.line_limit = pref.get('floodLineLimit', 2000)
+        self.uiConsoleTXT.processFilter = pref.get('processFilter', '')
+        self.uiConsoleTXT.maximumBlockCount = pref.get('maximumBlockCount', 20000)
+        self.uiVirtualConsoleACT.setChecked(pref.get('virtualConsole', False))
+        self.uiExecuteInThreadACT.setChecked(pref.get('executeInThread', False))
+        # The kernel runs the current python executable, so only use it standalone
+        self.uiUseKernelACT.setChecked(self.standalone and pref.get('useKernel', False))
+        self.samplingRate = pref.get('samplingRate', 200)
+        self.stallThreshold = pref.get('stallThreshold', 1.0)
+        self.uiStallWatchdogACT.setChecked(pref.get('stallWatchdog', False))
+        self.uiRecordExecutionHistoryACT.setChecked(
+            pref.get('recordExecutionHistory', True)
+        )
 
         self.uiWorkboxTAB.restore_prefs(pref.get('workbox_prefs', {}))
 
@@ -865,6 +1250,29 @@ class LoggerWindow(Window):
                     self, "Spell-Check", 'Unable to activate spell check.'
                 )
 
+    def setExecuteInThread(self, state):
+        """Run workbox code on a worker thread so it can be stopped."""
+        self.uiConsoleTXT.executeInThread = state
+
+    def setUseKernel(self, state):
+        """Run all code in a separate worker process."""
+        self.uiConsoleTXT.setKernelEnabled(state)
+        self.uiRestartKernelACT.setEnabled(state)
+        # Profilers only see code run in this process, not in the kernel
+        for action in (
+            self.uiRunAllProfiledACT,
+            self.uiRunSelectedProfiledACT,
+            self.uiRunAllLineTimedACT,
+            self.uiRunAllSampledACT,
+        ):
+            action.setEnabled(not state)
+        # The same goes for tracing memory allocations
+        if state:
+            self.uiTraceAllocationsACT.setChecked(False)
+        self.uiTraceAllocationsACT.setEnabled(
+            not state and AllocationTracer.is_available()
+        )
+
     def setStatusText(self, txt):
         """Set the text shown in the menu corner of the menu bar.
 
@@ -1009,6 +1417,83 @@ class LoggerWindow(Window):
         if success:
             self.uiConsoleTXT.flash_time = value
 
+    def setFloodLineLimit(self):
+        value = self.uiConsoleTXT.floodGuard.line_limit
+        msg = (
+            'If more than this many lines are printed in one second, only show\n'
+            'sample lines and how much output was suppressed.\n'
+            'Setting the value to zero will disable flood protection.'
+        )
+        value, success = QInputDialog.getInt(
+            self, 'Set flood protection', msg, value, 0, 2147483647
+        )
+        if success:
+            self.uiConsoleTXT.floodGuard.line_limit = value
+
+    def setProcessFilter(self):
+        msg = (
+            'Only show the output of child processes captured by\n'
+            'preditor.stream.ProcessCapture whose name matches this pattern,\n'
+            'for example "python*". Leave it empty to show all of them.'
+        )
+        value, success = QInputDialog.getText(
+            self,
+            'Set child process filter',
+            msg,
+            text=self.uiConsoleTXT.processFilter,
+        )
+        if success:
+            self.uiConsoleTXT.processFilter = value.strip()
+
+    def setMaximumBlockCount(self):
+        value = self.uiConsoleTXT.maximumBlockCount
+        msg = (
+            'The maximum number of lines to show in the console. Older lines\n'
+            'are moved to an archive that can still be viewed and searched.\n'
+            'Setting the value to zero will disable the limit.'
+        )
+        value, success = QInputDialog.getInt(
+            self, 'Set maximum console lines', msg, value, 0, 2147483647
+        )
+        if success:
+            self.uiConsoleTXT.maximumBlockCount = value
+            self.uiConsoleTXT.trimScrollback()
+
+    def setSamplingRate(self):
+        msg = (
+            'How many times per second the call stack is sampled by Run All\n'
+            'Sampled and Sample Main Thread. Higher rates record shorter calls\n'
+            'but slow down the sampled code more.'
+        )
+        value, success = QInputDialog.getInt(
+            self, 'Set sampling rate', msg, self.samplingRate, 10, 1000
+        )
+        if success:
+            self.samplingRate = value
+
+    def useVirtualConsole(self, history=None):
+        """Replace the console with a `VirtualConsole`.
+
+        Args:
+            history (stream.Cursor, optional): A cursor that kept the stream
+                manager's history from being cleared by the console being
+                replaced. It is closed before the `VirtualConsole` replays the
+                history.
+        """
+        from .virtual_console import VirtualConsole
+
+        old = self.uiConsoleTXT
+        # Stop the old console from receiving writes
+        old.detachStreamManager()
+        if history is not None:
+            history.close()
+        console = VirtualConsole(self.uiSplitterSPLIT)
+        console.setObjectName(old.objectName())
+        self.uiSplitterSPLIT.insertWidget(self.uiSplitterSPLIT.indexOf(old), console)
+        old.setParent(None)
+        old.deleteLater()
+        self.uiConsoleTXT = console
+
     def setWordWrap(self, state):
         if state:
             self.uiConsoleTXT.setLineWrapMode(self.uiConsoleTXT.WidgetWidth)
@@ -0,0 +1,167 @@
+from __future__ import absolute_import, print_function
+
+from Qt.QtCore import Qt
+from Qt.QtWidgets import (
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from ..delayable_engine import DelayableEngine
+from ..delayable_engine.delayables import Delayable
+from ..utils.object_census import ObjectCensus, print_referrer_chains
+
+
+class ObjectCensusDelayable(Delayable):
+    """Counts the objects of an `ObjectCensus` a chunk at a time so large heaps
+    don't freeze the ui."""
+
+    key = 'object_census'
+    supports = ()
+
+    def loop(self, document, census):
+        if census.step():
+            document.updateProgress(census)
+            return (census,)
+        document.censusFinished(census)
+
+
+class CensusItem(QTreeWidgetItem):
+    """Sorts the count columns as numbers."""
+
+    def __lt__(self, other):
+        column = self.treeWidget().sortColumn()
+        if column == 0:
+            return super(CensusItem, self).__lt__(other)
+        return self.data(column, Qt.UserRole) < other.data(column, Qt.UserRole)
+
+
+class ObjectCensusWidget(QWidget):
+    """Finds leaked objects by comparing the number of live objects of each type
+    between a marked census and a later one.
+
+    The census is counted using its own `DelayableEngine` so the ui stays
+    responsive while counting millions of objects.
+    """
+
+    def __init__(self, parent=None):
+        super(ObjectCensusWidget, self).__init__(parent)
+        # Required by the DelayableEngine to process this widget
+        self.delayable_info = {}
+        self.delayable_engine = DelayableEngine.instance('object_census')
+        self.delayable_engine.add_delayable(
+            ObjectCensusDelayable(self.delayable_engine)
+        )
+        self.delayable_engine.add_document(self)
+        # The census used as the mark and if the census being counted is the mark
+        self.mark = None
+        self._counting = None
+
+        self.uiStatusLBL = QLabel(self)
+        self.uiMarkBTN = QPushButton('Mark', self)
+        self.uiMarkBTN.setToolTip('Count the live objects to compare later censuses to')
+        self.uiMarkBTN.clicked.connect(self.markCensus)
+        self.uiCompareBTN = QPushButton('Compare', self)
+        self.uiCompareBTN.setToolTip(
+            'Count the live objects and show the types that grew since the mark'
+        )
+        self.uiCompareBTN.clicked.connect(self.compareCensus)
+        self.uiReferrersBTN = QPushButton('Show Referrers', self)
+        self.uiReferrersBTN.setToolTip(
+            'Print what refers to some objects of the selected type, starting '
+            'at the module holding them'
+        )
+        self.uiReferrersBTN.clicked.connect(self.showReferrers)
+
+        self.uiTypesTREE = QTreeWidget(self)
+        self.uiTypesTREE.setHeaderLabels(['Type', 'Count', 'Growth'])
+        self.uiTypesTREE.setRootIsDecorated(False)
+        self.uiTypesTREE.setSortingEnabled(True)
+        self.uiTypesTREE.itemSelectionChanged.connect(self.updateButtons)
+        self.uiTypesTREE.itemDoubleClicked.connect(self.showReferrers)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.uiStatusLBL, 1)
+        buttons.addWidget(self.uiMarkBTN)
+        buttons.addWidget(self.uiCompareBTN)
+        buttons.addWidget(self.uiReferrersBTN)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(3, 3, 3, 3)
+        layout.addLayout(buttons)
+        layout.addWidget(self.uiTypesTREE)
+        self.uiStatusLBL.setText('Mark to count the live objects')
+        self.updateButtons()
+
+    def censusFinished(self, census):
+        """Called by the `ObjectCensusDelayable` once all objects are counted."""
+        isMark, self._counting = self._counting, None
+        if isMark:
+            self.mark = census
+            self.uiTypesTREE.clear()
+            self.uiStatusLBL.setText('Marked {} objects'.format(census.total))
+        else:
+            self.showGrowth(census)
+        self.updateButtons()
+
+    def compareCensus(self):
+        self.startCensus(False)
+
+    def markCensus(self):
+        self.startCensus(True)
+
+    def selectedType(self):
+        items = self.uiTypesTREE.selectedItems()
+        if not items:
+            return None
+        return items[0].text(0)
+
+    def showGrowth(self, census):
+        """Show the types that have more objects in `census` than in the mark."""
+        grown = census.diff(self.mark)
+        self.uiTypesTREE.setSortingEnabled(False)
+        self.uiTypesTREE.clear()
+        for name, count, growth in grown:
+            item = CensusItem([name, str(count), '+{}'.format(growth)])
+            item.setData(1, Qt.UserRole, count)
+            item.setData(2, Qt.UserRole, growth)
+            item.setTextAlignment(1, Qt.AlignRight)
+            item.setTextAlignment(2, Qt.AlignRight)
+            self.uiTypesTREE.addTopLevelItem(item)
+        self.uiTypesTREE.setSortingEnabled(True)
+        self.uiTypesTREE.sortByColumn(2, Qt.DescendingOrder)
+        self.uiTypesTREE.resizeColumnToContents(0)
+        self.uiStatusLBL.setText(
+            '{} types grew, {:+d} objects since the mark'.format(
+                len(grown), census.total - self.mark.total
+            )
+        )
+
+    def showReferrers(self):
+        """Print the referrer chains of some objects of the selected type."""
+        name = self.selectedType()
+        if name is None or self._counting is not None:
+            return
+        print_referrer_chains(name)
+
+    def startCensus(self, mark):
+        if self._counting is not None:
+            return
+        self._counting = mark
+        census = ObjectCensus()
+        census.start()
+        self.updateProgress(census)
+        self.updateButtons()
+        self.delayable_engine.enqueue(self, ObjectCensusDelayable.key, census)
+
+    def updateButtons(self):
+        counting = self._counting is not None
+        self.uiMarkBTN.setEnabled(not counting)
+        self.uiCompareBTN.setEnabled(not counting and self.mark is not None)
+        self.uiReferrersBTN.setEnabled(not counting and self.selectedType() is not None)
+
+    def updateProgress(self, census):
+        self.uiStatusLBL.setText('Counting objects: {:.0%}'.format(census.progress))
@@ -0,0 +1,121 @@
+from __future__ import absolute_import
+
+import keyword
+import re
+
+from .codehighlighter import CodeHighlighter
+
+# The block state used for each kind of string that continues onto the next line.
+# Blocks that don't end inside a string use QSyntaxHighlighter's default of -1.
+_QUOTES = ("'''", '"""', "'", '"')
+_QUOTE_STATES = {quote: state for state, quote in enumerate(_QUOTES)}
+
+# Match the rest of a string including the closing quote. Backslashes always escape
+# the next character so this works for raw strings too.
+_STRING_ENDS = {
+    "'''": re.compile(r"(?:[^\\']|\\.|'(?!''))*'''"),
+    '"""': re.compile(r'(?:[^\\"]|\\.|"(?!""))*"""'),
+    "'": re.compile(r"(?:[^\\']|\\.)*'"),
+    '"': re.compile(r'(?:[^\\"]|\\.)*"'),
+}
+
+
+class PythonHighlighter(CodeHighlighter):
+    """Highlights python code with a lexer that tracks strings spanning lines.
+
+    The lexer state at the end of each block, if it ends inside a triple quoted
+    string or a string continued with a backslash, is stored using
+    `setCurrentBlockState`. QSyntaxHighlighter only re-highlights the next block
+    if its incoming state changed, so an edit only re-highlights the lines whose
+    highlighting actually changes.
+
+    The keywords of the language definition are highlighted along with all of
+    python's keywords. In console mode only the commands after the console's
+    prompt, and result lines are highlighted.
+    """
+
+    def compilePattern(self):
+        keywords = sorted(set(self._keywords) | set(keyword.kwlist))
+        self._pattern = re.compile(
+            r'(?P<comment>#[^\n]*)'
+            r'|(?P<string>(?:(?<!\w)[rRbBuUfF]{1,2})?(?:\'\'\'|"""|\'|"))'
+            r'|(?P<keyword>\b(?:%s)\b)' % '|'.join(keywords)
+        )
+
+    def highlightBlock(self, text):
+        """highlights the inputed text block based on the rules of this code
+        highlighter"""
+        if self._pattern is None:
+            return
+        if self.isConsoleMode():
+            self.highlightConsoleBlock(text)
+            return
+        spans, state = self.lex(text, self.previousBlockState())
+        self.formatSpans(text, spans)
+        self.setCurrentBlockState(state)
+
+    def highlightConsoleBlock(self, text):
+        """Each console command is a single line so the block state is not used."""
+        parent = self.parent()
+        prompt = parent.prompt() if hasattr(parent, 'prompt') else '>>> '
+        outputPrompt = getattr(parent, 'outputPrompt', None)
+        if text.startswith(prompt):
+            spans, _ = self.lex(text, -1, len(prompt))
+            self.formatSpans(text, spans)
+        elif outputPrompt and text.startswith(outputPrompt()):
+            self.formatSpans(text, [(0, len(text), 'result')])
+
+    def lex(self, text, state, pos=0):
+        """Find the parts of a line of python code to highlight.
+
+        Args:
+            text (str): The line of code.
+            state (int): The state at the end of the previous line.
+            pos (int, optional): Start lexing at this index of text.
+
+        Returns:
+            list: A (start, end, group) span for each part of text to highlight.
+            int: The state at the end of the line.
+        """
+        spans = []
+        if state in _QUOTE_STATES.values():
+            # Continue the string from the previous line
+            start = pos
+            pos, state = self.lexString(text, pos, _QUOTES[state])
+            spans.append((start, pos, 'string'))
+            if state != -1:
+                return spans, state
+
+        pattern = self._pattern
+        while True:
+            match = pattern.search(text, pos)
+            if match is None:
+                return spans, -1
+            group = match.lastgroup
+            if group == 'string':
+                quote = match.group(group).lstrip('rRbBuUfF')
+                pos, state = self.lexString(text, match.end(), quote)
+                spans.append((match.start(), pos, group))
+                if state != -1:
+                    return spans, state
+            else:
+                spans.append((match.start(), match.end(), group))
+                pos = match.end()
+
+    @classmethod
+    def lexString(cls, text, pos, quote):
+        """Find the end of a string that starts before pos.
+
+        Returns:
+            int: The index after the closing quote, or the length of text if the
+                string does not end on this line.
+            int: The state at the end of the line, -1 unless the string continues
+                onto the next line.
+        """
+        match = _STRING_ENDS[quote].match(text, pos)
+        if match:
+            return match.end(), -1
+        if len(quote) == 3 or text.endswith('\\'):
+            return len(text), _QUOTE_STATES[quote]
+        # A unterminated string, don't let it affect the next line
+        return len(text), -1
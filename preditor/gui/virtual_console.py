@@ -0,0 +1,418 @@
+from __future__ import absolute_import, print_function
+
+from Qt import QtCompat
+from Qt.QtCore import QEvent, Qt
+from Qt.QtGui import QKeySequence, QPainter, QPalette, QTextCursor
+from Qt.QtWidgets import QAbstractScrollArea, QApplication, QFrame
+
+from .. import stream
+from ..utils.line_store import LineStore
+from .console import ConsolePrEdit
+
+
+class OutputView(QAbstractScrollArea):
+    """Paints the lines of a `LineStore` that are visible in the viewport.
+
+    The amount of work done to paint does not depend on how much text is stored so
+    it can show millions of lines. Lines are not wrapped.
+
+    Args:
+        console (VirtualConsole): The console whose output is shown.
+    """
+
+    def __init__(self, console):
+        super(OutputView, self).__init__(console)
+        self.console = console
+        self.store = LineStore()
+        # The (line, column) the mouse selection started and ended at.
+        self.selectionStart = None
+        self.selectionEnd = None
+        self._pressHref = None
+        self.setFocusPolicy(Qt.NoFocus)
+        self.setFrameShape(QFrame.NoFrame)
+        self.viewport().setAutoFillBackground(False)
+        self.viewport().setCursor(Qt.IBeamCursor)
+        self.viewport().setMouseTracking(True)
+
+    def formatAt(self, line, column):
+        """Returns the format of the character at line and column."""
+        for text, fmt in self.store.line_runs(line):
+            if column < len(text):
+                return fmt
+            column -= len(text)
+        return (None, None)
+
+    def hasSelection(self):
+        return bool(self.selectionStart and self.selectionStart != self.selectionEnd)
+
+    def isPinned(self):
+        """If the view is scrolled to the last line."""
+        scrollBar = self.verticalScrollBar()
+        return scrollBar.value() >= scrollBar.maximum()
+
+    def lineHeight(self):
+        return self.fontMetrics().lineSpacing()
+
+    def mouseMoveEvent(self, event):
+        line, column = self.positionAt(event.pos())
+        if event.buttons() & Qt.LeftButton and self.selectionStart:
+            self.selectionEnd = (line, column)
+            self.viewport().update()
+        elif self.formatAt(line, column)[1]:
+            self.viewport().setCursor(Qt.PointingHandCursor)
+        else:
+            self.viewport().setCursor(Qt.IBeamCursor)
+
+    def mousePressEvent(self, event):
+        if event.button() != Qt.LeftButton:
+            return super(OutputView, self).mousePressEvent(event)
+        position = self.positionAt(event.pos())
+        self._pressHref = self.formatAt(*position)[1]
+        self.selectionStart = self.selectionEnd = position
+        self.viewport().update()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() != Qt.LeftButton:
+            return super(OutputView, self).mouseReleaseEvent(event)
+        if self._pressHref and not self.hasSelection():
+            self.console.openHref(self._pressHref)
+        self._pressHref = None
+
+    def paintEvent(self, event):
+        console = self.console
+        palette = console.palette()
+        painter = QPainter(self.viewport())
+        painter.fillRect(self.viewport().rect(), palette.color(QPalette.Base))
+
+        metrics = self.fontMetrics()
+        lineHeight = self.lineHeight()
+        first = self.verticalScrollBar().value()
+        left = -self.horizontalScrollBar().value()
+        last = min(first + self.visibleLineCount() + 1, len(self.store))
+
+        selection = self.selectionRange()
+        font = self.font()
+        linkFont = self.font()
+        linkFont.setUnderline(True)
+        for line in range(first, last):
+            top = (line - first) * lineHeight
+            if selection and selection[0][0] <= line <= selection[1][0]:
+                text = self.store.line(line)
+                start = selection[0][1] if line == selection[0][0] else 0
+                if line == selection[1][0]:
+                    end = metrics.width(text[: selection[1][1]])
+                else:
+                    # Include the newline in the selection
+                    end = metrics.width(text + ' ')
+                start = metrics.width(text[:start])
+                painter.fillRect(
+                    left + start,
+                    top,
+                    end - start,
+                    lineHeight,
+                    palette.color(QPalette.Highlight),
+                )
+
+            x = left
+            for text, fmt in self.store.line_runs(line):
+                painter.setPen(console.formatColor(fmt))
+                painter.setFont(linkFont if fmt[1] else font)
+                painter.drawText(x, top + metrics.ascent(), text)
+                x += metrics.width(text)
+
+    def positionAt(self, point):
+        """Returns the (line, column) of the character nearest to point."""
+        line = self.verticalScrollBar().value() + point.y() // self.lineHeight()
+        line = max(0, min(line, len(self.store) - 1))
+        text = self.store.line(line)
+        x = point.x() + self.horizontalScrollBar().value()
+        # Binary search for the column whose center is closest to x
+        metrics = self.fontMetrics()
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high) // 2
+            center = (metrics.width(text[:mid]) + metrics.width(text[: mid + 1])) / 2
+            if center < x:
+                low = mid + 1
+            else:
+                high = mid
+        return line, low
+
+    def resizeEvent(self, event):
+        super(OutputView, self).resizeEvent(event)
+        self.updateScrollBars()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    def selectedText(self):
+        selection = self.selectionRange()
+        if not selection:
+            return ''
+        (startLine, startColumn), (endLine, endColumn) = selection
+        start = self.store.line_span(startLine)[0] + startColumn
+        end = self.store.line_span(endLine)[0] + endColumn
+        return self.store.text(start, end)
+
+    def selectionRange(self):
+        """Returns the selection as ordered ((line, column), (line, column)) tuples
+        or None if nothing is selected."""
+        if not self.hasSelection():
+            return None
+        return tuple(sorted((self.selectionStart, self.selectionEnd)))
+
+    def updateScrollBars(self, pinned=None):
+        """Update the scroll bar ranges to match the store.
+
+        Args:
+            pinned (bool, optional): Scroll to the last line. Defaults to
+                `isPinned`, so the view follows new output if it was showing
+                the last line.
+        """
+        if pinned is None:
+            pinned = self.isPinned()
+        visible = self.visibleLineCount()
+        scrollBar = self.verticalScrollBar()
+        scrollBar.setRange(0, max(0, len(self.store) - visible))
+        scrollBar.setPageStep(visible)
+
+        width = self.viewport().width()
+        charWidth = self.fontMetrics().averageCharWidth()
+        scrollBar = self.horizontalScrollBar()
+        scrollBar.setRange(0, max(0, self.store.max_line_length * charWidth - width))
+        scrollBar.setPageStep(width)
+        scrollBar.setSingleStep(charWidth)
+
+        if pinned:
+            self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+        self.viewport().update()
+
+    def visibleLineCount(self):
+        return max(1, self.viewport().height() // self.lineHeight())
+
+    def wheelEvent(self, event):
+        if event.modifiers() == Qt.ControlModifier:
+            # Let the console handle font resizing
+            self.console.wheelEvent(event)
+        else:
+            super(OutputView, self).wheelEvent(event)
+
+
+class VirtualConsole(ConsolePrEdit):
+    """A `ConsolePrEdit` that can show millions of lines of output.
+
+    Output is stored in a `LineStore` and shown by a `OutputView` that only paints
+    the visible lines. The QTextDocument only contains the prompt being typed in,
+    it is shown below the output. When a command is executed its lines are moved
+    into the output. This keeps writes and layout fast no matter how much output
+    there is, so `maximumBlockCount` is not used and nothing is archived.
+    """
+
+    def __init__(self, parent):
+        super(VirtualConsole, self).__init__(parent)
+        self.uiOutputVIEW = OutputView(self)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.document().blockCountChanged.connect(self.updateLayout)
+        # The document's scroll bar only scrolls the prompt, track the output's.
+        self.verticalScrollBar().valueChanged.disconnect(self.updatePinnedToBottom)
+        self.verticalScrollBar().rangeChanged.disconnect(self.followOutput)
+        self.connectOutputScrollBar(self.uiOutputVIEW.verticalScrollBar())
+        # Writes made while initializing could not be flushed without the view
+        if self._pendingWrites:
+            self._writeTimer.start(self.writeInterval)
+
+    def changeEvent(self, event):
+        super(VirtualConsole, self).changeEvent(event)
+        # The font is set while ConsolePrEdit is initialized, before the view exists
+        if event.type() == QEvent.FontChange and hasattr(self, 'uiOutputVIEW'):
+            self.uiOutputVIEW.setFont(self.font())
+            self.updateLayout()
+
+    def clear(self):
+        """clears the text in the editor"""
+        self.uiOutputVIEW.store.clear()
+        self.uiOutputVIEW.selectionStart = self.uiOutputVIEW.selectionEnd = None
+        super(VirtualConsole, self).clear()
+        self.uiOutputVIEW.updateScrollBars(True)
+
+    def clearToLastPrompt(self):
+        """Remove all output after the last command that was executed."""
+        self.flush()
+        store = self.uiOutputVIEW.store
+        prompt = self.prompt()
+        for line in range(len(store) - 1, -1, -1):
+            start, end = store.line_span(line)
+            if store.text(start, start + len(prompt)) == prompt:
+                store.truncate(end + 1)
+                break
+        self.uiOutputVIEW.selectionStart = self.uiOutputVIEW.selectionEnd = None
+        self.uiOutputVIEW.updateScrollBars()
+
+    def commitInput(self):
+        """Move all lines of the document except the last one into the output."""
+        document = self.document()
+        if document.blockCount() < 2:
+            return
+        cursor = QTextCursor(document)
+        cursor.setPosition(document.lastBlock().position(), QTextCursor.KeepAnchor)
+        self.appendOutput(cursor.selection().toPlainText(), 'input')
+        cursor.removeSelectedText()
+
+    def appendOutput(self, msg, kind, href=None):
+        """Add text to the output, the text always starts on a new line."""
+        store = self.uiOutputVIEW.store
+        if store.length and store.line_span(-1)[0] != store.length:
+            store.append('\n', (kind, None))
+        store.append(msg, (kind, href))
+
+    def appendHyperlinkedText(self, msg, kind):
+        """Append msg to the output converting the traceback File-info lines found
+        by `tracebackLinks` to hyperlinks."""
+        store = self.uiOutputVIEW.store
+        prefix = self.tracebackLinks.partial
+        links = [
+            link
+            for link in self.tracebackLinks.feed(msg)
+            # Exclude ConsolePrEdits
+            if '<ConsolePrEdit>' not in link.filename
+        ]
+        offset = 0
+        if links and links[0].start < 0:
+            # The link is in a line started by a previous write, replace that part
+            # of the line so the link can be formatted.
+            store.truncate(store.length - len(prefix))
+            msg = prefix + msg
+            offset = len(prefix)
+
+        index = 0
+        for link in links:
+            start, end = link.start + offset, link.end + offset
+            store.append(msg[index:start], (kind, None))
+            href = self.hyperlinkHref(link.filename, link.line_num)[0]
+            store.append(msg[start:end], (kind, href))
+            index = end
+        store.append(msg[index:], (kind, None))
+
+    def flush(self):
+        """Add all buffered writes to the output."""
+        self._writeTimer.stop()
+        # Check that we haven't been garbage collected before trying to write.
+        # This can happen while shutting down a QApplication like Nuke.
+        if not QtCompat.isValid(self) or not hasattr(self, 'uiOutputVIEW'):
+            return
+        view = self.uiOutputVIEW
+        pinned = view.isPinned()
+        self.commitInput()
+        pending, self._pendingWrites = self._pendingWrites, []
+        if pending:
+            window = self.window()
+            doHyperlink = (
+                hasattr(window, 'uiErrorHyperlinksACT')
+                and window.uiErrorHyperlinksACT.isChecked()
+            )
+            partial = self.tracebackLinks.partial
+            store = view.store
+            if doHyperlink and store.text(store.length - len(partial)) != partial:
+                # The last line was changed by something other than a write
+                self.tracebackLinks.reset()
+            for chunks, error in pending:
+                if isinstance(error, stream.ProcessState) and not error.state:
+                    kind = 'process:' + error.name
+                else:
+                    kind = 'error' if error else 'stdout'
+                msg = ''.join(chunks)
+                if doHyperlink:
+                    self.appendHyperlinkedText(msg, kind)
+                else:
+                    store.append(msg, (kind, None))
+        view.updateScrollBars(pinned)
+        if pending:
+            self.outputAdded()
+
+    def formatColor(self, fmt):
+        """Returns the QColor used to draw output text with the format fmt."""
+        kind = fmt[0]
+        if kind == 'stdout':
+            return self.stdoutColor()
+        if kind == 'error':
+            return self.errorMessageColor()
+        if kind == 'comment':
+            return self.commentColor()
+        if kind.startswith('process:'):
+            return self.processColor(kind[len('process:') :])
+        return self.palette().color(QPalette.Text)
+
+    def keyPressEvent(self, event):
+        view = self.uiOutputVIEW
+        if event.matches(QKeySequence.Copy) and view.hasSelection():
+            QApplication.clipboard().setText(view.selectedText())
+        elif event.key() in (Qt.Key_PageUp, Qt.Key_PageDown):
+            scrollBar = view.verticalScrollBar()
+            step = scrollBar.pageStep()
+            if event.key() == Qt.Key_PageUp:
+                step = -step
+            scrollBar.setValue(scrollBar.value() + step)
+        else:
+            super(VirtualConsole, self).keyPressEvent(event)
+
+    def openHref(self, href):
+        """Called when a link in the output is clicked."""
+        self.anchor = href
+        if href.startswith(self.floodHref):
+            self.showFloodOutput(href)
+        else:
+            self.errorHyperlink()
+        self.anchor = None
+
+    def outputGeometry(self):
+        return self.uiOutputVIEW.geometry()
+
+    def outputScrollBar(self):
+        return self.uiOutputVIEW.verticalScrollBar()
+
+    def resizeEvent(self, event):
+        super(VirtualConsole, self).resizeEvent(event)
+        self.updateLayout()
+
+    def startPrompt(self, prompt):
+        super(VirtualConsole, self).startPrompt(prompt)
+        # Move any previous prompt into the output
+        self.commitInput()
+        self.uiOutputVIEW.updateScrollBars(True)
+
+    def trimScrollback(self):
+        """The output is not stored in the document so it doesn't need trimming."""
+
+    def updateLayout(self):
+        """Position the output view above the document showing the prompt."""
+        if not hasattr(self, 'uiOutputVIEW'):
+            return
+        rect = self.contentsRect()
+        lines = min(self.document().blockCount(), 10)
+        inputHeight = (
+            lines * self.fontMetrics().lineSpacing()
+            + 2 * self.document().documentMargin()
+        )
+        outputHeight = int(max(rect.height() - inputHeight, 0))
+        self.setViewportMargins(0, outputHeight, 0, 0)
+        pinned = self.uiOutputVIEW.isPinned()
+        self.uiOutputVIEW.setGeometry(rect.x(), rect.y(), rect.width(), outputHeight)
+        self.uiOutputVIEW.updateScrollBars(pinned)
+        self.ensureCursorVisible()
+
+    def writeFloodMarker(self, lines, chars):
+        """Add a marker to the output showing how much output was suppressed."""
+        self.flush()
+        if not QtCompat.isValid(self):
+            return
+        msg = '[{:,} lines ({:.2f} MB) suppressed, click to view]'.format(
+            lines, chars / (1024.0 * 1024.0)
+        )
+        href = None
+        if self._floodStart is not None:
+            href = '{}{},{}'.format(self.floodHref, *self._floodStart)
+        self.appendOutput(msg, 'error', href)
+        self.uiOutputVIEW.store.append('\n', ('error', None))
+        self.uiOutputVIEW.updateScrollBars()
+        self.outputAdded()
@@ -82,7 +82,12 @@ class WorkboxMixin(object):
 
         # execute the code
         filename = self.__workbox_filename__(selection=True)
-        ret, was_eval = self.__console__().executeString(txt, filename=filename)
+        self.__console__().executeWorkboxString(
+            txt, filename=filename, finished=self.__print_result__
+        )
+
+    def __print_result__(self, ret, was_eval):
+        """Called with the result of the code run by `__exec_selected__`."""
         if was_eval:
             # If the selected code was a statement print the result of the statement.
             ret = repr(ret)
@@ -162,6 +167,19 @@ class WorkboxMixin(object):
     def __load__(self, filename):
         raise NotImplementedError("Mixin method not overridden.")
 
+    def __line_times__(self, hits, times):
+        """Show how many times each line ran and how long it took next to the
+        lines. They are removed the next time the text is edited.
+
+        Args:
+            hits (dict): The number of times each line number ran.
+            times (dict): The seconds spent on each line number.
+
+        Returns:
+            bool: If this workbox is able to show the line times.
+        """
+        return False
+
     def __margins_font__(self):
         raise NotImplementedError("Mixin method not overridden.")
 
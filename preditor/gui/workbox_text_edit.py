@@ -5,7 +5,7 @@ import logging
 from Qt.QtGui import QFont, QFontMetrics, QTextCursor
 from Qt.QtWidgets import QTextEdit
 
-from .codehighlighter import CodeHighlighter
+from .python_highlighter import PythonHighlighter
 from .workbox_mixin import WorkboxMixin
 
 logger = logging.getLogger(__name__)
@@ -28,7 +28,7 @@ class WorkboxTextEdit(WorkboxMixin, QTextEdit):
         super(WorkboxTextEdit, self).__init__(parent=parent, core_name=core_name)
         self._filename = None
         self.__set_console__(console)
-        highlight = CodeHighlighter(self)
+        highlight = PythonHighlighter(self)
         highlight.setLanguage('Python')
         self.uiCodeHighlighter = highlight
 
@@ -51,7 +51,7 @@ class WorkboxTextEdit(WorkboxMixin, QTextEdit):
     def __exec_all__(self):
         txt = self.__text__().rstrip()
         filename = self.__workbox_filename__()
-        self.__console__().executeString(txt, filename=filename)
+        self.__console__().executeWorkboxString(txt, filename=filename)
 
     def __font__(self):
         return self.font()
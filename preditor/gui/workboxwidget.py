@@ -4,17 +4,24 @@ import io
 import re
 import time
 
+from PyQt5.Qsci import QsciStyle
 from Qt.QtCore import Qt
-from Qt.QtGui import QIcon
+from Qt.QtGui import QColor, QFontMetrics, QIcon
 from Qt.QtWidgets import QAction
 
 from .. import core, resourcePath
 from ..gui.workbox_mixin import WorkboxMixin
 from ..scintilla.documenteditor import DocumentEditor, SearchOptions
 from ..scintilla.finddialog import FindDialog
+from ..utils.line_timer import format_duration
 
 
 class WorkboxWidget(WorkboxMixin, DocumentEditor):
+    # The margin used to show the line times passed to `__line_times__`
+    lineTimesMargin = 3
+    # The background colors of the line times, from the fastest to slowest lines
+    lineTimesColors = ('#fff8e8', '#ffe4b8', '#ffc98a', '#ffa066', '#ff7050')
+
     def __init__(
         self, parent=None, console=None, delayable_engine='default', core_name=None
     ):
@@ -22,6 +29,7 @@ class WorkboxWidget(WorkboxMixin, DocumentEditor):
         self._searchFlags = 0
         self._searchText = ''
         self._searchDialog = None
+        self._lineTimeStyles = None
 
         # initialize the super class
         super(WorkboxWidget, self).__init__(
@@ -68,7 +76,7 @@ class WorkboxWidget(WorkboxMixin, DocumentEditor):
     def __exec_all__(self):
         txt = self.__unix_end_lines__(self.text()).rstrip()
         filename = self.__workbox_filename__()
-        self.__console__().executeString(txt, filename=filename)
+        self.__console__().executeWorkboxString(txt, filename=filename)
 
     def __file_monitoring_enabled__(self):
         return self._fileMonitoringActive
@@ -108,6 +116,35 @@ class WorkboxWidget(WorkboxMixin, DocumentEditor):
     def __load__(self, filename):
         self.load(filename)
 
+    def __line_times__(self, hits, times):
+        self.clearLineTimes()
+        if not hits:
+            return True
+        if self._lineTimeStyles is None:
+            # Each QsciStyle allocates a new style number so only create them once
+            font = self.marginsFont()
+            self._lineTimeStyles = [
+                QsciStyle(-1, 'Line Time', QColor(Qt.black), QColor(color), font)
+                for color in self.lineTimesColors
+            ]
+        styles = self._lineTimeStyles
+        slowest = max(times.values()) or 1.0
+        metrics = QFontMetrics(self.marginsFont())
+        width = 0
+        for line, count in hits.items():
+            seconds = times.get(line, 0.0)
+            text = '{} {}x '.format(format_duration(seconds), count)
+            level = min(int(seconds / slowest * len(styles)), len(styles) - 1)
+            # Code line numbers start at one
+            self.setMarginText(line - 1, text, styles[level])
+            width = max(width, metrics.width(text))
+
+        self.setMarginType(self.lineTimesMargin, self.TextMarginRightJustified)
+        self.setMarginWidth(self.lineTimesMargin, width + 5)
+        # Remove the times as soon as the code changes
+        self.textChanged.connect(self.clearLineTimes)
+        return True
+
     def __margins_font__(self):
         return self.marginsFont()
 
@@ -202,6 +239,18 @@ class WorkboxWidget(WorkboxMixin, DocumentEditor):
             else:
                 DocumentEditor.keyPressEvent(self, event)
 
+    def clearLineTimes(self):
+        """Remove the line times added by `__line_times__`."""
+        if not self.marginWidth(self.lineTimesMargin):
+            return
+        try:
+            self.textChanged.disconnect(self.clearLineTimes)
+        except (RuntimeError, TypeError):
+            # Not connected
+            pass
+        self.clearMarginText()
+        self.setMarginWidth(self.lineTimesMargin, 0)
+
     def initShortcuts(self):
         """Use this to set up shortcuts when the DocumentEditor"""
         icon = QIcon(resourcePath('img/text-search-variant.png'))
@@ -0,0 +1,419 @@
+"""Runs python code in a separate worker process.
+
+A crash or a long running script in the worker doesn't take down the process that
+started it. The worker keeps its namespace between runs, like a Jupyter kernel.
+
+The worker connects back to the `Kernel` using a local socket. Everything it
+sends uses the same messages as `preditor.stream.connect` so its ``sys.stdout``
+and ``sys.stderr`` writes and the replies to each execute request arrive in the
+order they were made. Output written directly to the worker's file descriptors,
+for example by C extensions, is captured from its stdout and stderr pipes.
+
+The worker is started by running this module::
+
+    python -m preditor.kernel host port
+
+Any local process can connect to the socket, so the `Kernel` passes a random
+token to the worker in the ``PREDITOR_KERNEL_TOKEN`` environment variable. The
+worker sends it before anything else and connections that don't send it are
+closed, so only the worker can receive the code to run.
+"""
+from __future__ import absolute_import, print_function
+
+import binascii
+import collections
+import hmac
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import types
+
+from .stream import STDERR, STDOUT, ProcessCapture, ProcessState
+from .stream.capture import HEADER, NAME, SocketStream, pack_message, read_messages
+from .utils.execution_history import thread_time
+
+# The states of the messages used to control the worker. The output of the
+# worker uses the stream states.
+_EXECUTE = 4
+_REPLY = 5
+_TOKEN = 6
+
+# The environment variable the worker reads its token from.
+_TOKEN_VAR = 'PREDITOR_KERNEL_TOKEN'
+
+# The name of the ProcessState used for all of the worker's output.
+_NAME = 'kernel:{pid}'
+
+# The signals `Kernel.interrupt` sends to the worker.
+if sys.platform == 'win32':
+    _INTERRUPT_SIGNALS = (signal.SIGINT, signal.SIGBREAK)
+else:
+    _INTERRUPT_SIGNALS = (signal.SIGINT,)
+
+KernelReply = collections.namedtuple(
+    'KernelReply', ('id', 'result', 'was_eval', 'error', 'elapsed', 'cpu')
+)
+KernelReply.__doc__ = """The result of code run by `Kernel.execute`.
+
+Properties:
+    id (int): The id returned by `Kernel.execute`.
+    result (RemoteValue): The value of the code if it was evaluated.
+    was_eval (bool): If the code was compiled in eval mode.
+    error (bool): If the code raised a exception or the kernel stopped before
+        it finished. The traceback is written to the kernel's stderr.
+    elapsed (float): The number of seconds it took to run the code.
+    cpu (float): The seconds of cpu time used to run the code or None if the
+        kernel stopped before it finished.
+"""
+
+
+class RemoteValue(object):
+    """The repr of a value returned by code run in the kernel."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return self.text
+
+    __str__ = __repr__
+
+
+class Kernel(object):
+    """Executes python code in a worker process.
+
+    Requests are run one at a time in the order `execute` was called. The output
+    of the worker is written to manager using a `ProcessState` and callback is
+    called with a `KernelReply` for each request once it has finished. Both of
+    these happen on background threads.
+
+    Args:
+        manager (Manager, optional): The manager to write the output of the
+            worker to. Defaults to the manager returned by `install_to_std`.
+        callback (callable, optional): Called with a `KernelReply` from a
+            background thread when a request finishes.
+        executable (str, optional): The python executable used to run the worker.
+            Defaults to ``sys.executable``.
+    """
+
+    def __init__(self, manager=None, callback=None, executable=None):
+        self.capture = ProcessCapture(manager)
+        self.callback = callback
+        self.executable = executable or sys.executable
+        self.process = None
+        self.name = None
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._pending = collections.OrderedDict()
+        self._sock = None
+        self._unsent = []
+
+    @property
+    def busy(self):
+        """If the worker is running or has code queued to run."""
+        return bool(self._pending)
+
+    @property
+    def elapsed(self):
+        """The number of seconds the current request has been running for."""
+        with self._lock:
+            for start_time in self._pending.values():
+                return time.time() - start_time
+        return 0.0
+
+    def execute(self, code, filename='<Kernel>'):
+        """Run code in the worker, starting it if it isn't running.
+
+        Args:
+            code (str): The source code to run.
+            filename (str, optional): The filename shown in tracebacks.
+
+        Returns:
+            int: The id of the `KernelReply` passed to callback for this request.
+        """
+        if not self.is_alive():
+            self.start()
+        with self._lock:
+            request_id = self._next_id
+            self._next_id += 1
+            self._pending[request_id] = time.time()
+            msg = _pack(
+                _EXECUTE, {'id': request_id, 'code': code, 'filename': filename}
+            )
+            if self._sock is None:
+                # The worker hasn't connected yet
+                self._unsent.append(msg)
+            else:
+                self._sock.sendall(msg)
+        return request_id
+
+    def interrupt(self):
+        """Raise KeyboardInterrupt in the code running in the worker."""
+        if not self.busy or not self.is_alive():
+            return
+        if sys.platform == 'win32':
+            os.kill(self.process.pid, signal.CTRL_BREAK_EVENT)
+        else:
+            os.kill(self.process.pid, signal.SIGINT)
+
+    def is_alive(self):
+        """Returns if the worker process is running."""
+        return self.process is not None and self.process.poll() is None
+
+    def restart(self):
+        """Stop the worker, discarding its namespace, and start a new one."""
+        self.shutdown()
+        self.start()
+
+    def shutdown(self):
+        """Stop the worker process. Any requests that haven't finished are
+        reported as errors."""
+        process, self.process = self.process, None
+        with self._lock:
+            sock, self._sock = self._sock, None
+            self._unsent = []
+        if sock is not None:
+            sock.close()
+        if process is not None and process.poll() is None:
+            process.kill()
+            process.wait()
+        self._fail_pending()
+
+    def start(self):
+        """Start the worker process if it isn't running."""
+        if self.is_alive():
+            return
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        host, port = server.getsockname()
+
+        # Passed in the environment so it isn't shown in the process list
+        token = binascii.hexlify(os.urandom(16))
+        env = dict(os.environ)
+        env[_TOKEN_VAR] = token.decode('ascii')
+        kwargs = {'env': env}
+        if sys.platform == 'win32':
+            # Required to send CTRL_BREAK_EVENT to only the worker
+            kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+        args = [self.executable, '-u', '-m', 'preditor.kernel', host, str(port)]
+        # Output written directly to the worker's pipes uses the same name as
+        # the output it sends over the socket.
+        process = self.capture.popen(args, name=_NAME, **kwargs)
+        self.process = process
+        self.name = _NAME.format(pid=process.pid)
+
+        thread = threading.Thread(
+            target=self._read, args=(server, process, token), name='PrEditorKernel'
+        )
+        thread.daemon = True
+        thread.start()
+
+    def _fail_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, collections.OrderedDict()
+        for request_id in pending:
+            self._reply(KernelReply(request_id, None, False, True, 0.0, None))
+
+    @staticmethod
+    def _accept(server, token, timeout=60):
+        """Accept the connection from the worker.
+
+        Connections that don't send token as their first message within timeout
+        seconds are closed.
+
+        Returns:
+            tuple: The connected socket and the file it is read from, or
+                ``(None, None)`` if the worker didn't connect within timeout.
+        """
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None, None
+            server.settimeout(remaining)
+            try:
+                sock, _ = server.accept()
+            except (EnvironmentError, socket.error):
+                return None, None
+            sock.settimeout(remaining)
+            reader = sock.makefile('rb')
+            try:
+                header = reader.read(HEADER.size)
+                if len(header) == HEADER.size:
+                    state, size = HEADER.unpack(header)
+                    # Check the size before reading so a large size can't be used
+                    # to allocate a lot of memory.
+                    if (
+                        state == _TOKEN
+                        and size == len(token)
+                        and hmac.compare_digest(reader.read(size), token)
+                    ):
+                        sock.settimeout(None)
+                        return sock, reader
+            except (EnvironmentError, socket.error):
+                pass
+            reader.close()
+            sock.close()
+
+    def _read(self, server, process, token):
+        """Accept the connection from the worker and handle its messages."""
+        try:
+            sock, reader = self._accept(server, token)
+        finally:
+            server.close()
+
+        if sock is not None:
+            with self._lock:
+                if self.process is not process:
+                    # The kernel was restarted before this worker connected
+                    reader.close()
+                    sock.close()
+                    return
+                self._sock = sock
+                for msg in self._unsent:
+                    sock.sendall(msg)
+                self._unsent = []
+            try:
+                for state, data in read_messages(reader):
+                    if state == _REPLY:
+                        self._handle_reply(data)
+                    elif state != NAME:
+                        self.capture.manager.write(
+                            data.decode('utf-8', 'replace'),
+                            ProcessState(self.name, state),
+                        )
+            except (EnvironmentError, socket.error):
+                pass
+            finally:
+                reader.close()
+                sock.close()
+
+        if self.process is process:
+            # The worker exited on its own, most likely it crashed
+            code = process.wait()
+            self.process = None
+            with self._lock:
+                self._sock = None
+            self.capture.join(1)
+            self.capture.manager.write(
+                'The kernel process exited with code {}\n'.format(code),
+                ProcessState(self.name, STDERR),
+            )
+            self._fail_pending()
+
+    def _handle_reply(self, data):
+        reply = json.loads(data.decode('utf-8'))
+        with self._lock:
+            self._pending.pop(reply['id'], None)
+        result = reply['result']
+        self._reply(
+            KernelReply(
+                reply['id'],
+                None if result is None else RemoteValue(result),
+                reply['was_eval'],
+                reply['error'],
+                reply['elapsed'],
+                reply['cpu'],
+            )
+        )
+
+    def _reply(self, reply):
+        if self.callback is not None:
+            self.callback(reply)
+
+
+def _pack(state, message):
+    """Returns the bytes sent for a message that is encoded as json."""
+    return pack_message(state, json.dumps(message).encode('utf-8'))
+
+
+class _Worker(object):
+    """Runs the code sent by a `Kernel` in the worker process."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.lock = threading.Lock()
+        # Run the code in a clean __main__ module, not in this one
+        self.main = types.ModuleType('__main__')
+        self.main.__dict__['__builtins__'] = __builtins__
+        sys.modules['__main__'] = self.main
+        sys.argv = ['']
+        sock.sendall(_pack(NAME, _NAME.format(pid=os.getpid())))
+        sys.stdout = SocketStream(sock, STDOUT, self.lock)
+        sys.stderr = SocketStream(sock, STDERR, self.lock)
+
+    @staticmethod
+    def handle_interrupts(handler):
+        for signum in _INTERRUPT_SIGNALS:
+            signal.signal(signum, handler)
+
+    def execute(self, request_id, code, filename):
+        namespace = self.main.__dict__
+        result = None
+        was_eval = error = False
+        start_time = time.time()
+        start_cpu = thread_time()
+        try:
+            try:
+                compiled = compile(code, filename, 'eval')
+                was_eval = True
+            except SyntaxError:
+                compiled = compile(code, filename, 'exec')
+            # Only interrupt the user's code, not the handling of messages.
+            self.handle_interrupts(signal.default_int_handler)
+            try:
+                if was_eval:
+                    value = eval(compiled, namespace, namespace)
+                else:
+                    exec(compiled, namespace, namespace)
+            finally:
+                self.handle_interrupts(signal.SIG_IGN)
+            if was_eval and value is not None:
+                result = repr(value)
+        except BaseException:
+            error = True
+            exc_type, exc_value, tb = sys.exc_info()
+            # Don't include this method in the traceback
+            traceback.print_exception(exc_type, exc_value, tb.tb_next or tb)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        reply = {
+            'id': request_id,
+            'result': result,
+            'was_eval': was_eval,
+            'error': error,
+            'elapsed': time.time() - start_time,
+            'cpu': thread_time() - start_cpu,
+        }
+        with self.lock:
+            self.sock.sendall(_pack(_REPLY, reply))
+
+    def run(self):
+        """Run requests until the `Kernel` closes the connection."""
+        reader = self.sock.makefile('rb')
+        for state, data in read_messages(reader):
+            if state == _EXECUTE:
+                request = json.loads(data.decode('utf-8'))
+                self.execute(request['id'], request['code'], request['filename'])
+
+
+def main(host, port):
+    """Connect to the `Kernel` listening on host and port and run its requests."""
+    # Remove the token so the code that is run and its child processes can't see it
+    token = os.environ.pop(_TOKEN_VAR, '').encode('ascii')
+    sock = socket.create_connection((host, int(port)))
+    sock.sendall(pack_message(_TOKEN, token))
+    worker = _Worker(sock)
+    worker.handle_interrupts(signal.SIG_IGN)
+    worker.run()
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:3])
@@ -30,6 +30,20 @@ Example::
     # directly write to console so there is no reason to duplicate the data to the
     # buffer.
     manager.append_writes = False
+
+Callbacks are called from whatever thread wrote to the stream. If your callback
+updates a gui, set ``manager.dispatch_thread`` to the gui thread. Writes from other
+threads are then queued, ``manager.wakeup`` is called so the gui can schedule a call
+to ``manager.dispatch_queued()`` and the queued writes are delivered on the gui
+thread merged into one block per state.
+
+Consumers that want to read the history at their own pace instead of receiving
+callbacks can use a cursor. Each cursor tracks its own position so consumers can
+join late and catch up on the history without affecting each other::
+
+    cursor = manager.cursor()
+    for msg, state in cursor.read():
+        log_file.write(msg)
 """
 from __future__ import absolute_import, print_function
 
@@ -39,8 +53,13 @@ STDERR = 1
 STDIN = 2
 STDOUT = 3
 
+from .capture import ProcessCapture, ProcessState, connect  # noqa: E402
+from .compact import CompactManager, RecordStore  # noqa: E402
 from .director import Director  # noqa: E402
-from .manager import Manager  # noqa: E402
+from .flood import FloodGuard  # noqa: E402
+from .manager import Cursor, Manager  # noqa: E402
+from .spill import SpillManager  # noqa: E402
+from .writer import AsyncWriter  # noqa: E402
 
 """Set when :py:attr:``install_to_std`` is called. This stores the installed Manager
 so it can be accessed to install callbacks.
@@ -49,16 +68,25 @@ active = None
 
 __all__ = [
     "active",
+    "AsyncWriter",
+    "CompactManager",
+    "connect",
+    "Cursor",
     "Director",
+    "FloodGuard",
     "install_to_std",
     "Manager",
+    "ProcessCapture",
+    "ProcessState",
+    "RecordStore",
+    "SpillManager",
     "STDERR",
     "STDIN",
     "STDOUT",
 ]
 
 
-def install_to_std(out=True, err=True):
+def install_to_std(out=True, err=True, manager=None, **kwargs):
     """Replaces ``sys.stdout`` and ``sys.stderr`` with :py:class:`Director`'s
     using the returned :py:class:`Manager`. This manager is stored as the ``active``
     variable and can be accessed later. This can be called more than once, and it will
@@ -67,14 +95,19 @@ def install_to_std(out=True, err=True):
     Args:
         out (bool, optional): Enables replacement of ``sys.stdout`` on first call.
         err (bool, optional): Enables replacement of ``sys.stderr`` on first call.
+        manager (Manager, optional): The manager to install on first call. For
+            example pass a :py:class:`SpillManager` to keep the entire history on
+            disk. If not provided a :py:class:`Manager` is created.
+        **kwargs: Passed to each :py:class:`Director` created on first call. For
+            example pass ``line_buffered=True`` to only deliver complete lines.
     """
     global active
 
     if active is None:
-        active = Manager()
+        active = Manager() if manager is None else manager
         if out:
-            sys.stdout = Director(active, STDOUT)
+            sys.stdout = Director(active, STDOUT, **kwargs)
         if err:
-            sys.stderr = Director(active, STDERR)
+            sys.stderr = Director(active, STDERR, **kwargs)
 
     return active
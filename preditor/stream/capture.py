@@ -0,0 +1,295 @@
+from __future__ import absolute_import, print_function
+
+import codecs
+import collections
+import io
+import multiprocessing
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import traceback
+
+from . import STDERR, STDOUT
+
+ProcessState = collections.namedtuple('ProcessState', ('name', 'state'))
+ProcessState.__doc__ = """The state used for writes captured from a child process.
+
+Properties:
+    name (str): The name of the process that made the write.
+    state: The stream the process wrote to, ``preditor.stream.STDOUT`` or
+        ``preditor.stream.STDERR``.
+"""
+
+# Each message sent by `connect` is prefixed with its state and length.
+HEADER = struct.Struct('!BI')
+# The state of the first message sent by a connection, it contains its name.
+NAME = 0
+
+
+def pack_message(state, data):
+    """Returns the bytes sent over a socket for a message.
+
+    Args:
+        state (int): The state of the message.
+        data (bytes): The contents of the message.
+    """
+    return HEADER.pack(state, len(data)) + data
+
+
+def read_messages(reader):
+    """Yield the (state, data) of each message read from a socket's file until it
+    is closed.
+
+    Args:
+        reader: The binary file returned by the socket's ``makefile('rb')``.
+    """
+    while True:
+        header = reader.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return
+        state, size = HEADER.unpack(header)
+        yield state, reader.read(size)
+
+
+class ProcessCapture(object):
+    """Captures the stdout and stderr of child processes into a `Manager`.
+
+    Each write is stored with a `ProcessState` so the output of each process can be
+    told apart. The output is read in large chunks by background threads so there
+    is very little overhead per line.
+
+    Use `popen` to start a process with `subprocess.Popen` that has its stdout and
+    stderr captured. Use `process` to create a `multiprocessing.Process` that sends
+    its output back to this process using a local socket. For other uses like a
+    `multiprocessing.Pool`, call `connect` with `address` in the child process::
+
+        capture = ProcessCapture()
+        pool = multiprocessing.Pool(initializer=connect, initargs=(capture.listen(),))
+
+    Args:
+        manager (Manager, optional): The manager to write to. Defaults to the
+            manager returned by `install_to_std`.
+    """
+
+    def __init__(self, manager=None):
+        if manager is None:
+            from . import install_to_std
+
+            manager = install_to_std()
+        self.manager = manager
+        self.address = None
+        self._server = None
+        self._readers = []
+        self._lock = threading.Lock()
+
+    def _read_pipe(self, pipe, state):
+        """Write all of the text read from pipe to the manager."""
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        fd = pipe.fileno()
+        try:
+            while True:
+                data = os.read(fd, 65536)
+                if not data:
+                    break
+                msg = decoder.decode(data)
+                if msg:
+                    self.manager.write(msg, state)
+            msg = decoder.decode(b'', True)
+            if msg:
+                self.manager.write(msg, state)
+        finally:
+            pipe.close()
+
+    def _read_socket(self, conn):
+        """Write all of the messages sent by `connect` to the manager."""
+        reader = conn.makefile('rb')
+        name = None
+        try:
+            for state, data in read_messages(reader):
+                msg = data.decode('utf-8', 'replace')
+                if state == NAME:
+                    name = msg
+                else:
+                    self.manager.write(msg, ProcessState(name, state))
+        finally:
+            reader.close()
+            conn.close()
+
+    def _accept(self, server):
+        while True:
+            try:
+                conn, _ = server.accept()
+            except (EnvironmentError, socket.error):
+                # The server was closed
+                return
+            self._start(self._read_socket, conn)
+
+    def _start(self, target, *args):
+        """Start a reader thread, `join` waits for these threads to finish."""
+        thread = threading.Thread(target=target, args=args, name='ProcessCapture')
+        thread.daemon = True
+        thread.start()
+        with self._lock:
+            self._readers = [t for t in self._readers if t.is_alive()]
+            self._readers.append(thread)
+
+    def close(self):
+        """Stop accepting connections from child processes."""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            self.address = None
+
+    def join(self, timeout=None):
+        """Wait for all of the output of the captured processes that have exited
+        to be written to the manager."""
+        with self._lock:
+            readers = list(self._readers)
+        for thread in readers:
+            thread.join(timeout)
+
+    def listen(self):
+        """Start listening for child processes to connect using `connect`.
+
+        Returns:
+            tuple: The address child processes need to pass to `connect`.
+        """
+        if self._server is None:
+            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server.bind(('127.0.0.1', 0))
+            server.listen(16)
+            self._server = server
+            self.address = server.getsockname()
+            thread = threading.Thread(
+                target=self._accept, args=(server,), name='ProcessCapture'
+            )
+            thread.daemon = True
+            thread.start()
+        return self.address
+
+    def popen(self, args, name=None, **kwargs):
+        """Start a `subprocess.Popen` with its stdout and stderr captured.
+
+        Args:
+            args: The args passed to `subprocess.Popen`.
+            name (str, optional): The name used for the `ProcessState` of the
+                output. ``{pid}`` is replaced with the pid of the process.
+                Defaults to the name of the executable and the pid.
+            **kwargs: Passed to `subprocess.Popen`. If you pass stdout or stderr
+                that stream is not captured.
+
+        Returns:
+            subprocess.Popen: The started process.
+        """
+        kwargs.setdefault('stdout', subprocess.PIPE)
+        kwargs.setdefault('stderr', subprocess.PIPE)
+        proc = subprocess.Popen(args, **kwargs)
+        if name is None:
+            exe = args if isinstance(args, (str, bytes)) else args[0]
+            name = '{}:{}'.format(os.path.basename(str(exe).split()[0]), proc.pid)
+        else:
+            name = name.replace('{pid}', str(proc.pid))
+        if kwargs['stdout'] == subprocess.PIPE:
+            self._start(self._read_pipe, proc.stdout, ProcessState(name, STDOUT))
+        if kwargs['stderr'] == subprocess.PIPE:
+            self._start(self._read_pipe, proc.stderr, ProcessState(name, STDERR))
+        return proc
+
+    def process(self, target, args=(), kwargs=None, name=None, **process_kwargs):
+        """Create a `multiprocessing.Process` with its stdout and stderr captured.
+
+        Args:
+            target (callable): The function called by the process. This needs to
+                be picklable.
+            args (tuple, optional): The args passed to target.
+            kwargs (dict, optional): The keyword arguments passed to target.
+            name (str, optional): The name used for the `ProcessState` of the
+                output. Defaults to the pid of the process.
+            **process_kwargs: Passed to `multiprocessing.Process`.
+
+        Returns:
+            multiprocessing.Process: The process, call its start method to run it.
+        """
+        return multiprocessing.Process(
+            target=_run_captured,
+            args=(self.listen(), name, target, args, kwargs or {}),
+            **process_kwargs
+        )
+
+
+class SocketStream(io.TextIOBase):
+    """A file like object that sends complete lines to a `ProcessCapture` using the
+    socket created by `connect`."""
+
+    def __init__(self, sock, state, lock):
+        super(SocketStream, self).__init__()
+        self.sock = sock
+        self.state = state
+        self._lock = lock
+        self._buffer = []
+
+    def _send(self, msg):
+        data = msg.encode('utf-8', 'replace')
+        with self._lock:
+            self.sock.sendall(pack_message(self.state, data))
+
+    def flush(self):
+        if self._buffer:
+            msg = ''.join(self._buffer)
+            self._buffer = []
+            self._send(msg)
+
+    def write(self, msg):
+        if '\n' not in msg:
+            self._buffer.append(msg)
+            return len(msg)
+        index = msg.rfind('\n') + 1
+        self._buffer.append(msg[:index])
+        self.flush()
+        if index < len(msg):
+            self._buffer.append(msg[index:])
+        return len(msg)
+
+
+def connect(address, name=None):
+    """Send the stdout and stderr of this process to a `ProcessCapture`.
+
+    This should be called in the child process, it replaces ``sys.stdout`` and
+    ``sys.stderr`` with `SocketStream`'s.
+
+    Args:
+        address (tuple): The `ProcessCapture.address` to send the output to.
+        name (str, optional): The name used for the `ProcessState` of the output.
+            Defaults to the pid of this process.
+
+    Returns:
+        socket.socket: The connected socket.
+    """
+    sock = socket.create_connection(address)
+    if name is None:
+        name = 'pid:{}'.format(os.getpid())
+    lock = threading.Lock()
+    SocketStream(sock, NAME, lock)._send(name)
+    sys.stdout = SocketStream(sock, STDOUT, lock)
+    sys.stderr = SocketStream(sock, STDERR, lock)
+    return sock
+
+
+def _run_captured(address, name, target, args, kwargs):
+    """The target of processes created by `ProcessCapture.process`."""
+    stdout, stderr = sys.stdout, sys.stderr
+    sock = connect(address, name)
+    try:
+        return target(*args, **kwargs)
+    except Exception:
+        # Send the traceback to the parent process before the socket is closed
+        traceback.print_exc()
+        raise
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        sys.stdout, sys.stderr = stdout, stderr
+        sock.close()
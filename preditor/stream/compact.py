@@ -0,0 +1,323 @@
+from __future__ import absolute_import, print_function
+
+import collections
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+import six
+
+from .manager import Manager
+
+try:
+    array('Q')
+    _OFFSET_TYPE = 'Q'
+except ValueError:
+    # Python 2 does not support unsigned long long arrays
+    _OFFSET_TYPE = 'L'
+
+# The typecodes used for state ids, the next one is used once the ids don't fit.
+_STATE_TYPES = ('B', 'H', 'L')
+
+
+class RecordStore(object):
+    """Stores (msg, state) records in a few flat arrays instead of a tuple and str
+    object per record.
+
+    The text of every record is stored utf-8 encoded in a single growing buffer.
+    Each record only adds an entry to the `offsets` array, a state id and
+    optionally a timestamp. State ids use one byte until there are more than 256
+    unique states, then the ids array is converted to a wider type. Removing
+    records from the front of the store is done lazily, the arrays are compacted
+    once more than half of them are unused.
+
+    Args:
+        timestamps (bool, optional): Record the time each record was added so
+            they can be queried with `between`.
+
+    Properties:
+        text (bytearray): The encoded text of every record.
+        offsets (array): The start of each record in text. A record ends at the
+            start of the next record or the end of text.
+        states (array): The index of each record's state in the state table.
+        times (array): The `time.time` each record was added, or None if not
+            recording timestamps.
+    """
+
+    def __init__(self, timestamps=False):
+        self.text = bytearray()
+        self.offsets = array(_OFFSET_TYPE)
+        self.states = array('B')
+        self.times = array('d') if timestamps else None
+        # Index of the first record that has not been removed
+        self._first = 0
+        self._state_ids = {}
+        self._states = []
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(len(self)))]
+        return self._record(self._index(index))
+
+    def __iter__(self):
+        # Use a snapshot of the size so records added while iterating are ignored.
+        for i in range(len(self)):
+            yield self._record(i)
+
+    def __len__(self):
+        return len(self.offsets) - self._first
+
+    def __setitem__(self, index, record):
+        if self._index(index) != len(self) - 1:
+            raise IndexError('Only the last record can be replaced.')
+        msg, state = record
+        del self.text[self.offsets[-1] :]
+        self.text.extend(self._encode(msg))
+        self.states[-1] = self._state_id(state)
+
+    def _decode(self, start, end):
+        return self.text[start:end].decode('utf-8', 'replace')
+
+    @classmethod
+    def _encode(cls, msg):
+        if isinstance(msg, six.text_type):
+            return msg.encode('utf-8')
+        return msg
+
+    def _index(self, index):
+        """Convert a record index into a index into the arrays."""
+        count = len(self)
+        if index < 0:
+            index += count
+        if index < 0 or index >= count:
+            raise IndexError('RecordStore index out of range')
+        return index
+
+    def _record(self, index):
+        """Returns the (msg, state) for a record index."""
+        i = self._first + index
+        start = self.offsets[i]
+        end = self.offsets[i + 1] if i + 1 < len(self.offsets) else len(self.text)
+        return self._decode(start, end), self._states[self.states[i]]
+
+    def _state_id(self, state):
+        try:
+            return self._state_ids[state]
+        except KeyError:
+            state_id = self._state_ids[state] = len(self._states)
+            self._states.append(state)
+            if state_id >> (self.states.itemsize * 8):
+                typecode = _STATE_TYPES[_STATE_TYPES.index(self.states.typecode) + 1]
+                self.states = array(typecode, self.states)
+            return state_id
+
+    def append(self, record):
+        """Add a (msg, state) record to the end of the store."""
+        msg, state = record
+        # Get the id first, adding a state may replace the states array
+        state_id = self._state_id(state)
+        self.offsets.append(len(self.text))
+        self.states.append(state_id)
+        if self.times is not None:
+            self.times.append(time.time())
+        self.text.extend(self._encode(msg))
+
+    def between(self, start=None, end=None):
+        """Returns all records added between two timestamps.
+
+        Args:
+            start (float, optional): Include records added at or after this
+                `time.time`. If None, start with the oldest record.
+            end (float, optional): Include records added at or before this
+                `time.time`. If None, include the most recent record.
+
+        Returns:
+            list: The (msg, state) records.
+
+        Raises:
+            ValueError: This store is not recording timestamps.
+        """
+        if self.times is None:
+            raise ValueError('This RecordStore is not recording timestamps.')
+        first = self._first
+        lo = first if start is None else bisect_left(self.times, start, first)
+        hi = len(self.times) if end is None else bisect_right(self.times, end, first)
+        return self[lo - first : hi - first]
+
+    def clear(self):
+        self.__init__(timestamps=self.times is not None)
+
+    def compact(self):
+        """Release the memory used by records removed from the front of the store."""
+        first = self._first
+        if not first:
+            return
+        base = self.offsets[first] if first < len(self.offsets) else len(self.text)
+        del self.text[:base]
+        self.offsets = array(_OFFSET_TYPE, (o - base for o in self.offsets[first:]))
+        self.states = self.states[first:]
+        if self.times is not None:
+            self.times = self.times[first:]
+        self._first = 0
+
+    def nbytes(self):
+        """The number of bytes allocated to store the records."""
+        ret = len(self.text)
+        for arr in (self.offsets, self.states, self.times):
+            if arr is not None:
+                ret += len(arr) * arr.itemsize
+        return ret
+
+    def pop(self):
+        """Remove and return the newest (msg, state) record."""
+        record = self[-1]
+        del self.text[self.offsets.pop() :]
+        self.states.pop()
+        if self.times is not None:
+            self.times.pop()
+        return record
+
+    def popleft(self):
+        """Remove and return the oldest (msg, state) record."""
+        record = self[0]
+        self._first += 1
+        if self._first > 1024 and self._first * 2 > len(self.offsets):
+            self.compact()
+        return record
+
+    def time(self, index):
+        """Returns the `time.time` the record at index was added."""
+        if self.times is None:
+            raise ValueError('This RecordStore is not recording timestamps.')
+        return self.times[self._first + self._index(index)]
+
+
+class CompactManager(Manager):
+    """A Manager that stores its history in a `RecordStore` to reduce the memory
+    used per write.
+
+    It works the same as `Manager` but also supports slicing(``manager[-10:]``)
+    and, if `timestamps` is enabled, querying records by the time they were
+    written using `between`.
+
+    The records are not stored in the deque this class inherits from, so every
+    deque method is overridden to use `records`. Records can only be added to
+    the end and removed from either end, the deque methods that insert, remove
+    or reorder other records raise NotImplementedError.
+
+    Args:
+        maxlen (int, optional): See `Manager`.
+        max_bytes (int, optional): See `Manager`.
+        timestamps (bool, optional): Record the time each record was written.
+    """
+
+    def __init__(self, maxlen=10000, max_bytes=None, timestamps=False):
+        self.records = RecordStore(timestamps=timestamps)
+        super(CompactManager, self).__init__(maxlen=maxlen, max_bytes=max_bytes)
+
+    def __contains__(self, record):
+        return any(item == record for item in self.records)
+
+    def __copy__(self):
+        return collections.deque(self.records, self.maxlen)
+
+    def __delitem__(self, index):
+        index = self.records._index(index)
+        if index == 0:
+            self.popleft()
+        elif index == len(self) - 1:
+            self.pop()
+        else:
+            self._unsupported()
+
+    def __eq__(self, other):
+        if not isinstance(other, collections.deque):
+            return NotImplemented
+        return len(self) == len(other) and list(self) == list(other)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def __iadd__(self, records):
+        self.extend(records)
+        return self
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __ne__(self, other):
+        ret = self.__eq__(other)
+        return ret if ret is NotImplemented else not ret
+
+    def _iter_memory(self):
+        return iter(self.records)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, len(self))
+
+    def __reversed__(self):
+        for i in range(len(self) - 1, -1, -1):
+            yield self.records[i]
+
+    def __setitem__(self, index, record):
+        self.records[index] = record
+
+    def __sizeof__(self):
+        return super(CompactManager, self).__sizeof__() + self.records.nbytes()
+
+    @classmethod
+    def _unsupported(cls, *args, **kwargs):
+        raise NotImplementedError(
+            'CompactManager only supports adding records to the end and removing '
+            'them from either end.'
+        )
+
+    __add__ = __mul__ = __imul__ = appendleft = extendleft = insert = _unsupported
+    remove = reverse = rotate = _unsupported
+    __hash__ = None
+
+    def append(self, record):
+        if self.maxlen is not None and len(self) >= self.maxlen:
+            # Like a deque, discard the oldest record once maxlen is reached
+            if not self.maxlen:
+                return
+            self.records.popleft()
+        self.records.append(record)
+
+    def between(self, start=None, end=None):
+        """Returns the (msg, state) records written between two `time.time` values.
+        See `RecordStore.between`."""
+        return self.records.between(start, end)
+
+    def clear(self):
+        # Manager.clear advances first_index by len(self), so clear the records
+        # after it.
+        super(CompactManager, self).clear()
+        self.records.clear()
+
+    def copy(self):
+        """Returns a `collections.deque` of the records."""
+        return self.__copy__()
+
+    def count(self, record):
+        return sum(1 for item in self.records if item == record)
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def index(self, record, start=0, stop=None):
+        stop = len(self) if stop is None else stop
+        for i in range(*slice(start, stop).indices(len(self))):
+            if self.records[i] == record:
+                return i
+        raise ValueError('{!r} is not in {}'.format(record, type(self).__name__))
+
+    def pop(self):
+        return self.records.pop()
+
+    def popleft(self):
+        return self.records.popleft()
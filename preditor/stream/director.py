@@ -2,8 +2,11 @@ from __future__ import absolute_import, print_function
 
 import io
 import sys
+import threading
+from timeit import default_timer
 
 from . import STDERR, STDOUT
+from .writer import AsyncWriter
 
 
 class Director(io.TextIOBase):
@@ -21,12 +24,55 @@ class Director(io.TextIOBase):
             DCC's script editors. Pass False to disable this feature. If you pass None
             and state is set to ``preditor.stream.STDOUT`` or ``preditor.stream.STDERR``
             this will automatically be set to the current sys.stdout or sys.stderr.
+        line_buffered (bool, optional): Collect partial writes and only pass complete
+            lines to the manager and old_stream. Useful when something writes a
+            few characters at a time. Partial lines are delivered once
+            `buffer_size` is reached, `flush_interval` seconds after they were
+            written or when `flush` or `close` is called.
+        buffer_size (int, optional): When line_buffered, deliver the buffered text
+            once it reaches this length even if it doesn't contain a newline.
+        flush_interval (float, optional): When line_buffered, deliver any partial
+            line that has been waiting for this many seconds.
+        async_writes (bool, optional): Write to old_stream from a background thread
+            using a :py:class:`AsyncWriter` so slow streams don't slow down the
+            thread that is writing.
+        queue_size (int, optional): When async_writes, the maximum number of writes
+            to queue for old_stream.
+        overflow (str, optional): When async_writes, what to do if the queue is
+            full. See :py:class:`AsyncWriter`.
+
+    Properties:
+        writer (AsyncWriter): Used to write to old_stream if async_writes was
+            enabled, otherwise None.
     """
 
-    def __init__(self, manager, state, old_stream=None, *args, **kwargs):
+    def __init__(
+        self,
+        manager,
+        state,
+        old_stream=None,
+        line_buffered=False,
+        buffer_size=4096,
+        flush_interval=0.1,
+        async_writes=False,
+        queue_size=1000,
+        overflow=AsyncWriter.BLOCK,
+        *args,
+        **kwargs
+    ):
         super(Director, self).__init__(*args, **kwargs)
         self.manager = manager
         self.state = state
+        self.line_buffered = line_buffered
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._buffer_len = 0
+        self._buffer_lock = threading.RLock()
+        self._buffer_changed = threading.Condition(self._buffer_lock)
+        # When the buffered partial line needs to be delivered by the flusher
+        self._buffer_deadline = None
+        self._flusher = None
 
         # Keep track of whether we wrapped a std stream
         # that way we don't .close() any streams that we don't control
@@ -48,8 +94,80 @@ class Director(io.TextIOBase):
                     old_stream = sys.stderr
 
         self.old_stream = old_stream
+        self.writer = None
+        if async_writes and old_stream:
+            self.writer = AsyncWriter(old_stream, maxsize=queue_size, overflow=overflow)
+
+    def _deliver(self, msg):
+        """Pass msg to the manager and old_stream."""
+        self.manager.write(msg, self.state)
+
+        if self.writer:
+            self.writer.write(msg)
+        elif self.old_stream:
+            self.old_stream.write(msg)
+
+    def _flush_buffer(self):
+        """Deliver any text buffered by line_buffered including partial lines."""
+        with self._buffer_lock:
+            self._buffer_deadline = None
+            if not self._buffer:
+                return
+            msg = ''.join(self._buffer)
+            self._buffer = []
+            self._buffer_len = 0
+            self._deliver(msg)
+
+    def _line_buffer(self, msg):
+        """Add msg to the line buffer and deliver any complete lines."""
+        with self._buffer_lock:
+            self._buffer.append(msg)
+            self._buffer_len += len(msg)
+            if self._buffer_len >= self.buffer_size:
+                self._flush_buffer()
+                return
+
+            if '\n' in msg:
+                text = ''.join(self._buffer)
+                index = text.rfind('\n') + 1
+                remainder = text[index:]
+                self._buffer = [remainder] if remainder else []
+                self._buffer_len = len(remainder)
+                # Deliver while holding the lock so writes from multiple threads
+                # reach the manager in the order they were buffered.
+                self._deliver(text[:index])
+
+            if not self._buffer:
+                self._buffer_deadline = None
+            elif self._buffer_deadline is None:
+                # Make sure a partial line is shown even if nothing else is written
+                self._buffer_deadline = default_timer() + self.flush_interval
+                if self._flusher is None:
+                    self._flusher = threading.Thread(
+                        target=self._flush_partial_lines, name='DirectorFlusher'
+                    )
+                    self._flusher.daemon = True
+                    self._flusher.start()
+                self._buffer_changed.notify()
+
+    def _flush_partial_lines(self):
+        """Run by a single background thread that delivers partial lines once
+        they have been buffered for flush_interval."""
+        with self._buffer_lock:
+            while not self.closed:
+                if self._buffer_deadline is None:
+                    self._buffer_changed.wait()
+                    continue
+                remaining = self._buffer_deadline - default_timer()
+                if remaining > 0:
+                    self._buffer_changed.wait(remaining)
+                else:
+                    self._flush_buffer()
 
     def close(self):
+        self._flush_buffer()
+        if self.writer:
+            self.writer.close()
         if (
             self.old_stream
             and not self.std_stream_wrapped
@@ -59,15 +177,21 @@ class Director(io.TextIOBase):
             self.old_stream.close()
 
         super(Director, self).close()
+        with self._buffer_lock:
+            # Let the flusher thread exit
+            self._buffer_changed.notify()
 
     def flush(self):
-        if self.old_stream:
+        self._flush_buffer()
+        if self.writer:
+            self.writer.flush()
+        elif self.old_stream:
             self.old_stream.flush()
 
         super(Director, self).flush()
 
     def write(self, msg):
-        self.manager.write(msg, self.state)
-
-        if self.old_stream:
-            self.old_stream.write(msg)
+        if self.line_buffered:
+            self._line_buffer(msg)
+        else:
+            self._deliver(msg)
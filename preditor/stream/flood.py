@@ -0,0 +1,125 @@
+from __future__ import absolute_import, print_function
+
+import time
+
+
+class FloodGuard(object):
+    """Limits how much text is passed on when text is written faster than a gui
+    can reasonably display it.
+
+    Writes are passed to `write` unchanged until more than `line_limit` lines are
+    written within `window` seconds. While flooding, only a single sample line is
+    passed to `write` every `sample_interval` seconds. Before each sample, and
+    when the flood ends, `suppressed` is called with the number of lines and
+    characters that were not passed on. The flood ends once fewer than
+    `line_limit` lines are written within a window. Call `poll` periodically while
+    `flooding` so the end of a flood is detected even if nothing else is written.
+
+    Args:
+        write (callable): Called with (msg, state) for text that should be shown.
+        suppressed (callable): Called with (lines, chars) for text that was
+            suppressed since the last sample.
+        line_limit (int, optional): The number of lines per window that triggers
+            flood protection. Pass 0 to disable flood protection.
+        sample_interval (float, optional): The seconds between sample lines while
+            flooding.
+        window (float, optional): The number of seconds lines are counted over.
+        clock (callable, optional): Returns the current time in seconds.
+
+    Properties:
+        flooding (bool): If writes are currently being suppressed.
+    """
+
+    sample_limit = 1000
+    """Sample lines are cut off after this many characters."""
+
+    def __init__(
+        self,
+        write,
+        suppressed,
+        line_limit=2000,
+        sample_interval=0.5,
+        window=1.0,
+        clock=time.time,
+    ):
+        self.write_callback = write
+        self.suppressed_callback = suppressed
+        self.line_limit = line_limit
+        self.sample_interval = sample_interval
+        self.window = window
+        self.clock = clock
+        self.flooding = False
+        self._window_start = clock()
+        self._window_lines = 0
+        self._last_sample = 0
+        self._suppressed_lines = 0
+        self._suppressed_chars = 0
+        # The last complete line and the partial line after it written while
+        # flooding. Writes are often split, print writes the text and the newline
+        # separately, so the sample is built across writes.
+        self._last_line = ''
+        self._partial = ''
+
+    def _report(self):
+        """Pass the count of suppressed text to the suppressed callback."""
+        if self._suppressed_lines or self._suppressed_chars:
+            self.suppressed_callback(self._suppressed_lines, self._suppressed_chars)
+        self._suppressed_lines = 0
+        self._suppressed_chars = 0
+
+    def _update_window(self, now):
+        if now - self._window_start < self.window:
+            return
+        if self.flooding and self._window_lines < self.line_limit:
+            self.flooding = False
+            self._report()
+        self._window_start = now
+        self._window_lines = 0
+
+    def poll(self):
+        """End the flood if the write rate has dropped. Returns `flooding`."""
+        self._update_window(self.clock())
+        return self.flooding
+
+    def write(self, msg, state):
+        """Pass msg to the write callback unless flooding."""
+        if not self.line_limit:
+            self.write_callback(msg, state)
+            return
+
+        now = self.clock()
+        self._update_window(now)
+        lines = msg.count('\n')
+        self._window_lines += lines
+
+        if not self.flooding:
+            self.write_callback(msg, state)
+            if self._window_lines > self.line_limit:
+                self.flooding = True
+                self._last_sample = now
+                self._partial = ''
+            return
+
+        self._suppressed_lines += lines
+        self._suppressed_chars += len(msg)
+        if not lines:
+            if len(self._partial) < self.sample_limit:
+                self._partial += msg
+            return
+
+        head, _, tail = msg.rpartition('\n')
+        line = head.rsplit('\n', 1)[-1]
+        if lines == 1:
+            line = self._partial + line
+        self._last_line = line[: self.sample_limit]
+        self._partial = tail[: self.sample_limit]
+        if now - self._last_sample < self.sample_interval:
+            return
+
+        # Show the last complete line as a sample
+        self._last_sample = now
+        sample = self._last_line + '\n'
+        self._suppressed_lines -= 1
+        self._suppressed_chars = max(self._suppressed_chars - len(sample), 0)
+        self._report()
+        self.write_callback(sample, state)
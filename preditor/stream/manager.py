@@ -1,8 +1,91 @@
 from __future__ import absolute_import, print_function
 
 import collections
+import itertools
+import re
+import threading
 
 from ..weakref import WeakList
+from . import STDERR
+
+
+def encoded_size(msg):
+    """Returns the number of bytes msg uses when encoded as utf-8."""
+    if isinstance(msg, bytes):
+        return len(msg)
+    return len(msg.encode('utf-8', 'replace'))
+
+
+def merge_writes(writes):
+    """Merges consecutive writes that share the same state into a single write.
+
+    Args:
+        writes (iterable): The (msg, state) tuples to merge.
+
+    Returns:
+        list: The merged (msg, state) tuples. No two adjacent items share a state.
+    """
+    ret = []
+    chunks = []
+    current = None
+    for msg, state in writes:
+        if chunks and state != current:
+            ret.append((''.join(chunks), current))
+            chunks = []
+        current = state
+        chunks.append(msg)
+    if chunks:
+        ret.append((''.join(chunks), current))
+    return ret
+
+
+class Cursor(object):
+    """A read position in a Manager's history. Each consumer of the history can
+    use its own cursor to read new records at its own pace.
+
+    Use `Manager.cursor` to create a cursor. Cursors are only weakly referenced
+    by their manager so a cursor that is no longer used doesn't prevent
+    `Manager.trim_consumed` from trimming the history. Call `close` once the
+    cursor is no longer needed so the manager can stop retaining history for it.
+
+    Properties:
+        manager (Manager): The manager this cursor reads from.
+        index (int): The absolute index of the record the cursor is in. Unlike
+            an index into the manager this is not changed when older records are
+            removed. See `Manager.first_index`.
+        offset (int): The number of characters of the record at index that have
+            already been read. Records may still grow if the manager merges writes.
+        missed_records (int): The number of records that were removed from the
+            manager before this cursor read them.
+    """
+
+    def __init__(self, manager, index, offset=0):
+        self.manager = manager
+        self.index = index
+        self.offset = offset
+        self.missed_records = 0
+
+    def close(self):
+        """Stop tracking this cursor on the manager."""
+        self.manager.remove_cursor(self)
+
+    def pending(self):
+        """Returns the number of records that have not been completely read."""
+        manager = self.manager
+        return max(manager.first_index + len(manager) - self.consumed(), 0)
+
+    def consumed(self):
+        """Returns the absolute index of the first record not completely read."""
+        manager = self.manager
+        i = self.index - manager.first_index
+        if 0 <= i < len(manager) and self.offset >= len(manager[i][0]):
+            return self.index + 1
+        return self.index
+
+    def read(self):
+        """Returns all of the (msg, state) records written since the last read
+        and moves the cursor to the end of the history."""
+        return self.manager.read_cursor(self)
 
 
 class Manager(collections.deque):
@@ -12,17 +95,98 @@ class Manager(collections.deque):
 
     Args:
         maxlen (int, optional): The maximum number of raw writes to store. If this is
-            exceeded, the oldest writes are discarded.
+            exceeded, the oldest writes are discarded. Pass None for no limit.
+        max_bytes (int, optional): If set, the size of the stored text is limited
+            instead of just the number of writes. Consecutive writes that share a
+            state are merged into a single record(up to `merge_limit` in size) and
+            the oldest records are discarded once the total size exceeds this.
+            Size is measured in bytes of utf-8 encoded text.
 
     Properties:
         store_writes (bool): Set this to False if you no longer want write calls to
             store on the manager.
+        retain_history (bool): If True, consumers like the PrEditor console should
+            not disable or clear the stored history when they attach to this
+            manager. Setting this or creating a `cursor` starts storing writes
+            again if `add_callback` disabled it. If max_bytes is not set, it is
+            set to `history_max_bytes` at that point so the retained history
+            stays bounded. This is also True while any cursor is attached. Once
+            the last cursor is removed, and this wasn't set, store_writes and
+            max_bytes are restored. The history stored until then is kept.
+        size (int): The utf-8 encoded size in bytes of the text currently stored.
+        dropped_bytes (int): The utf-8 encoded size in bytes of the text that has
+            been discarded because maxlen or max_bytes was exceeded.
+        dropped_records (int): The number of records that have been discarded.
+        first_index (int): The absolute index of the oldest stored record. This is
+            increased every time a record is removed from the front of the
+            history and is used by `Cursor`'s to track their position.
+        cursors (WeakList): The `Cursor`'s created by `cursor` that are reading
+            from this manager.
+        dispatch_thread (threading.Thread): If set, callbacks are only ever called
+            from this thread. Writes made from any other thread are queued until
+            `dispatch_queued` is called from this thread. This is normally the gui
+            thread so callbacks can safely update Qt widgets.
+        wakeup (callable): Called with no arguments by the writing thread when a
+            write is queued and the queue was empty. Use this to schedule a call to
+            `dispatch_queued` on the `dispatch_thread`, for example by emitting a
+            queued Qt signal. If it returns False the dispatch thread can no longer
+            be woken, for example because its gui was destroyed. `dispatch_thread`
+            and `wakeup` are then cleared and the queued writes are delivered
+            directly.
     """
 
-    def __init__(self, maxlen=10000):
+    dropped_format = u'[{bytes:,} bytes of older output were discarded]\n'
+    """The message passed to callbacks by `add_callback` when replaying if some of
+    the history has been discarded. It is formatted with `bytes` and `records`."""
+
+    merge_limit = 4096
+    """When using max_bytes, don't merge writes into records larger than this many
+    bytes."""
+
+    history_max_bytes = 1024 * 1024
+    """The max_bytes used when `retain_history` re-enables storing writes on a
+    manager without a max_bytes."""
+
+    trim_consumed = False
+    """If True, records are removed from the history once every cursor has read
+    them, instead of only when maxlen or max_bytes is exceeded. This has no effect
+    if no cursors are attached."""
+
+    def __init__(self, maxlen=10000, max_bytes=None):
         super(Manager, self).__init__(maxlen=maxlen)
         self.callbacks = WeakList()
         self.store_writes = True
+        self._retain_history = False
+        # The store_writes and max_bytes to restore once no cursors need history
+        self._unretained = None
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.dropped_bytes = 0
+        self.dropped_records = 0
+        self.first_index = 0
+        self.cursors = WeakList()
+        self.dispatch_thread = None
+        self.wakeup = None
+        self._lock = threading.Lock()
+        self._queue = []
+        # The encoded size of the last record, used to respect merge_limit
+        self._last_size = 0
+
+    @property
+    def retain_history(self):
+        return self._retain_history or bool(self._unretained)
+
+    @retain_history.setter
+    def retain_history(self, retain):
+        self._retain_history = retain
+        if retain:
+            self._store_history()
+
+    def _store_history(self):
+        if not self.store_writes:
+            self.store_writes = True
+            if self.max_bytes is None:
+                self.max_bytes = self.history_max_bytes
 
     def add_callback(self, callback, replay=False, disable_writes=False, clear=False):
         """Add a callable that will be called every time write is called.
@@ -32,13 +196,22 @@ class Manager(collections.deque):
                 take two arguments (msg, state). See write for more details.
             replay (bool, optional): If True, then iterate over all the stored writes
                 and pass them to callback. This is useful for when you are initializing
-                a gui and want to include all previous prints.
+                a gui and want to include all previous prints. If any history has
+                been discarded, `dropped_format` is passed first using the
+                ``preditor.stream.STDERR`` state.
             disable_writes (bool, optional): Set store_writes to False if this is True.
             clear (bool, optional): Clear the stored history on this object.
         """
         self.callbacks.append(callback)
 
         if replay:
+            if self.dropped_records:
+                callback(
+                    self.dropped_format.format(
+                        bytes=self.dropped_bytes, records=self.dropped_records
+                    ),
+                    STDERR,
+                )
             # Replay the existing prints into the console.
             for msg, state in self:
                 callback(msg, state)
@@ -52,23 +225,260 @@ class Manager(collections.deque):
         if clear:
             self.clear()
 
+    def clear(self):
+        """Remove all stored writes and reset the size and dropped counters."""
+        self.first_index += len(self)
+        super(Manager, self).clear()
+        self.size = 0
+        self._last_size = 0
+        self.dropped_bytes = 0
+        self.dropped_records = 0
+
+    def _discard(self, msg, state):
+        """Called with each record removed from memory by maxlen or max_bytes.
+
+        Subclasses can override this to store the record somewhere else.
+        """
+        self.dropped_bytes += encoded_size(msg)
+        self.dropped_records += 1
+
+    def _drop_oldest(self):
+        """Remove the oldest record from memory updating size and passing it to
+        `_discard`."""
+        msg, state = self.popleft()
+        # Move cursors that completely read this record to the start of the next
+        # record so it isn't reported as missed.
+        for cursor in self.cursors:
+            if cursor.index == self.first_index and cursor.offset >= len(msg):
+                cursor.index += 1
+                cursor.offset = 0
+        self.first_index += 1
+        self.size -= encoded_size(msg)
+        self._discard(msg, state)
+
+    def _iter_memory(self):
+        """Iterate over the records stored in memory. Cursors only read these."""
+        return super(Manager, self).__iter__()
+
+    def _store(self, msg, state):
+        """Add a write to the history respecting maxlen and max_bytes."""
+        if self.maxlen == 0:
+            return
+
+        size = encoded_size(msg)
+        if self.max_bytes is not None and self:
+            last, last_state = self[-1]
+            if last_state == state and self._last_size + size <= self.merge_limit:
+                # Run-length merge consecutive writes of the same state.
+                self[-1] = (last + msg, state)
+                self._last_size += size
+                self.size += size
+                msg = None
+
+        if msg is not None:
+            if self.maxlen is not None and len(self) >= self.maxlen:
+                # Account for the record deque is about to discard
+                self._drop_oldest()
+            self.append((msg, state))
+            self._last_size = size
+            self.size += size
+
+        if self.max_bytes is not None:
+            while self.size > self.max_bytes and self:
+                self._drop_oldest()
+
+    def cursor(self, from_start=True):
+        """Create a `Cursor` for reading the history of this manager.
+
+        Args:
+            from_start (bool, optional): If True, the cursor starts at the oldest
+                stored record so it will catch up on the existing history,
+                otherwise it only reads records written after it was created.
+
+        Returns:
+            Cursor: The new cursor.
+        """
+        # The cursor can only read writes that are stored
+        if self._unretained is None:
+            self._unretained = (self.store_writes, self.max_bytes)
+            self._store_history()
+        with self._lock:
+            if from_start or not self:
+                cursor = Cursor(self, self.first_index)
+            else:
+                cursor = Cursor(
+                    self, self.first_index + len(self) - 1, len(self[-1][0])
+                )
+            self.cursors.append(cursor)
+        return cursor
+
+    def read_cursor(self, cursor):
+        """Returns the records cursor has not read yet and moves it to the end.
+
+        If `trim_consumed` is enabled, records every cursor has read are removed.
+
+        Returns:
+            list: The (msg, state) records. The first item may only be the end of
+                a record if the cursor already read part of it.
+        """
+        with self._lock:
+            if cursor.index < self.first_index:
+                cursor.missed_records += self.first_index - cursor.index
+                cursor.index = self.first_index
+                cursor.offset = 0
+
+            start = cursor.index - self.first_index
+            ret = []
+            for msg, state in itertools.islice(self._iter_memory(), start, None):
+                if cursor.offset:
+                    msg = msg[cursor.offset :]
+                    cursor.offset = 0
+                if msg:
+                    ret.append((msg, state))
+
+            if self:
+                # Stay in the last record as more writes may be merged into it.
+                cursor.index = self.first_index + len(self) - 1
+                cursor.offset = len(self[-1][0])
+
+            if self.trim_consumed:
+                self._trim()
+        return ret
+
     def remove_callback(self, callback):
         self.callbacks.remove(callback)
 
+    def remove_cursor(self, cursor):
+        """Stop tracking cursor. Once no cursors are left, stop retaining history
+        for them, see `retain_history`."""
+        if cursor in self.cursors:
+            self.cursors.remove(cursor)
+        if not self.cursors and self._unretained:
+            unretained, self._unretained = self._unretained, None
+            if not self._retain_history:
+                self.store_writes, self.max_bytes = unretained
+
+    def trim(self):
+        """Remove the records that every cursor has completely read.
+
+        Returns:
+            int: The number of records removed.
+        """
+        with self._lock:
+            return self._trim()
+
+    def _trim(self):
+        cursors = list(self.cursors)
+        if not cursors:
+            return 0
+        count = min(cursor.consumed() for cursor in cursors) - self.first_index
+        for _ in range(count):
+            self._drop_oldest()
+        return max(count, 0)
+
+    def dispatch_queued(self):
+        """Pass any writes queued by other threads to the callbacks.
+
+        This must be called from the `dispatch_thread`. Consecutive queued writes
+        with the same state are merged so each callback is called once per block
+        of text instead of once per write.
+
+        Returns:
+            int: The number of queued writes that were processed.
+        """
+        with self._lock:
+            queue, self._queue = self._queue, []
+
+        for msg, state in merge_writes(queue):
+            for callback in self.callbacks:
+                callback(msg, state)
+        return len(queue)
+
+    def stop_dispatch(self):
+        """Stop queueing writes for the `dispatch_thread` and deliver any writes
+        that are already queued from the calling thread."""
+        with self._lock:
+            self.dispatch_thread = None
+            self.wakeup = None
+        self.dispatch_queued()
+
     def get_value(self, fmt="[{state}:{msg}]"):
         return ''.join([fmt.format(msg=d[0], state=d[1]) for d in self])
 
+    def search(self, pattern, flags=0):
+        """Yields each line of the stored history that matches a regular expression.
+
+        The history is processed one record at a time so this does not need to
+        build the entire history as a single string.
+
+        Args:
+            pattern (str): The regular expression to search for.
+            flags (int, optional): Flags passed to `re.compile`.
+
+        Yields:
+            line (str): The text of the matching line without its newline.
+            state: The state of the record the line ended in.
+        """
+        regex = re.compile(pattern, flags)
+        partial = []
+        for msg, state in self:
+            lines = msg.split('\n')
+            for i, line in enumerate(lines):
+                if i == len(lines) - 1:
+                    # This line is continued by the next record
+                    if line:
+                        partial.append(line)
+                    break
+                if partial:
+                    partial.append(line)
+                    line = ''.join(partial)
+                    partial = []
+                if regex.search(line):
+                    yield line, state
+        if partial:
+            line = ''.join(partial)
+            if regex.search(line):
+                yield line, state
+
     def write(self, msg, state):
         """Adds the written text to the manager and passes it to any attached callbacks.
 
+        If `dispatch_thread` is set and this is called from another thread, the
+        write is queued and the callbacks are called later by `dispatch_queued`.
+
         Args:
             msg (str): The text to be written.
             state: A identifier for how the text is to be written. For example if this
                 write is coming from sys.stderr this will likely be set to
                 ``preditor.stream.STDERR``.
         """
-        if self.store_writes:
-            self.append((msg, state))
+        queued = False
+        wakeup = None
+        with self._lock:
+            if self.store_writes:
+                self._store(msg, state)
+
+            dispatch_thread = self.dispatch_thread
+            if (
+                dispatch_thread is not None
+                and dispatch_thread is not threading.current_thread()
+            ):
+                self._queue.append((msg, state))
+                queued = True
+                if len(self._queue) == 1:
+                    # Read wakeup under the lock, `stop_dispatch` may clear it
+                    # from another thread before it is called.
+                    wakeup = self.wakeup
+
+        if queued:
+            if wakeup is not None and wakeup() is False:
+                self.stop_dispatch()
+            return
+
+        # Deliver anything other threads queued before this write so the
+        # callbacks receive the writes in the order they were made.
+        if self._queue:
+            self.dispatch_queued()
 
         for callback in self.callbacks:
             callback(msg, state)
@@ -0,0 +1,236 @@
+from __future__ import absolute_import, print_function
+
+import atexit
+import glob
+import mmap
+import os
+import time
+from array import array
+
+import six
+
+from ..prefs import prefs_path
+from .manager import Manager
+
+
+class Segment(object):
+    """A memory-mapped file that records spilled from a `SpillManager` are
+    appended to.
+
+    The file is allocated to `capacity` bytes when created, and truncated to the
+    size actually used when it is closed. The offset of each record in the file and
+    the id of its state are stored in memory so records can be read back without
+    needing to scan the file.
+
+    Args:
+        filename (str): The file path to create.
+        capacity (int): The number of bytes to allocate for the file.
+    """
+
+    def __init__(self, filename, capacity):
+        self.filename = filename
+        self.capacity = capacity
+        self.used = 0
+        self.created = self.modified = time.time()
+        # Index of the start of each record and its state id in the manager.
+        self.offsets = array('L')
+        self.states = array('L')
+
+        self._file = open(filename, 'w+b')
+        self._file.truncate(capacity)
+        self._map = mmap.mmap(self._file.fileno(), capacity)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def closed(self):
+        return self._map is None
+
+    def append(self, data, state_id):
+        """Write data to the file. Returns False if there isn't room for it."""
+        end = self.used + len(data)
+        if self.closed or end > self.capacity:
+            return False
+        self._map[self.used : end] = data
+        self.offsets.append(self.used)
+        self.states.append(state_id)
+        self.used = end
+        self.modified = time.time()
+        return True
+
+    def close(self):
+        """Stop writing to this segment, shrinking the file to the used size."""
+        if self.closed:
+            return
+        self._map.flush()
+        self._map.close()
+        self._map = None
+        try:
+            self._file.truncate(self.used)
+        except EnvironmentError:
+            # The file may still be mapped for reading on windows. It is still
+            # readable, it just takes up more disk space than required.
+            pass
+        self._file.close()
+
+    def delete(self):
+        self.close()
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
+
+    def records(self):
+        """Yields the (data, state_id) of each record stored in the file."""
+        # Take a snapshot of the index in case more records are appended while
+        # we are yielding data.
+        count = len(self.offsets)
+        used = self.used
+        if not count:
+            return
+        try:
+            with open(self.filename, 'rb') as fle:
+                view = mmap.mmap(fle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (EnvironmentError, ValueError):
+            # The segment was removed while reading
+            return
+        try:
+            for i in range(count):
+                start = self.offsets[i]
+                end = self.offsets[i + 1] if i + 1 < count else used
+                yield view[start:end], self.states[i]
+        finally:
+            view.close()
+
+
+class SpillManager(Manager):
+    """A Manager that keeps the entire history of the session without storing it in
+    memory.
+
+    Only a small tail of the most recent records is kept in memory. Older records are
+    appended to memory-mapped segment files and read back from disk when iterating
+    over the manager, so replay, `get_value` and `search` stream the history without
+    loading all of it. `len` only reports the number of records in memory and
+    `Cursor`'s only read the records in memory.
+
+    Segment files are rotated once they reach `segment_size` bytes. Segments that
+    have not been written to for `max_age` seconds are deleted, including segments
+    left on disk by previous sessions.
+
+    Args:
+        max_bytes (int, optional): The size of the in-memory tail. See `Manager`.
+        path (str, optional): The directory to store segment files in. Defaults
+            to a `stream_history` folder in the PrEditor preferences.
+        core_name (str, optional): Used to pick the preferences folder if path
+            is not provided.
+        segment_size (int, optional): The size in bytes of each segment file.
+        max_age (float, optional): Delete segments not written to for this many
+            seconds. Pass None to never delete segments.
+    """
+
+    def __init__(
+        self,
+        max_bytes=1024 * 1024,
+        path=None,
+        core_name=None,
+        segment_size=16 * 1024 * 1024,
+        max_age=7 * 24 * 60 * 60,
+    ):
+        super(SpillManager, self).__init__(maxlen=None, max_bytes=max_bytes)
+        self.retain_history = True
+        if path is None:
+            path = prefs_path('stream_history', core_name=core_name)
+        self.path = path
+        self.segment_size = segment_size
+        self.max_age = max_age
+        self.segments = []
+        self._prefix = 'history_{}_{}_'.format(os.getpid(), int(time.time() * 1000))
+        self._state_ids = {}
+        self._states = []
+
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        self.expire()
+        atexit.register(self.close)
+
+    def __iter__(self):
+        for segment in list(self.segments):
+            for data, state_id in segment.records():
+                yield data.decode('utf-8', 'replace'), self._states[state_id]
+        for record in super(SpillManager, self).__iter__():
+            yield record
+
+    def _discard(self, msg, state):
+        """Spill records removed from memory to disk instead of dropping them."""
+        if isinstance(msg, six.text_type):
+            data = msg.encode('utf-8')
+        else:
+            data = msg
+
+        try:
+            state_id = self._state_ids[state]
+        except KeyError:
+            state_id = self._state_ids[state] = len(self._states)
+            self._states.append(state)
+
+        if not self.segments or not self.segments[-1].append(data, state_id):
+            self.rotate(len(data))
+            self.segments[-1].append(data, state_id)
+
+    def clear(self):
+        """Remove all stored writes from memory and delete this session's segments."""
+        for segment in self.segments:
+            segment.delete()
+        self.segments = []
+        super(SpillManager, self).clear()
+
+    def close(self):
+        """Close the current segment. Called automatically when python exits."""
+        if self.segments:
+            self.segments[-1].close()
+
+    def expire(self):
+        """Delete any segment files that have not been modified for `max_age`."""
+        if self.max_age is None:
+            return
+        cutoff = time.time() - self.max_age
+
+        # Remove this session's segments
+        while self.segments and self.segments[0].modified < cutoff:
+            segment = self.segments.pop(0)
+            self.dropped_bytes += segment.used
+            self.dropped_records += len(segment)
+            segment.delete()
+
+        # Remove segments left over from previous sessions
+        current = set(segment.filename for segment in self.segments)
+        for filename in glob.glob(os.path.join(self.path, 'history_*.bin')):
+            if filename in current:
+                continue
+            try:
+                if os.path.getmtime(filename) < cutoff:
+                    os.remove(filename)
+            except OSError:
+                pass
+
+    def rotate(self, min_size=0):
+        """Close the current segment and start writing to a new one.
+
+        Args:
+            min_size (int, optional): Ensure the new segment can store at least
+                this many bytes.
+        """
+        self.close()
+        self.expire()
+        filename = os.path.join(
+            self.path, '{}{:04}.bin'.format(self._prefix, len(self.segments))
+        )
+        # Ensure a unique filename if segments were removed by expire
+        index = len(self.segments)
+        while os.path.exists(filename):
+            index += 1
+            filename = os.path.join(
+                self.path, '{}{:04}.bin'.format(self._prefix, index)
+            )
+        self.segments.append(Segment(filename, max(self.segment_size, min_size)))
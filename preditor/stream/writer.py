@@ -0,0 +1,150 @@
+from __future__ import absolute_import, print_function
+
+import atexit
+import collections
+import threading
+
+
+class AsyncWriter(object):
+    """Writes to a stream from a background thread so the thread calling `write`
+    doesn't have to wait for a slow stream.
+
+    Writes are added to a queue and the background thread writes everything that
+    has been queued to the stream in a single call. `flush` and `close` wait for
+    the queue to be written, `close` is called automatically when python exits.
+
+    Args:
+        stream: The file like object to write to.
+        maxsize (int, optional): The maximum number of writes to queue. See
+            overflow for what happens if a write is made while the queue is full.
+        overflow (str, optional): What to do when the queue is full.
+            ``"block"``: Wait for the background thread to make room.
+            ``"drop_oldest"``: Discard the oldest queued write to make room.
+            ``"drop"``: Discard the new write. A `dropped_format` notice is
+            written to the stream before the next accepted write, or by
+            `flush` or `close`.
+
+    Properties:
+        dropped (int): The number of writes that were discarded because the queue
+            was full.
+    """
+
+    BLOCK = 'block'
+    DROP = 'drop'
+    DROP_OLDEST = 'drop_oldest'
+
+    dropped_format = u'[{count:,} writes were dropped]\n'
+    """Written to the stream when using the ``"drop"`` overflow policy and writes
+    have been discarded. It is formatted with `count`."""
+
+    def __init__(self, stream, maxsize=1000, overflow=BLOCK):
+        if overflow not in (self.BLOCK, self.DROP, self.DROP_OLDEST):
+            raise ValueError('Invalid overflow policy: {!r}'.format(overflow))
+        self.stream = stream
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.dropped = 0
+        # Writes dropped since the last dropped_format notice
+        self._unreported = 0
+        self._busy = False
+        self._closed = False
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        atexit.register(self.close)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _report_dropped(self):
+        """Queue a `dropped_format` notice if writes were dropped since the last
+        notice. This must be called while holding the condition."""
+        if self._unreported:
+            self._queue.append(self.dropped_format.format(count=self._unreported))
+            self._unreported = 0
+
+    def _run(self):
+        condition = self._condition
+        while True:
+            with condition:
+                while not self._queue and not self._closed:
+                    condition.wait()
+                if not self._queue:
+                    return
+                msgs = list(self._queue)
+                self._queue.clear()
+                self._busy = True
+                # Wake up any writers waiting for room in the queue
+                condition.notify_all()
+
+            try:
+                self.stream.write(u''.join(msgs))
+            except Exception:
+                # There is nowhere to report errors writing to the stream, and
+                # raising would stop all future writes.
+                pass
+            finally:
+                with condition:
+                    self._busy = False
+                    condition.notify_all()
+
+    def close(self):
+        """Write everything that is queued and stop the background thread.
+
+        Writes made after this are written to the stream directly.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._report_dropped()
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        try:
+            atexit.unregister(self.close)
+        except AttributeError:
+            # Python 2 doesn't support unregister, close is harmless to repeat.
+            pass
+
+    def flush(self):
+        """Wait for the queued writes to be written then flush the stream."""
+        with self._condition:
+            if self._thread is not threading.current_thread():
+                if self._thread is not None and self._unreported:
+                    self._report_dropped()
+                    self._condition.notify_all()
+                while (self._queue or self._busy) and self._thread is not None:
+                    self._condition.wait()
+        self.stream.flush()
+
+    def write(self, msg):
+        """Queue msg to be written to the stream by the background thread."""
+        with self._condition:
+            if self._closed or self._thread is threading.current_thread():
+                # The stream is writing to itself, or has been closed, writing
+                # directly prevents waiting on ourselves.
+                self.stream.write(msg)
+                return
+
+            while len(self._queue) >= self.maxsize:
+                if self.overflow == self.BLOCK:
+                    self._condition.wait()
+                elif self.overflow == self.DROP_OLDEST:
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    self.dropped += 1
+                    self._unreported += 1
+                    return
+
+            self._report_dropped()
+            self._queue.append(msg)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='AsyncWriter')
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify_all()
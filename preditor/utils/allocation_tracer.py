@@ -0,0 +1,109 @@
+from __future__ import absolute_import, print_function
+
+import os
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2 doesn't have tracemalloc
+    tracemalloc = None
+
+
+def format_size(size):
+    """Returns a short string of a number of bytes using a readable unit."""
+    if abs(size) < 1024:
+        return '{} B'.format(size)
+    for unit in ('KiB', 'MiB', 'GiB'):
+        size /= 1024.0
+        if abs(size) < 1024 or unit == 'GiB':
+            return '{:.1f} {}'.format(size, unit)
+
+
+class AllocationTracer(object):
+    """Reports the lines of code that allocated memory while some code ran using
+    `tracemalloc`.
+
+    Memory allocations are only traced between `start` and `stop`, tracing slows
+    down all python code. To limit the overhead only the line that allocated
+    each block is recorded, not the full traceback, and allocations made by
+    PrEditor and the import system are excluded from the snapshots.
+
+    Args:
+        limit (int, optional): The maximum number of lines reported by `compare`.
+    """
+
+    exclude = (
+        '<frozen importlib._bootstrap>',
+        '<frozen importlib._bootstrap_external>',
+        '<unknown>',
+        # PrEditor itself, so writing the output of the code isn't reported
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), '*'),
+    )
+
+    def __init__(self, limit=10):
+        self.limit = limit
+        self._started = False
+        if tracemalloc is not None:
+            self.filters = [
+                tracemalloc.Filter(False, pattern) for pattern in self.exclude
+            ]
+            self.filters.append(tracemalloc.Filter(False, tracemalloc.__file__))
+
+    @classmethod
+    def is_available(cls):
+        return tracemalloc is not None
+
+    def compare(self, before, after=None):
+        """Returns the `tracemalloc.StatisticDiff`s of the lines that allocated
+        the most memory between two snapshots, largest first.
+
+        Args:
+            before (tracemalloc.Snapshot): The snapshot taken before the code ran.
+            after (tracemalloc.Snapshot, optional): The snapshot taken after the
+                code ran. Defaults to taking a new snapshot.
+        """
+        if after is None:
+            after = self.snapshot()
+        stats = [
+            stat for stat in after.compare_to(before, 'lineno') if stat.size_diff > 0
+        ]
+        stats.sort(key=lambda stat: stat.size_diff, reverse=True)
+        return stats[: self.limit]
+
+    def format(self, stats):
+        """Returns the lines returned by `compare` formatted like traceback
+        lines so they can be linked to their source."""
+        lines = []
+        for stat in stats:
+            frame = stat.traceback[0]
+            lines.append(
+                '  File "{}", line {}: +{} in {:+d} blocks, {} total'.format(
+                    frame.filename,
+                    frame.lineno,
+                    format_size(stat.size_diff),
+                    stat.count_diff,
+                    format_size(stat.size),
+                )
+            )
+        return '\n'.join(lines)
+
+    def snapshot(self):
+        """Returns a filtered snapshot of the memory currently allocated."""
+        return tracemalloc.take_snapshot().filter_traces(self.filters)
+
+    def start(self):
+        """Start tracing memory allocations if they aren't already traced."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(1)
+            self._started = True
+        # The filters are compiled and cached the first time they are matched
+        # against a trace. Take snapshots until there are traces to match so the
+        # cache isn't reported as memory allocated by the first run.
+        self.snapshot()
+        self.snapshot()
+
+    def stop(self):
+        """Stop tracing memory allocations if `start` started tracing them."""
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
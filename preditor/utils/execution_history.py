@@ -0,0 +1,190 @@
+from __future__ import absolute_import, print_function
+
+import collections
+import hashlib
+import os
+import sqlite3
+import time
+
+try:
+    from time import thread_time
+except ImportError:
+    # Python 2 can only measure the cpu time of the process
+    from time import clock as thread_time  # noqa: F401
+
+
+ExecutionRun = collections.namedtuple(
+    'ExecutionRun', ('timestamp', 'source', 'code_hash', 'wall', 'cpu')
+)
+ExecutionRun.__doc__ = """A run of code recorded by `ExecutionHistory`.
+
+Properties:
+    timestamp (float): When the code finished running as a unix timestamp.
+    source (str): Where the code was run from, like the workbox name.
+    code_hash (str): A short hash of the code that was run.
+    wall (float): The number of seconds it took to run the code.
+    cpu (float): The number of seconds of cpu time used by the thread that ran
+        the code or None if it is unknown.
+"""
+
+SourceStats = collections.namedtuple(
+    'SourceStats', ('source', 'runs', 'p50', 'p95', 'max', 'trend', 'last')
+)
+SourceStats.__doc__ = """The statistics of the runs of a source returned by
+`ExecutionHistory.stats`.
+
+Properties:
+    source (str): Where the code was run from.
+    runs (int): The number of runs recorded.
+    p50 (float): The median wall time.
+    p95 (float): The 95th percentile wall time.
+    max (float): The slowest wall time.
+    trend (float): See `trend`.
+    last (float): The timestamp of the last run.
+"""
+
+
+def code_hash(code):
+    """Returns a short hash identifying the code that was run."""
+    return hashlib.sha1(code.strip().encode('utf-8')).hexdigest()[:12]
+
+
+def percentile(values, fraction):
+    """Returns the linearly interpolated percentile of a list of numbers.
+
+    Args:
+        values (list): The numbers, they don't need to be sorted.
+        fraction (float): The percentile as a fraction, 0.5 is the median.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def trend(values, window=5):
+    """Returns how much slower the median of the last `window` values is than
+    the median of the `window` values before them as a fraction, so 0.1 means
+    10% slower. Returns None if there are not enough values."""
+    if len(values) < window * 2:
+        return None
+    previous = percentile(values[-window * 2 : -window], 0.5)
+    if not previous:
+        return None
+    return percentile(values[-window:], 0.5) / previous - 1
+
+
+class ExecutionHistory(object):
+    """Records how long each run of code took in a sqlite database.
+
+    Sqlite is used so the history is compact, can be queried without loading
+    all of it and can be shared by multiple applications running at once.
+
+    Args:
+        filename (str): The path of the database, it is created if needed.
+        max_runs (int, optional): The number of runs kept for each source, the
+            oldest runs are removed when more are recorded.
+    """
+
+    def __init__(self, filename, max_runs=1000):
+        self.filename = filename
+        self.max_runs = max_runs
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            dirname = os.path.dirname(self.filename)
+            if dirname and not os.path.exists(dirname):
+                os.makedirs(dirname)
+            self._connection = sqlite3.connect(self.filename)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS runs ('
+                'id INTEGER PRIMARY KEY, timestamp REAL, source TEXT, '
+                'code_hash TEXT, wall REAL, cpu REAL)'
+            )
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS runs_source ON runs (source, id)'
+            )
+        return self._connection
+
+    def clear(self, source=None):
+        """Remove the runs of a source or all runs if source is None."""
+        with self.connection as connection:
+            if source is None:
+                connection.execute('DELETE FROM runs')
+            else:
+                connection.execute('DELETE FROM runs WHERE source = ?', (source,))
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def record(self, source, code, wall, cpu=None, timestamp=None):
+        """Record a run of code.
+
+        Args:
+            source (str): Where the code was run from, like the workbox name.
+            code (str): The code that was run, only its hash is stored.
+            wall (float): The number of seconds it took to run the code.
+            cpu (float, optional): The number of seconds of cpu time used.
+            timestamp (float, optional): When the code finished running.
+                Defaults to now.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self.connection as connection:
+            connection.execute(
+                'INSERT INTO runs (timestamp, source, code_hash, wall, cpu) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (timestamp, source, code_hash(code), wall, cpu),
+            )
+            connection.execute(
+                'DELETE FROM runs WHERE source = ? AND id NOT IN '
+                '(SELECT id FROM runs WHERE source = ? ORDER BY id DESC LIMIT ?)',
+                (source, source, self.max_runs),
+            )
+
+    def runs(self, source, limit=None):
+        """Returns the `ExecutionRun`s of a source, oldest first.
+
+        Args:
+            source (str): The source to return the runs of.
+            limit (int, optional): Only return this many of the newest runs.
+        """
+        rows = self.connection.execute(
+            'SELECT timestamp, source, code_hash, wall, cpu FROM runs '
+            'WHERE source = ? ORDER BY id DESC LIMIT ?',
+            (source, -1 if limit is None else limit),
+        ).fetchall()
+        return [ExecutionRun(*row) for row in reversed(rows)]
+
+    def sources(self):
+        """Returns the name of each source with recorded runs."""
+        rows = self.connection.execute(
+            'SELECT DISTINCT source FROM runs ORDER BY source'
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self):
+        """Returns the `SourceStats` of each source with recorded runs."""
+        ret = []
+        for source in self.sources():
+            runs = self.runs(source)
+            walls = [run.wall for run in runs]
+            ret.append(
+                SourceStats(
+                    source,
+                    len(runs),
+                    percentile(walls, 0.5),
+                    percentile(walls, 0.95),
+                    max(walls),
+                    trend(walls),
+                    runs[-1].timestamp,
+                )
+            )
+        return ret
@@ -0,0 +1,189 @@
+from __future__ import absolute_import, print_function
+
+from array import array
+from bisect import bisect_right
+
+try:
+    array('Q')
+    _OFFSET_TYPE = 'Q'
+except ValueError:
+    # Python 2 does not support unsigned long long arrays
+    _OFFSET_TYPE = 'L'
+
+
+class LineStore(object):
+    """Stores a large amount of appended text as a piece table indexed by line.
+
+    Text is only ever added to the end of the store, so the pieces are never
+    split. Small appends are merged into the last piece until it reaches
+    `piece_size` characters to keep the number of pieces low. The start of each
+    piece, line and format run are stored in flat arrays so looking up the text
+    of any line is a binary search and doesn't depend on the amount of text.
+
+    Each append can be given a format, any hashable value. The formats of a line
+    are returned by `line_runs` so a view can style the text.
+
+    Properties:
+        pieces (list): The text of the store split into chunks.
+        piece_starts (array): The position of the first character of each piece.
+        line_starts (array): The position of the first character of each line.
+        run_starts (array): The position each run of text with the same format
+            starts at.
+        run_formats (array): The index into `formats` of each run.
+        formats (list): The unique formats text was appended with.
+        length (int): The number of characters in the store.
+        max_line_length (int): The length of the longest line added since the
+            store was cleared.
+    """
+
+    piece_size = 65536
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        """The number of lines in the store, this is always at least one."""
+        return len(self.line_starts)
+
+    def _format_id(self, fmt):
+        try:
+            return self._format_ids[fmt]
+        except KeyError:
+            format_id = self._format_ids[fmt] = len(self.formats)
+            self.formats.append(fmt)
+            return format_id
+
+    def append(self, text, fmt=None):
+        """Add text to the end of the store.
+
+        Args:
+            text (str): The text to add.
+            fmt (optional): The format of text, see `line_runs`.
+        """
+        if not text:
+            return
+        start = self.length
+
+        if self.pieces and len(self.pieces[-1]) < self.piece_size:
+            self.pieces[-1] += text
+        else:
+            self.piece_starts.append(start)
+            self.pieces.append(text)
+
+        format_id = self._format_id(fmt)
+        if not self.run_formats or self.run_formats[-1] != format_id:
+            self.run_starts.append(start)
+            self.run_formats.append(format_id)
+
+        line_starts = self.line_starts
+        longest = self.max_line_length
+        index = text.find('\n')
+        while index != -1:
+            longest = max(longest, start + index - line_starts[-1])
+            line_starts.append(start + index + 1)
+            index = text.find('\n', index + 1)
+        self.length += len(text)
+        self.max_line_length = max(longest, self.length - line_starts[-1])
+
+    def clear(self):
+        """Remove all text from the store."""
+        self.pieces = []
+        self.piece_starts = array(_OFFSET_TYPE)
+        self.line_starts = array(_OFFSET_TYPE, [0])
+        self.run_starts = array(_OFFSET_TYPE)
+        self.run_formats = array('L')
+        self.formats = []
+        self._format_ids = {}
+        self.length = 0
+        self.max_line_length = 0
+
+    def line(self, index):
+        """Returns the text of a line, not including its newline."""
+        return self.text(*self.line_span(index))
+
+    def line_at(self, position):
+        """Returns the index of the line containing a character position."""
+        return bisect_right(self.line_starts, position) - 1
+
+    def line_runs(self, index):
+        """Returns the text of a line split into runs of the same format.
+
+        Returns:
+            list: A (text, format) tuple for each run. Empty lines return an
+                empty list.
+        """
+        start, end = self.line_span(index)
+        line = self.text(start, end)
+        runs = []
+        run = bisect_right(self.run_starts, start) - 1
+        position = start
+        while position < end:
+            if run + 1 < len(self.run_starts):
+                run_end = min(self.run_starts[run + 1], end)
+            else:
+                run_end = end
+            runs.append(
+                (
+                    line[position - start : run_end - start],
+                    self.formats[self.run_formats[run]],
+                )
+            )
+            position = run_end
+            run += 1
+        return runs
+
+    def line_span(self, index):
+        """Returns the (start, end) character positions of a line. The end does
+        not include the newline."""
+        line_starts = self.line_starts
+        if index < 0:
+            index += len(line_starts)
+        start = line_starts[index]
+        if index + 1 < len(line_starts):
+            return start, line_starts[index + 1] - 1
+        return start, self.length
+
+    def text(self, start=0, end=None):
+        """Returns the text between two character positions."""
+        if end is None or end > self.length:
+            end = self.length
+        start = max(start, 0)
+        if start >= end:
+            return ''
+        pieces, piece_starts = self.pieces, self.piece_starts
+        index = bisect_right(piece_starts, start) - 1
+        chunks = []
+        while index < len(pieces) and piece_starts[index] < end:
+            piece_start = piece_starts[index]
+            chunks.append(
+                pieces[index][max(start - piece_start, 0) : end - piece_start]
+            )
+            index += 1
+        return ''.join(chunks)
+
+    def truncate(self, length):
+        """Remove all text after the first length characters.
+
+        `max_line_length` is not reduced by this.
+        """
+        if length >= self.length:
+            return
+        if length <= 0:
+            self.clear()
+            return
+
+        index = bisect_right(self.piece_starts, length) - 1
+        del self.pieces[index + 1 :]
+        del self.piece_starts[index + 1 :]
+        self.pieces[index] = self.pieces[index][: length - self.piece_starts[index]]
+        if not self.pieces[index]:
+            self.pieces.pop()
+            self.piece_starts.pop()
+
+        index = bisect_right(self.run_starts, length - 1)
+        del self.run_starts[index:]
+        del self.run_formats[index:]
+
+        index = bisect_right(self.line_starts, length)
+        del self.line_starts[index:]
+        self.length = length
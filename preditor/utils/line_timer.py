@@ -0,0 +1,76 @@
+from __future__ import absolute_import, print_function
+
+import sys
+from timeit import default_timer
+
+
+class LineTimer(object):
+    """Records the number of times each line of some code runs and how long it
+    takes using `sys.settrace`.
+
+    Only the lines of code compiled with `filename` are traced. Calls into any
+    other code are not traced so it runs at close to full speed, and the time
+    they take is added to the line that called them. The time of a line that
+    calls a function defined in the same code includes the time of the lines of
+    that function.
+
+    It has the same `enable` and `disable` methods as `cProfile.Profile` and only
+    traces the thread that enabled it.
+
+    Properties:
+        filename (str): The filename the traced code was compiled with.
+        hits (dict): The number of times each line number ran.
+        times (dict): The total number of seconds spent on each line number.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.hits = {}
+        self.times = {}
+        self._previous = None
+
+    def _trace(self, frame, event, arg):
+        """The global trace function, only returns a local trace function for the
+        frames of the code being timed."""
+        if frame.f_code.co_filename != self.filename:
+            return None
+
+        hits, times = self.hits, self.times
+        # The line this frame is running and when it started
+        current = [None, 0.0]
+
+        def trace_line(frame, event, arg):
+            now = default_timer()
+            line = current[0]
+            if line is not None:
+                times[line] = times.get(line, 0.0) + now - current[1]
+            if event == 'line':
+                line = frame.f_lineno
+                hits[line] = hits.get(line, 0) + 1
+                current[0] = line
+                # Don't include the time spent in this function
+                current[1] = default_timer()
+            elif event == 'return':
+                current[0] = None
+            return trace_line
+
+        return trace_line
+
+    def disable(self):
+        """Stop tracing and restore the previous trace function."""
+        sys.settrace(self._previous)
+        self._previous = None
+
+    def enable(self):
+        """Start tracing code that is called after this."""
+        self._previous = sys.gettrace()
+        sys.settrace(self._trace)
+
+
+def format_duration(seconds):
+    """Returns a short string of a number of seconds using a readable unit."""
+    if seconds >= 1:
+        return '{:.2f} s'.format(seconds)
+    if seconds >= 0.001:
+        return '{:.2f} ms'.format(seconds * 1000)
+    return '{:.0f} us'.format(seconds * 1000000)
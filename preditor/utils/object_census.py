@@ -0,0 +1,199 @@
+from __future__ import absolute_import, print_function
+
+import gc
+import sys
+import types
+from collections import Counter
+
+
+def type_name(cls):
+    """Returns the module and name of a class."""
+    name = getattr(cls, '__qualname__', cls.__name__)
+    return '{}.{}'.format(cls.__module__, name)
+
+
+class ObjectCensus(object):
+    """Counts the live objects tracked by the garbage collector by type.
+
+    Counting the objects of a large application can take seconds, so they are
+    counted in chunks by calling `step` until it returns False. Use `run` to
+    count them all at once. Only objects tracked by the garbage collector are
+    counted, this includes instances of python classes and most wrapped c++
+    objects but not simple types like str or int.
+
+    Args:
+        chunk_size (int, optional): The number of objects counted by each `step`.
+
+    Properties:
+        counts (dict): The number of objects of each type name once finished.
+        total (int): The number of objects counted once finished.
+    """
+
+    def __init__(self, chunk_size=50000):
+        self.chunk_size = chunk_size
+        self.counts = {}
+        self.total = 0
+        self._objects = None
+        self._index = 0
+        self._types = None
+
+    def diff(self, previous):
+        """Returns the type names that have more objects than in a `previous`
+        census, the number of objects and the growth sorted by growth.
+
+        Args:
+            previous (ObjectCensus): The census to compare to.
+
+        Returns:
+            list: A (name, count, growth) tuple for each type that grew.
+        """
+        grown = []
+        for name, count in self.counts.items():
+            growth = count - previous.counts.get(name, 0)
+            if growth > 0:
+                grown.append((name, count, growth))
+        grown.sort(key=lambda item: (-item[2], item[0]))
+        return grown
+
+    def is_running(self):
+        return self._objects is not None
+
+    @property
+    def progress(self):
+        """The fraction of the objects that have been counted so far."""
+        if self._objects is None:
+            return 1.0 if self.total else 0.0
+        return self._index / float(len(self._objects) or 1)
+
+    def run(self):
+        """Count all objects at once."""
+        self.start()
+        while self.step():
+            pass
+        return self
+
+    def start(self):
+        """Start a new census, the objects are counted by calling `step`."""
+        self._objects = gc.get_objects()
+        self._index = 0
+        self._types = Counter()
+
+    def step(self):
+        """Count the next chunk of objects.
+
+        Returns:
+            bool: True if there are more objects to count.
+        """
+        end = self._index + self.chunk_size
+        self._types.update(map(type, self._objects[self._index : end]))
+        self._index = end
+        if end < len(self._objects):
+            return True
+
+        # Release the objects and store the counts by name so a census doesn't
+        # keep any objects alive.
+        self.total = len(self._objects)
+        self._objects = None
+        counts = {}
+        for cls, count in self._types.items():
+            name = type_name(cls)
+            counts[name] = counts.get(name, 0) + count
+        self.counts = counts
+        self._types = None
+        return False
+
+
+def find_instances(name, limit=3):
+    """Returns up to `limit` live objects whose type has the type name `name`."""
+    instances = []
+    for obj in gc.get_objects():
+        if type_name(type(obj)) == name:
+            instances.append(obj)
+            if len(instances) >= limit:
+                break
+    return instances
+
+
+def describe_reference(referrer, referent):
+    """Returns a short description of how `referrer` refers to `referent`."""
+    if isinstance(referrer, types.ModuleType):
+        return 'module {}'.format(referrer.__name__)
+    if isinstance(referrer, dict):
+        for key, value in referrer.items():
+            if value is referent:
+                return 'dict[{!r}]'.format(key)
+    elif isinstance(referrer, (list, tuple)):
+        for index, value in enumerate(referrer):
+            if value is referent:
+                return '{}[{}]'.format(type(referrer).__name__, index)
+    return type_name(type(referrer))
+
+
+def referrer_chain(obj, max_depth=12, ignore=()):
+    """Returns the shortest chain of references from a module to `obj`.
+
+    Each level of referrers is found with a single call to `gc.get_referrers`
+    so this only scans all objects `max_depth` times at most. Frames are
+    ignored so the local variables of running code are not included.
+
+    Args:
+        obj: The object to find the referrers of.
+        max_depth (int, optional): The maximum length of the chain.
+        ignore (iterable, optional): Objects holding references to `obj` that
+            should not be included, like a list of objects being inspected.
+
+    Returns:
+        str: The description of each reference, separated by arrows or None
+            if no module refers to `obj`.
+    """
+    level = {id(obj): obj}
+    # The id of each referrer found and the object it refers to
+    parents = {id(obj): None}
+    ignored = set(id(item) for item in ignore)
+    ignored.update((id(level), id(parents), id(ignore)))
+    for _ in range(max_depth):
+        referrers = gc.get_referrers(*level.values())
+        ignored.add(id(referrers))
+        next_level = {}
+        ignored.add(id(next_level))
+        for referrer in referrers:
+            referrer_id = id(referrer)
+            if referrer_id in ignored or referrer_id in parents:
+                continue
+            if isinstance(referrer, types.FrameType):
+                continue
+            referent = None
+            for item in gc.get_referents(referrer):
+                if id(item) in level:
+                    referent = item
+                    break
+            if referent is None:
+                continue
+            parents[referrer_id] = referent
+            if isinstance(referrer, types.ModuleType):
+                chain = [describe_reference(referrer, referent)]
+                while parents[id(referent)] is not None:
+                    child = parents[id(referent)]
+                    chain.append(describe_reference(referent, child))
+                    referent = child
+                chain.append(type_name(type(obj)))
+                return ' -> '.join(chain)
+            next_level[referrer_id] = referrer
+        del referrers
+        level = next_level
+        if not level:
+            break
+    return None
+
+
+def print_referrer_chains(name, limit=3, file=None):
+    """Print the referrer chains of up to `limit` instances of a type name."""
+    file = sys.stdout if file is None else file
+    instances = find_instances(name, limit=limit)
+    print('Referrers of {} {} objects:'.format(len(instances), name), file=file)
+    while instances:
+        obj = instances.pop()
+        chain = referrer_chain(obj, ignore=(instances,))
+        print(
+            '    {}'.format(chain or 'No module refers to {!r}'.format(obj)), file=file
+        )
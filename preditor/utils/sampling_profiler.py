@@ -0,0 +1,212 @@
+from __future__ import absolute_import, print_function
+
+import json
+import sys
+import threading
+from timeit import default_timer
+
+
+class StackNode(object):
+    """A function in the call stacks recorded by a `SamplingProfiler`.
+
+    The nodes form a trie, each unique call stack is only stored once no matter
+    how many times it was sampled.
+
+    Properties:
+        name (str): The name of the function and where it is defined.
+        count (int): The number of samples this function was in, including the
+            samples of the functions it called.
+        time (float): The number of seconds represented by those samples.
+        children (dict): The `StackNode` of each function called by this one.
+    """
+
+    __slots__ = ('name', 'count', 'time', 'children')
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.time = 0.0
+        self.children = {}
+
+    @property
+    def self_count(self):
+        """The number of samples where this function was running itself."""
+        return self.count - sum(child.count for child in self.children.values())
+
+    @property
+    def self_time(self):
+        """The number of seconds this function was running itself."""
+        return self.time - sum(child.time for child in self.children.values())
+
+    def walk(self, path=()):
+        """Yield the path of names from this node to each node with samples of its
+        own, the number of those samples and the time they represent."""
+        path = path + (self.name,)
+        count = self.self_count
+        if count:
+            yield path, count, self.self_time
+        for child in self.children.values():
+            for item in child.walk(path):
+                yield item
+
+
+class SamplingProfiler(object):
+    """A statistical profiler that records the call stack of a thread at a
+    regular interval.
+
+    Unlike `cProfile` the profiled code is not slowed down by each function call,
+    only by the brief pause each time a sample is taken. The samples are taken
+    from a background thread using `sys._current_frames`. That thread needs the
+    GIL to take a sample, so the switch interval is lowered while sampling and
+    each sample is weighted by the time since the previous one, otherwise code
+    that holds the GIL would be under represented.
+
+    It has the same `enable` and `disable` methods as `cProfile.Profile`. When
+    enabled that way, only the frames called by the function that called
+    `enable` are recorded.
+
+    Args:
+        interval (float, optional): The number of seconds between samples.
+
+    Properties:
+        root (StackNode): The root of the stacks, its count is the number of
+            samples taken.
+        duration (float): The number of seconds samples were taken for.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.root = StackNode('all')
+        self.duration = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+        self._switch_interval = None
+
+    @classmethod
+    def frame_name(cls, code):
+        """Returns the name used for the code object of a frame."""
+        return '{} ({}:{})'.format(code.co_name, code.co_filename, code.co_firstlineno)
+
+    def _sample(self, thread_id, base):
+        names = {}
+        frame_name = self.frame_name
+        stop = self._stop
+        start = last = default_timer()
+        while not stop.wait(self.interval):
+            now = default_timer()
+            elapsed, last = now - last, now
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                # The thread has exited
+                break
+            stack = []
+            while frame is not None and frame is not base:
+                code = frame.f_code
+                try:
+                    stack.append(names[code])
+                except KeyError:
+                    name = names[code] = frame_name(code)
+                    stack.append(name)
+                frame = frame.f_back
+            # Don't record samples taken after the profiled code returned
+            if base is not None and frame is None:
+                continue
+
+            node = self.root
+            node.count += 1
+            node.time += elapsed
+            for name in reversed(stack):
+                child = node.children.get(name)
+                if child is None:
+                    child = node.children[name] = StackNode(name)
+                child.count += 1
+                child.time += elapsed
+                node = child
+        self.duration += default_timer() - start
+
+    def collapsed(self):
+        """Returns the samples in the collapsed stack format used by flamegraph.pl
+        and most flame graph tools, one line per unique stack."""
+        lines = []
+        for path, count, _ in self.root.walk():
+            lines.append('{} {}'.format(';'.join(path[1:]) or path[0], count))
+        return '\n'.join(lines) + '\n'
+
+    def disable(self):
+        self.stop()
+
+    def enable(self):
+        # Only record the frames called by the caller of this method
+        self.start(base=sys._getframe(1))
+
+    def is_running(self):
+        return self._thread is not None
+
+    def speedscope(self, name='PrEditor'):
+        """Returns the samples as a https://www.speedscope.app json string."""
+        frames = []
+        indexes = {}
+        samples = []
+        weights = []
+        for path, _, seconds in self.root.walk():
+            stack = []
+            for frame in path[1:]:
+                if frame not in indexes:
+                    indexes[frame] = len(frames)
+                    frames.append({'name': frame})
+                stack.append(indexes[frame])
+            samples.append(stack)
+            weights.append(seconds)
+        data = {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'exporter': 'preditor',
+            'name': name,
+            'shared': {'frames': frames},
+            'profiles': [
+                {
+                    'type': 'sampled',
+                    'name': name,
+                    'unit': 'seconds',
+                    'startValue': 0,
+                    'endValue': sum(weights),
+                    'samples': samples,
+                    'weights': weights,
+                }
+            ],
+        }
+        return json.dumps(data)
+
+    def start(self, thread_id=None, base=None):
+        """Start sampling a thread in the background.
+
+        Args:
+            thread_id (int, optional): The ident of the thread to sample. Defaults
+                to the current thread.
+            base (frame, optional): If provided only the frames called by this
+                frame are recorded.
+        """
+        if self._thread is not None:
+            return
+        if thread_id is None:
+            thread_id = threading.current_thread().ident
+        self._stop.clear()
+        # Python 2 uses a check interval instead of a switch interval
+        if hasattr(sys, 'getswitchinterval'):
+            self._switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(min(self._switch_interval, self.interval / 2))
+        self._thread = threading.Thread(
+            target=self._sample, args=(thread_id, base), name='PrEditorSampler'
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampling thread to finish."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._switch_interval is not None:
+            sys.setswitchinterval(self._switch_interval)
+            self._switch_interval = None
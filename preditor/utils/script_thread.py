@@ -0,0 +1,107 @@
+from __future__ import absolute_import, print_function
+
+import ctypes
+import sys
+import threading
+import time
+
+from .execution_history import thread_time
+
+# The thread id argument of PyThreadState_SetAsyncExc is unsigned since python 3.7
+_THREAD_ID_TYPE = ctypes.c_ulong if sys.version_info >= (3, 7) else ctypes.c_long
+
+
+class ScriptThread(threading.Thread):
+    """Executes compiled code on a worker thread so it can be stopped.
+
+    Stopping the thread raises an exception in it using
+    `PyThreadState_SetAsyncExc`. The exception is only raised the next time the
+    thread runs python bytecode, so code blocked in a long call into a C
+    extension or a sleep is not stopped until that call returns.
+
+    Properties:
+        code: The compiled code to run.
+        namespace (dict): The globals and locals the code is run in.
+        was_eval (bool): If the code was compiled in eval mode, its value is
+            stored in result.
+        callback (callable): Called from the worker thread with no arguments
+            after the code finishes, even if it raised an exception.
+        result: The value of the code if it was evaluated.
+        exc_info (tuple): The `sys.exc_info()` of the exception the code raised
+            or None.
+        start_time (float): The time the thread started running the code.
+        end_time (float): The time the code finished running.
+        cpu_time (float): The seconds of cpu time used by this thread to run the
+            code once it has finished.
+    """
+
+    def __init__(self, code, namespace, was_eval=False, callback=None):
+        super(ScriptThread, self).__init__(name='PrEditorScript')
+        # Don't prevent python from exiting if the code never finishes
+        self.daemon = True
+        self.code = code
+        self.namespace = namespace
+        self.was_eval = was_eval
+        self.callback = callback
+        self.result = None
+        self.exc_info = None
+        self.start_time = None
+        self.end_time = None
+        self.cpu_time = None
+        self._lock = threading.Lock()
+        self._running = False
+
+    @property
+    def elapsed(self):
+        """The number of seconds the code has been running for."""
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.time()) - self.start_time
+
+    def interrupt(self, exc_type=KeyboardInterrupt):
+        """Raise exc_type in the thread if it is still running the code.
+
+        Returns:
+            bool: If the exception was raised in the thread.
+        """
+        with self._lock:
+            if not self._running:
+                return False
+            ret = ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                _THREAD_ID_TYPE(self.ident), ctypes.py_object(exc_type)
+            )
+            if ret > 1:
+                # More than one thread was modified, undo it
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                    _THREAD_ID_TYPE(self.ident), None
+                )
+                return False
+            return ret == 1
+
+    def run(self):
+        self.start_time = time.time()
+        start_cpu = thread_time()
+        try:
+            with self._lock:
+                self._running = True
+            try:
+                if self.was_eval:
+                    self.result = eval(self.code, self.namespace, self.namespace)
+                else:
+                    exec(self.code, self.namespace, self.namespace)
+            finally:
+                # Prevent interrupt from raising a exception after this point.
+                # One raised before this is caught by the except.
+                with self._lock:
+                    self._running = False
+        except BaseException:
+            exc_type, exc_value, tb = sys.exc_info()
+            # Don't include this method in the traceback
+            tb = tb.tb_next or tb
+            if hasattr(exc_value, 'with_traceback'):
+                exc_value = exc_value.with_traceback(tb)
+            self.exc_info = (exc_type, exc_value, tb)
+        self.end_time = time.time()
+        self.cpu_time = thread_time() - start_cpu
+        if self.callback is not None:
+            self.callback()
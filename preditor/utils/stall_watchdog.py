@@ -0,0 +1,143 @@
+from __future__ import absolute_import, print_function
+
+import sys
+import threading
+from collections import Counter
+from timeit import default_timer
+
+
+class StallReport(object):
+    """The stacks a thread was sampled in while it was stalled.
+
+    Properties:
+        duration (float): The number of seconds between the heartbeats before
+            and after the stall.
+        stacks (collections.Counter): The number of samples of each stack. Each
+            stack is a tuple of (filename, line number, function name) tuples,
+            outermost frame first.
+    """
+
+    def __init__(self, duration, stacks):
+        self.duration = duration
+        self.stacks = stacks
+
+    def format(self, limit=3, depth=8):
+        """Returns a compact description of the stall.
+
+        Args:
+            limit (int, optional): The number of the most sampled stacks to show.
+            depth (int, optional): The number of innermost frames of each stack
+                to show.
+        """
+        samples = sum(self.stacks.values())
+        common = self.stacks.most_common(limit)
+        location = 'an unknown location'
+        if common and common[0][0]:
+            filename, lineno, name = common[0][0][-1]
+            location = '{} ({}:{})'.format(name, filename, lineno)
+        lines = ['UI blocked for {:.2f}s in {}'.format(self.duration, location)]
+        for stack, count in common:
+            lines.append(
+                '  {} of {} samples ({:.0%}):'.format(
+                    count, samples, count / float(samples)
+                )
+            )
+            if len(stack) > depth:
+                lines.append('    ...')
+            for filename, lineno, name in stack[-depth:]:
+                lines.append(
+                    '    File "{}", line {}, in {}'.format(filename, lineno, name)
+                )
+        return '\n'.join(lines)
+
+
+class StallWatchdog(object):
+    """Reports when a thread stops calling `heartbeat` for longer than a
+    threshold and what that thread was doing.
+
+    This is normally used to find what blocked the gui thread by calling
+    `heartbeat` from a timer on that thread. A background thread checks the
+    heartbeat, and while it is stalled samples the stack of the watched thread
+    using `sys._current_frames`. Once the heartbeat resumes, `callback` is
+    called from the background thread with a `StallReport`.
+
+    Args:
+        callback (callable): Called with a `StallReport` after each stall.
+        threshold (float, optional): How many seconds without a heartbeat is
+            considered a stall.
+        interval (float, optional): The seconds between checking the heartbeat
+            and between samples of a stalled thread.
+    """
+
+    def __init__(self, callback, threshold=1.0, interval=0.05):
+        self.callback = callback
+        self.threshold = threshold
+        self.interval = interval
+        self._beat = default_timer()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def extract_stack(cls, frame):
+        """Returns the stack of a frame as a tuple, outermost frame first."""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, frame.f_lineno, code.co_name))
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def heartbeat(self):
+        """Record that the watched thread is not stalled."""
+        self._beat = default_timer()
+
+    def is_running(self):
+        return self._thread is not None
+
+    def _watch(self, thread_id):
+        stalled = None
+        stacks = Counter()
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            if stalled is not None and beat != stalled:
+                # The heartbeat resumed
+                self.callback(StallReport(beat - stalled, stacks))
+                stalled = None
+                stacks = Counter()
+
+            if default_timer() - beat < self.threshold:
+                continue
+            stalled = beat
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                # The thread has exited
+                break
+            stacks[self.extract_stack(frame)] += 1
+            del frame
+
+    def start(self, thread_id=None):
+        """Start watching a thread's heartbeat in the background.
+
+        Args:
+            thread_id (int, optional): The ident of the thread calling
+                `heartbeat`. Defaults to the current thread.
+        """
+        if self._thread is not None:
+            return
+        if thread_id is None:
+            thread_id = threading.current_thread().ident
+        self.heartbeat()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch, args=(thread_id,), name='PrEditorWatchdog'
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching the heartbeat and wait for the background thread."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
@@ -155,7 +155,8 @@ class TextSearch(with_metaclass(abc.ABCMeta, object)):
                 Group_name and tab_name separated by a `/`.
             workbox_id (str): From `GroupTabWidget.all_widgets`, the group_tab_index
                 and widget_tab_index joined by a comma without a space. Used as
-                the url of the link. Example: `3,1`.
+                the url of the link. Example: `3,1`. None if the text is not from
+                a workbox, like the console archive.
         """
         # NOTE: splitlines discards the "newline at end of file" so it doesn't
         # show up in the final search results.
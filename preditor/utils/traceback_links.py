@@ -0,0 +1,107 @@
+from __future__ import absolute_import, print_function
+
+import collections
+import re
+
+Link = collections.namedtuple('Link', ('start', 'end', 'filename', 'line_num'))
+Link.__doc__ = """A reference to a line of a file found by `TracebackLinks`.
+
+Properties:
+    start (int): The position the filename starts at in the text passed to
+        `TracebackLinks.feed`. This is negative if the line was started by a
+        previous call to feed.
+    end (int): The position the filename ends at.
+    filename (str): The name of the file.
+    line_num (str): The line number.
+"""
+
+
+class TracebackLinks(object):
+    """Finds references to lines of files in text that is written in pieces.
+
+    Text is passed to `feed` as it is written and the links found in each line
+    are returned once the line is complete. Only the incomplete last line is
+    stored between calls, and all complete lines are searched using a single
+    regular expression call.
+
+    These formats are recognized, filenames may contain spaces:
+        - Python tracebacks including the ones written by logging, exception
+          groups and SyntaxError's: ``  File "file.py", line 12, in name``
+        - pytest failure locations: ``tests/test_file.py:12: AssertionError``
+        - rows of `pstats` tables: ``1    0.000    0.000    0.500    0.500
+          file.py:12(name)``
+
+    Properties:
+        partial (str): The text of the incomplete last line.
+        max_partial (int): If the incomplete line is longer than this many
+            characters, it is not searched to limit the memory used.
+    """
+
+    pattern = re.compile(
+        r'^[ \t|+]*File "(?P<filename>[^"\n]+)", line (?P<line_num>\d+)'
+        r'|^(?P<path>(?:[A-Za-z]:)?[^\s:"][^:"\n]*\.pyw?):(?P<path_line_num>\d+):'
+        r'|^[ \t]*\d+(?:/\d+)?(?:[ \t]+[\d.]+){4}[ \t]+(?!~:)'
+        r'(?P<stat>\S[^\n]*?):(?P<stat_line_num>\d+)\(',
+        re.M,
+    )
+    _filename_groups = {
+        'line_num': 'filename',
+        'path_line_num': 'path',
+        'stat_line_num': 'stat',
+    }
+
+    def __init__(self, max_partial=4096):
+        self.max_partial = max_partial
+        self.reset()
+
+    def feed(self, text):
+        """Search the lines completed by text for links.
+
+        Args:
+            text (str): The text that was written.
+
+        Returns:
+            list: A `Link` for each reference found, in the order they were found.
+        """
+        end = text.rfind('\n')
+        if end == -1:
+            self._add_partial(text)
+            return []
+
+        offset = len(self.partial)
+        chunk = self.partial + text[: end + 1]
+        start = 0
+        if self._skip:
+            # The first line was too long to search
+            start = chunk.find('\n') + 1
+            self._skip = False
+        self.partial = ''
+        self._add_partial(text[end + 1 :])
+
+        links = []
+        for match in self.pattern.finditer(chunk, start):
+            # The line number is the last group of each format
+            line_num = match.group(match.lastgroup)
+            group = self._filename_groups[match.lastgroup]
+            links.append(
+                Link(
+                    match.start(group) - offset,
+                    match.end(group) - offset,
+                    match.group(group),
+                    line_num,
+                )
+            )
+        return links
+
+    def _add_partial(self, text):
+        if self._skip:
+            return
+        self.partial += text
+        if len(self.partial) > self.max_partial:
+            self.partial = ''
+            self._skip = True
+
+    def reset(self):
+        """Forget the incomplete last line."""
+        self.partial = ''
+        self._skip = False
@@ -0,0 +1,57 @@
+from __future__ import absolute_import
+
+import pytest
+
+from preditor.utils.allocation_tracer import AllocationTracer, format_size
+
+pytestmark = pytest.mark.skipif(
+    not AllocationTracer.is_available(), reason="tracemalloc is not available"
+)
+
+
+def test_allocation_tracer():
+    import tracemalloc
+
+    assert not tracemalloc.is_tracing()
+    code = compile(
+        'small = [0] * 10\nlarge = [[0] * 100 for i in range(1000)]\n',
+        '<Workbox>:0,0',
+        'exec',
+    )
+    tracer = AllocationTracer(limit=1)
+    tracer.start()
+    try:
+        namespace = {}
+        before = tracer.snapshot()
+        exec(code, namespace)
+        stats = tracer.compare(before)
+    finally:
+        tracer.stop()
+    assert not tracemalloc.is_tracing()
+
+    # Only the line that allocated the most is reported
+    assert len(stats) == 1
+    frame = stats[0].traceback[0]
+    assert (frame.filename, frame.lineno) == ('<Workbox>:0,0', 2)
+    assert stats[0].size_diff > 100 * 1000 * 8
+    assert tracer.format(stats).startswith('  File "<Workbox>:0,0", line 2: +')
+
+
+def test_allocation_tracer_started():
+    import tracemalloc
+
+    # Tracing started by something else isn't stopped
+    tracemalloc.start()
+    try:
+        tracer = AllocationTracer()
+        tracer.start()
+        tracer.stop()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_format_size():
+    assert format_size(12) == '12 B'
+    assert format_size(-2048) == '-2.0 KiB'
+    assert format_size(5 * 1024 * 1024) == '5.0 MiB'
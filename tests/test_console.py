@@ -0,0 +1,271 @@
+from __future__ import absolute_import
+
+import json
+import os
+import sys
+
+import pytest
+from Qt.QtCore import Qt
+from Qt.QtGui import QTextCursor
+from Qt.QtWidgets import QApplication
+
+from preditor import prefs, stream
+from preditor.gui.console import ConsolePrEdit
+from preditor.gui.loggerwindow import LoggerWindow
+from preditor.gui.virtual_console import VirtualConsole
+from preditor.stream import STDERR, STDOUT, Manager, ProcessState
+
+
+def init_app():
+    global app
+    if not QApplication.instance():
+        # These tests require an initialized QApplication, keep a reference to it
+        # so it isn't garbage collected.
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        app = QApplication([])
+
+
+def make_console(cls):
+    """Yields a cls console that is cleaned up after the test."""
+    init_app()
+    # The console installs a stream manager on sys.stdout/err and an excepthook
+    # that shows a dialog. Restore them so they don't affect other tests.
+    saved = (stream.active, sys.stdout, sys.stderr, sys.excepthook)
+    console = cls(None)
+    sys.excepthook = saved[3]
+    # Add writes to the document immediately
+    console.writeInterval = 0
+    console.resize(400, 200)
+    yield console
+    console.detachStreamManager()
+    console.close()
+    console.deleteLater()
+    stream.active, sys.stdout, sys.stderr, sys.excepthook = saved
+
+
+@pytest.fixture
+def console():
+    for console in make_console(ConsolePrEdit):
+        yield console
+
+
+@pytest.fixture
+def virtual_console():
+    for console in make_console(VirtualConsole):
+        yield console
+
+
+@pytest.fixture(params=[ConsolePrEdit, VirtualConsole])
+def any_console(request):
+    for console in make_console(request.param):
+        yield console
+
+
+def char_color(console, text):
+    """Returns the foreground color of the first character of text."""
+    position = console.toPlainText().index(text)
+    cursor = QTextCursor(console.document())
+    cursor.setPosition(position + 1)
+    return cursor.charFormat().foreground().color()
+
+
+def test_process_output(console):
+    console.clear()
+    console.write(u'parent\n', STDOUT)
+    console.write(u'child a\n', ProcessState('a:1', STDOUT))
+    console.write(u'child b\n', ProcessState('b:2', STDOUT))
+    console.write(u'child error\n', ProcessState('b:2', STDERR))
+    assert console.toPlainText().endswith(u'parent\nchild a\nchild b\nchild error\n')
+
+    # Each process is shown in its own color, errors in the error color
+    assert char_color(console, u'parent') == console.stdoutColor()
+    assert char_color(console, u'child a') == console.processColor('a:1')
+    assert char_color(console, u'child b') == console.processColor('b:2')
+    assert console.processColor('a:1') != console.stdoutColor()
+    assert char_color(console, u'child error') == console.errorMessageColor()
+
+    # Only the output of processes matching processFilter is shown
+    console.processFilter = 'a:*'
+    console.write(u'hidden\n', ProcessState('b:2', STDOUT))
+    console.write(u'shown\n', ProcessState('a:1', STDOUT))
+    console.write(u'parent 2\n', STDOUT)
+    assert console.toPlainText().endswith(u'child error\nshown\nparent 2\n')
+
+
+def test_archive(console):
+    console.clear()
+    console.maximumBlockCount = 10
+    lines = [u'line {}'.format(i) for i in range(30)]
+    for line in lines:
+        console.write(line + u'\n', STDOUT)
+
+    # The oldest lines were moved to the archive in a single batch
+    text = console.toPlainText().splitlines()
+    assert len(text) <= 11
+    archived = console.archive.read().splitlines()
+    assert console.archive.line_count == len(archived)
+    assert text[0] == u'[{} older lines were archived, click to view]'.format(
+        len(archived)
+    )
+    # The prompt shown by clear is archived with the first line
+    assert archived[0].endswith(lines[0])
+    assert archived[1:] + text[1:] == lines[1:]
+
+    # The link at the top of the console shows the archive
+    shown = []
+    console.showTextDialog = lambda title, msg, lineNum=None: shown.append(msg)
+    cursor = QTextCursor(console.document())
+    cursor.setPosition(1)
+    assert cursor.charFormat().anchorHref() == console.archiveHref
+    console.showArchive(console.archiveHref)
+    assert shown == [console.archive.read()]
+
+    # Clearing the console deletes the archive
+    path = console.archive.path
+    assert os.path.exists(path)
+    console.clear()
+    assert console.archive.line_count == 0
+    assert not os.path.exists(path)
+
+
+def test_virtual_console(virtual_console):
+    console = virtual_console
+    console.clear()
+    view = console.uiOutputVIEW
+    # Don't suppress the large write as a flood of output
+    console.floodGuard.line_limit = 0
+    # Write many more lines than ConsolePrEdit keeps before archiving
+    count = console.maximumBlockCount * 3
+    console.write(u''.join(u'line {}\n'.format(i) for i in range(count)), STDOUT)
+    console.write(u'last line\n', STDOUT)
+
+    # Nothing is trimmed or archived, the output is stored in the view
+    assert console.archive.line_count == 0
+    assert console.document().blockCount() == 1
+    store = view.store
+    # The prompt shown by clear is on the first line
+    assert store.line(0).endswith(u'line 0')
+    assert [store.line(i) for i in range(1, count)] == [
+        u'line {}'.format(i) for i in range(1, count)
+    ]
+    assert store.line(count) == u'last line'
+
+    # The view follows the output, showing the last lines
+    scrollBar = view.verticalScrollBar()
+    assert view.isPinned()
+    first = scrollBar.value()
+    visible = view.visibleLineCount()
+    assert first + visible == len(store)
+    assert store.line(first + visible - 2) == u'last line'
+
+    # Scrolling up shows older lines and new output doesn't move the view
+    scrollBar.setValue(10)
+    console.write(u'more\n', STDOUT)
+    assert scrollBar.value() == 10
+    assert store.line(scrollBar.value()) == u'line 10'
+
+
+def test_new_output_button(any_console):
+    console = any_console
+    # The document is only laid out to set the scroll range once it is shown
+    console.show()
+    console.clear()
+    console.floodGuard.line_limit = 0
+    console.write(u''.join(u'line {}\n'.format(i) for i in range(200)), STDOUT)
+    scrollBar = console.outputScrollBar()
+    assert scrollBar.value() == scrollBar.maximum()
+    assert console.uiNewOutputBTN.isHidden()
+
+    # Output written while scrolled up keeps the position and shows the button
+    scrollBar.setValue(5)
+    console.write(u'new output\n', STDOUT)
+    assert scrollBar.value() == 5
+    assert scrollBar.value() < scrollBar.maximum()
+    assert not console.uiNewOutputBTN.isHidden()
+
+    # Clicking the button shows the new output and follows it again
+    console.uiNewOutputBTN.click()
+    assert scrollBar.value() == scrollBar.maximum()
+    assert console.uiNewOutputBTN.isHidden()
+    console.write(u'more output\n', STDOUT)
+    assert scrollBar.value() == scrollBar.maximum()
+    assert console.uiNewOutputBTN.isHidden()
+
+
+def test_runs_in_process_warning(console, capsys):
+    console.setKernelEnabled(True)
+    try:
+        warning = 'Warning: The code is run in this process instead of the kernel'
+        # Profiled code is run in this process, with a warning each time
+        with console.profiling():
+            for _ in range(2):
+                result = console.executeString(u'1 + 1', extraPrint=False)
+                assert result == (2, True)
+        err = capsys.readouterr().err
+        assert err.count(warning + ' because it is profiled.') == 2
+
+        # Without profiling the code is run in the kernel
+        assert console.executeString(u'1 + 1', extraPrint=False) == (None, False)
+        assert warning not in capsys.readouterr().err
+    finally:
+        console.setKernelEnabled(False)
+
+
+def test_flood_history(console):
+    manager = console.stream_manager
+    retained = (manager.retain_history, manager.store_writes, manager.max_bytes)
+    now = [0.0]
+    guard = console.floodGuard
+    guard.clock = lambda: now[0]
+    guard._window_start = 0.0
+    guard.line_limit = 5
+    for i in range(20):
+        manager.write(u'line {}\n'.format(i), STDOUT)
+    # The manager stores the output while flooding so it can be shown
+    assert guard.flooding
+    assert manager.retain_history
+    href = '{}{},{}'.format(console.floodHref, *console._floodStart)
+
+    # Once the flood ends the manager stops retaining history
+    for time in (10.0, 20.0):
+        now[0] = time
+        console.pollFlood()
+    assert not guard.flooding
+    assert (manager.retain_history, manager.store_writes, manager.max_bytes) == (
+        retained
+    )
+
+    # The output written during the flood can still be viewed
+    shown = []
+    console.showTextDialog = lambda title, msg, lineNum=None: shown.append(msg)
+    console.showFloodOutput(href)
+    assert u'line 6\n' in shown[0]
+    assert shown[0].endswith(u'line 19\n')
+
+
+def test_logger_window_virtual_console(tmp_path, monkeypatch):
+    init_app()
+    monkeypatch.setenv('PREDITOR_PREF_PATH', str(tmp_path))
+    filename = prefs.prefs_path('preditor_pref.json', core_name='test')
+    os.makedirs(os.path.dirname(filename))
+    with open(filename, 'w') as fle:
+        json.dump({'virtualConsole': True}, fle)
+
+    saved = (stream.active, sys.stdout, sys.stderr, sys.excepthook)
+    # Output written before the window is created
+    stream.active = manager = Manager()
+    manager.write(u'startup output\n', STDOUT)
+    window = LoggerWindow(None, name='test')
+    try:
+        console = window.console()
+        assert isinstance(console, VirtualConsole)
+        console.flush()
+        assert u'startup output' in console.uiOutputVIEW.store.text()
+        # The virtual console released the history like ConsolePrEdit does
+        assert not manager.store_writes
+        assert len(manager) == 0
+        assert manager.cursors == []
+    finally:
+        window.setAttribute(Qt.WA_DeleteOnClose)
+        window.close()
+        stream.active, sys.stdout, sys.stderr, sys.excepthook = saved
@@ -0,0 +1,74 @@
+from __future__ import absolute_import
+
+import pytest
+
+from preditor.utils.execution_history import (
+    ExecutionHistory,
+    code_hash,
+    percentile,
+    trend,
+)
+
+
+@pytest.fixture
+def history(tmpdir):
+    history = ExecutionHistory(str(tmpdir.join('history', 'runs.sqlite')), max_runs=20)
+    yield history
+    history.close()
+
+
+def test_execution_history(history):
+    for i in range(25):
+        history.record('group/a', 'x = {}'.format(i % 2), 0.1 * (i + 1), cpu=0.01)
+    history.record('console', 'print(1)', 2.0, timestamp=100.0)
+
+    assert history.sources() == ['console', 'group/a']
+    # Only the newest runs are kept
+    runs = history.runs('group/a')
+    assert len(runs) == 20
+    assert runs[0].wall == pytest.approx(0.6)
+    assert runs[-1].wall == pytest.approx(2.5)
+    assert [run.code_hash for run in runs[:2]] == [
+        code_hash('x = 1'),
+        code_hash('x = 0'),
+    ]
+    assert runs[-1].cpu == pytest.approx(0.01)
+    assert [run.wall for run in history.runs('group/a', limit=2)] == pytest.approx(
+        [2.4, 2.5]
+    )
+
+    console, workbox = history.stats()
+    assert console.runs == 1
+    assert console.p50 == console.p95 == console.max == 2.0
+    assert console.trend is None
+    assert console.last == 100.0
+    assert workbox.source == 'group/a'
+    assert workbox.p50 == pytest.approx(1.55)
+    assert workbox.max == pytest.approx(2.5)
+    assert workbox.trend > 0
+
+    # The history is stored on disk
+    history.close()
+    assert len(ExecutionHistory(history.filename).runs('console')) == 1
+
+    history.clear('console')
+    assert history.sources() == ['group/a']
+    history.clear()
+    assert history.stats() == []
+
+
+def test_percentile():
+    assert percentile([], 0.5) is None
+    assert percentile([3, 1, 2], 0.5) == 2
+    assert percentile([1, 2, 3, 4], 0.5) == 2.5
+    assert percentile(list(range(101)), 0.95) == 95
+    assert percentile([1, 2], 1.0) == 2
+
+
+def test_trend():
+    assert trend([1] * 9) is None
+    assert trend([1] * 10) == 0
+    assert trend([1] * 5 + [1.5] * 5) == pytest.approx(0.5)
+    assert trend([2] * 5 + [1] * 5) == pytest.approx(-0.5)
+    # Only the last window * 2 values are used
+    assert trend([100] + [1] * 10) == 0
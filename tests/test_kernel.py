@@ -0,0 +1,120 @@
+from __future__ import absolute_import
+
+import socket
+import threading
+import time
+
+import pytest
+
+from preditor.kernel import _TOKEN, Kernel
+from preditor.stream import STDERR, STDOUT, Manager
+from preditor.stream.capture import pack_message
+
+
+@pytest.fixture
+def kernel():
+    manager = Manager()
+    replies = []
+    replied = threading.Event()
+
+    def callback(reply):
+        replies.append(reply)
+        replied.set()
+
+    kernel = Kernel(manager=manager, callback=callback)
+
+    def run(code):
+        replied.clear()
+        kernel.execute(code)
+        assert replied.wait(30)
+        return replies[-1]
+
+    kernel.run = run
+    kernel.replied = replied
+    yield kernel
+    kernel.shutdown()
+
+
+def test_kernel_namespace(kernel):
+    reply = kernel.run('value = 21\nprint("written")')
+    assert not reply.error
+    assert not reply.was_eval
+    assert reply.result is None
+
+    # The namespace is kept between runs and results are returned as reprs
+    reply = kernel.run('"{}".format(value * 2)')
+    assert reply.was_eval
+    assert repr(reply.result) == "'42'"
+
+    reply = kernel.run('1 / 0')
+    assert reply.error
+
+    writes = [(msg, state.state) for msg, state in kernel.capture.manager]
+    assert ('written\n', STDOUT) in writes
+    assert any('ZeroDivisionError' in msg and state == STDERR for msg, state in writes)
+
+    # Restarting the kernel clears the namespace
+    kernel.restart()
+    assert repr(kernel.run('"value" in globals()').result) == 'False'
+
+
+def test_kernel_interrupt(kernel):
+    kernel.run('import time')
+    kernel.replied.clear()
+    kernel.execute('while True:\n    time.sleep(0.01)')
+    time.sleep(0.5)
+    assert kernel.busy
+    kernel.interrupt()
+    assert kernel.replied.wait(30)
+    assert not kernel.busy
+
+    # A crash is reported as a error and the kernel restarts when code is run
+    assert kernel.run('import os; os._exit(3)').error
+    assert not kernel.run('1').error
+
+
+def test_kernel_token():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(5)
+    address = server.getsockname()
+    token = b'0123456789abcdef'
+
+    # Connections that don't send the token first are closed
+    clients = [socket.create_connection(address) for _ in range(4)]
+    clients[0].sendall(pack_message(_TOKEN, b'fedcba9876543210'))
+    clients[1].sendall(pack_message(_TOKEN, token[:-1]))
+    clients[2].sendall(pack_message(STDOUT, token))
+    clients[3].close()
+    worker = socket.create_connection(address)
+    worker.sendall(pack_message(_TOKEN, token) + b'rest')
+    try:
+        sock, reader = Kernel._accept(server, token, timeout=10)
+        for client in clients[:3]:
+            client.settimeout(10)
+            assert client.recv(1) == b''
+        # The messages sent after the token are read from the returned file
+        assert reader.read(4) == b'rest'
+        reader.close()
+        sock.close()
+
+        # Nothing is returned if the worker doesn't connect in time
+        assert Kernel._accept(server, token, timeout=0.1) == (None, None)
+    finally:
+        for client in clients + [worker]:
+            client.close()
+        server.close()
+
+
+def test_kernel_process_name(kernel):
+    # Output written directly to the file descriptors is read from the worker's
+    # pipes, it uses the same name as the output sent over the socket.
+    kernel.run('import os; os.write(1, b"fd output\\n"); print("socket output")')
+    pid = kernel.process.pid
+    kernel.shutdown()
+    kernel.capture.join(5)
+    writes = [(msg, state) for msg, state in kernel.capture.manager]
+    assert kernel.name == 'kernel:{}'.format(pid)
+    assert any('fd output' in msg for msg, _ in writes)
+    assert any('socket output' in msg for msg, _ in writes)
+    assert {state.name for _, state in writes} == {kernel.name}
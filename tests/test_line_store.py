@@ -0,0 +1,49 @@
+from __future__ import absolute_import
+
+from preditor.utils.line_store import LineStore
+
+
+def test_line_store():
+    store = LineStore()
+    assert len(store) == 1
+    assert store.line(0) == ''
+    assert store.line_runs(0) == []
+
+    store.append('first line\nsec', 'a')
+    store.append('ond', 'a')
+    store.append(' line\n', 'b')
+    store.append('third', 'a')
+    assert len(store) == 3
+    assert [store.line(i) for i in range(3)] == ['first line', 'second line', 'third']
+    assert store.line(-1) == 'third'
+    assert store.text() == 'first line\nsecond line\nthird'
+    assert store.max_line_length == len('second line')
+    # Appends with the same format are merged into a single run
+    assert store.line_runs(1) == [('second', 'a'), (' line', 'b')]
+    assert store.line_runs(2) == [('third', 'a')]
+    assert store.line_at(0) == 0
+    assert store.line_at(11) == 1
+    assert store.line_at(store.length) == 2
+
+    # Text can span multiple pieces
+    store.piece_size = 4
+    store.append('\nfour', 'b')
+    store.append('th\nfifth', 'a')
+    assert len(store.pieces) == 3
+    assert store.line(3) == 'fourth'
+    assert store.line_runs(3) == [('four', 'b'), ('th', 'a')]
+    assert store.text(store.length - 12) == 'fourth\nfifth'
+
+    # Truncate removes the text after a position from every index
+    store.truncate(store.line_span(3)[0] + 4)
+    assert len(store) == 4
+    assert store.line(3) == 'four'
+    assert store.line_runs(3) == [('four', 'b')]
+    store.append('\nnew', 'c')
+    assert store.line_runs(4) == [('new', 'c')]
+    assert store.text().endswith('third\nfour\nnew')
+
+    store.clear()
+    assert len(store) == 1
+    assert store.length == 0
+    assert store.text() == ''
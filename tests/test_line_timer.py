@@ -0,0 +1,36 @@
+from __future__ import absolute_import
+
+import time
+
+from preditor.utils.line_timer import LineTimer, format_duration
+
+
+def test_line_timer():
+    code = compile(
+        'def wait():\n'
+        '    time.sleep(0.01)\n'
+        '\n'
+        'for i in range(3):\n'
+        '    wait()\n',
+        '<Workbox>:0,0',
+        'exec',
+    )
+    timer = LineTimer('<Workbox>:0,0')
+    timer.enable()
+    try:
+        exec(code, {'time': time})
+    finally:
+        timer.disable()
+
+    assert timer.hits == {1: 1, 2: 3, 4: 4, 5: 3}
+    # Calls are included in the time of the line that made them
+    assert timer.times[2] >= 0.03
+    assert timer.times[5] >= timer.times[2]
+    # Other code is not traced
+    assert all(line in timer.hits for line in timer.times)
+
+
+def test_format_duration():
+    assert format_duration(2.5) == '2.50 s'
+    assert format_duration(0.0125) == '12.50 ms'
+    assert format_duration(0.0000042) == '4 us'
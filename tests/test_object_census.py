@@ -0,0 +1,64 @@
+from __future__ import absolute_import
+
+import sys
+
+from preditor.utils.object_census import (
+    ObjectCensus,
+    find_instances,
+    referrer_chain,
+    type_name,
+)
+
+
+class Leaked(object):
+    pass
+
+
+leaked = {}
+
+
+def test_object_census():
+    before = ObjectCensus(chunk_size=1000).run()
+    assert not before.is_running()
+    assert before.progress == 1.0
+
+    leaked['items'] = [Leaked() for i in range(5)]
+    try:
+        after = ObjectCensus(chunk_size=1000)
+        after.start()
+        assert after.is_running()
+        steps = 1
+        while after.step():
+            steps += 1
+            assert 0 < after.progress < 1
+        assert steps == -(-after.total // 1000)
+
+        name = type_name(Leaked)
+        assert name == '{}.Leaked'.format(__name__)
+        grown = dict(
+            (name, (count, growth)) for name, count, growth in after.diff(before)
+        )
+        assert grown[name] == (5, 5)
+    finally:
+        del leaked['items']
+
+
+def test_referrer_chain():
+    leaked['items'] = [Leaked(), Leaked()]
+    try:
+        instances = find_instances(type_name(Leaked), limit=1)
+        assert len(instances) == 1
+        obj = instances.pop()
+        chain = referrer_chain(obj, ignore=(instances,))
+        index = leaked['items'].index(obj)
+        assert chain == (
+            "module {0} -> dict['leaked'] -> dict['items'] -> list[{1}] -> "
+            "{0}.Leaked".format(__name__, index)
+        )
+    finally:
+        del leaked['items']
+
+    # Objects only referred to by local variables have no chain
+    obj = Leaked()
+    assert referrer_chain(obj) is None
+    assert sys.getrefcount(obj) == 2
@@ -0,0 +1,118 @@
+from __future__ import absolute_import
+
+import os
+
+import pytest
+from Qt.QtWidgets import QApplication, QTextEdit
+
+from preditor.gui.python_highlighter import PythonHighlighter
+
+
+@pytest.fixture
+def editor():
+    global app
+    if not QApplication.instance():
+        # These tests require an initialized QApplication, keep a reference to it
+        # so it isn't garbage collected.
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        app = QApplication([])
+    editor = QTextEdit()
+    highlighter = PythonHighlighter(editor)
+    highlighter.setLanguage('Python')
+    editor.highlighter = highlighter
+    yield editor
+    editor.deleteLater()
+
+
+def highlighted(editor, line):
+    """Returns a (text, group) tuple for each highlighted part of a line."""
+    block = editor.document().findBlockByNumber(line)
+    groups = {
+        fmt.foreground().color().name(): group
+        for group, fmt in editor.highlighter.formats().items()
+    }
+    return [
+        (
+            block.text()[span.start : span.start + span.length],
+            groups[span.format.foreground().color().name()],
+        )
+        for span in block.layout().formats()
+    ]
+
+
+def block_states(editor):
+    document = editor.document()
+    return [
+        document.findBlockByNumber(i).userState() for i in range(document.blockCount())
+    ]
+
+
+def test_triple_quoted_strings(editor):
+    editor.setPlainText(
+        'x = """first\n'
+        'if in string\n'
+        'last""" if y else None\n'
+        "z = '''one line''' # comment\n"
+    )
+    assert highlighted(editor, 0) == [('"""first', 'string')]
+    # Keywords inside the string are not highlighted
+    assert highlighted(editor, 1) == [('if in string', 'string')]
+    assert highlighted(editor, 2) == [
+        ('last"""', 'string'),
+        ('if', 'keyword'),
+        ('else', 'keyword'),
+        ('None', 'keyword'),
+    ]
+    assert highlighted(editor, 3) == [
+        ("'''one line'''", 'string'),
+        ('# comment', 'comment'),
+    ]
+    # Only the lines that end inside the string store a state
+    assert block_states(editor) == [1, 1, -1, -1, -1]
+
+    # Closing the string on the first line re-highlights the following lines
+    cursor = editor.textCursor()
+    cursor.setPosition(len('x = """first'))
+    cursor.insertText('"""')
+    assert block_states(editor)[:3] == [-1, -1, 1]
+    assert highlighted(editor, 1) == [('if', 'keyword'), ('in', 'keyword')]
+    assert highlighted(editor, 2) == [('""" if y else None', 'string')]
+
+
+def test_escaped_quotes(editor):
+    editor.setPlainText(
+        'a = "say \\"hi\\" # not a comment" # comment\n'
+        "b = '''it\\'s \\''' still open\n"
+        "''' + 'continued \\\n"
+        "line' and c\n"
+    )
+    assert highlighted(editor, 0) == [
+        ('"say \\"hi\\" # not a comment"', 'string'),
+        ('# comment', 'comment'),
+    ]
+    # An escaped quote doesn't close a triple quoted string
+    assert highlighted(editor, 1) == [("'''it\\'s \\''' still open", 'string')]
+    # A single quoted string continued with a backslash
+    assert highlighted(editor, 2) == [("'''", 'string'), ("'continued \\", 'string')]
+    assert highlighted(editor, 3) == [("line'", 'string'), ('and', 'keyword')]
+    assert block_states(editor) == [-1, 0, 2, -1, -1]
+
+
+def test_comments_and_prefixes(editor):
+    editor.setPlainText(
+        "path = r'C:\\temp' # r'not a string'\n"
+        "s = f'{x} # {y}' + b\"#\" + 'unterminated\n"
+        'x = s\n'
+    )
+    assert highlighted(editor, 0) == [
+        ("r'C:\\temp'", 'string'),
+        ("# r'not a string'", 'comment'),
+    ]
+    assert highlighted(editor, 1) == [
+        ("f'{x} # {y}'", 'string'),
+        ('b"#"', 'string'),
+        ("'unterminated", 'string'),
+    ]
+    # An unterminated single quoted string doesn't continue onto the next line
+    assert highlighted(editor, 2) == []
+    assert block_states(editor) == [-1, -1, -1, -1]
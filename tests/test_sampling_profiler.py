@@ -0,0 +1,65 @@
+from __future__ import absolute_import
+
+import json
+import time
+
+from preditor.utils.sampling_profiler import SamplingProfiler
+
+
+def busy(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+def outer():
+    busy(0.2)
+    time.sleep(0.1)
+
+
+def run(profiler):
+    profiler.enable()
+    try:
+        outer()
+    finally:
+        profiler.disable()
+
+
+def test_sampling_profiler():
+    profiler = SamplingProfiler(interval=0.002)
+    run(profiler)
+    assert not profiler.is_running()
+    assert profiler.duration >= 0.3
+
+    # Only the frames called by the function that enabled it are recorded
+    root = profiler.root
+    assert root.count > 10
+    assert list(root.children) == [SamplingProfiler.frame_name(outer.__code__)]
+    node = root.children[SamplingProfiler.frame_name(outer.__code__)]
+    assert node.count == root.count
+    busy_node = node.children[SamplingProfiler.frame_name(busy.__code__)]
+    assert busy_node.self_count == busy_node.count
+    assert busy_node.count + node.self_count == node.count
+    # Samples are weighted by time so the busy loop holding the GIL isn't under
+    # represented compared to sleeping
+    assert busy_node.time > node.self_time
+    assert abs(node.time - profiler.duration) < 0.05
+
+    lines = profiler.collapsed().splitlines()
+    assert len(lines) == 2
+    counts = dict(line.rsplit(' ', 1) for line in lines)
+    assert int(counts[node.name]) == node.self_count
+    assert int(counts[node.name + ';' + busy_node.name]) == busy_node.count
+
+
+def test_sampling_profiler_speedscope():
+    profiler = SamplingProfiler(interval=0.002)
+    run(profiler)
+    data = json.loads(profiler.speedscope(name='test'))
+    frames = [frame['name'] for frame in data['shared']['frames']]
+    profile = data['profiles'][0]
+    assert profile['type'] == 'sampled'
+    assert len(profile['samples']) == len(profile['weights']) == 2
+    stacks = [[frames[i] for i in sample] for sample in profile['samples']]
+    assert [SamplingProfiler.frame_name(outer.__code__)] in stacks
+    assert abs(sum(profile['weights']) - profiler.root.time) < 1e-6
@@ -0,0 +1,42 @@
+from __future__ import absolute_import
+
+import threading
+import time
+
+from preditor.utils.script_thread import ScriptThread
+
+
+def test_script_thread_result():
+    namespace = {'value': 2}
+    finished = threading.Event()
+    thread = ScriptThread(
+        compile('value * 3', '<test>', 'eval'),
+        namespace,
+        was_eval=True,
+        callback=finished.set,
+    )
+    thread.start()
+    assert finished.wait(5)
+    assert thread.result == 6
+    assert thread.exc_info is None
+    assert thread.elapsed >= 0
+    # Once finished the thread can't be interrupted
+    assert not thread.interrupt()
+
+    thread = ScriptThread(compile('1 / 0', '<test>', 'exec'), {})
+    thread.start()
+    thread.join(5)
+    assert thread.exc_info[0] is ZeroDivisionError
+
+
+def test_script_thread_interrupt():
+    namespace = {'started': threading.Event()}
+    code = compile('started.set()\nwhile True:\n    pass', '<test>', 'exec')
+    thread = ScriptThread(code, namespace)
+    thread.start()
+    assert namespace['started'].wait(5)
+    time.sleep(0.01)
+    assert thread.interrupt()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert thread.exc_info[0] is KeyboardInterrupt
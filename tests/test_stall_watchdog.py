@@ -0,0 +1,48 @@
+from __future__ import absolute_import
+
+import time
+
+from preditor.utils.stall_watchdog import StallWatchdog
+
+
+def heartbeats(watchdog, seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        watchdog.heartbeat()
+        time.sleep(0.01)
+
+
+def blocking():
+    time.sleep(0.5)
+
+
+def test_stall_watchdog():
+    reports = []
+    watchdog = StallWatchdog(reports.append, threshold=0.2, interval=0.02)
+    watchdog.start()
+    try:
+        heartbeats(watchdog, 0.3)
+        blocking()
+        heartbeats(watchdog, 0.3)
+    finally:
+        watchdog.stop()
+    assert not watchdog.is_running()
+
+    # Only the stall is reported, not the regular heartbeats
+    assert len(reports) == 1
+    report = reports[0]
+    assert 0.45 < report.duration < 1.0
+    stack, count = report.stacks.most_common(1)[0]
+    assert count > 5
+    assert stack[-1][0] == __file__
+    assert stack[-1][2] == 'blocking'
+    assert stack[-2][2] == 'test_stall_watchdog'
+
+    text = report.format(depth=2)
+    lines = text.splitlines()
+    assert lines[0].startswith('UI blocked for 0.')
+    assert lines[0].endswith(' in blocking ({}:{})'.format(__file__, stack[-1][1]))
+    assert lines[2] == '    ...'
+    assert lines[4] == '    File "{}", line {}, in blocking'.format(
+        __file__, stack[-1][1]
+    )
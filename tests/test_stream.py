@@ -1,12 +1,32 @@
 from __future__ import absolute_import
 
+import collections
 import io
+import os
 import sys
+import threading
+import time
+from array import array
 
 import pytest
 import six
 
-from preditor.stream import STDOUT, STDERR, Director, Manager, install_to_std
+from preditor.stream import (
+    STDERR,
+    STDOUT,
+    AsyncWriter,
+    CompactManager,
+    Cursor,
+    Director,
+    FloodGuard,
+    Manager,
+    ProcessCapture,
+    ProcessState,
+    RecordStore,
+    SpillManager,
+    install_to_std,
+)
+from preditor.stream.manager import merge_writes
 
 
 @pytest.fixture
@@ -100,6 +120,142 @@ def test_nul_stream(manager):
     assert not wraperr_director.std_stream_wrapped
 
 
+def test_line_buffered(manager):
+    old_stream = six.StringIO()
+    director = Director(
+        manager,
+        STDOUT,
+        old_stream=old_stream,
+        line_buffered=True,
+        buffer_size=20,
+        flush_interval=60,
+    )
+    bound = Bound()
+    manager.add_callback(bound.write)
+
+    for char in u'abc':
+        director.write(char)
+    assert bound.data == []
+    assert old_stream.getvalue() == u''
+
+    # Only complete lines are delivered, the rest stays buffered
+    director.write(u'\ndef\nghi')
+    assert bound.data == [(u'abc\ndef\n', STDOUT)]
+    assert old_stream.getvalue() == u'abc\ndef\n'
+
+    # Reaching buffer_size delivers the partial line
+    director.write(u'j' * 20)
+    assert bound.data[-1] == (u'ghi' + u'j' * 20, STDOUT)
+
+    # flush delivers partial lines
+    director.write(u'klm')
+    director.flush()
+    assert bound.data[-1] == (u'klm', STDOUT)
+    assert old_stream.getvalue() == u'abc\ndef\nghi' + u'j' * 20 + u'klm'
+    assert len(bound.data) == 3
+
+    # Partial lines are delivered after flush_interval
+    director.flush_interval = 0.01
+    director.write(u'nop')
+    for _ in range(100):
+        if len(bound.data) == 4:
+            break
+        time.sleep(0.01)
+    assert bound.data[-1] == (u'nop', STDOUT)
+
+    # A single flusher thread is used no matter how many partial lines are written
+    threads = threading.active_count()
+    for i in range(100):
+        director.write(u'{}'.format(i))
+        director.write(u'\n')
+    assert threading.active_count() == threads
+    flusher = director._flusher
+    director.close()
+    flusher.join(1)
+    assert not flusher.is_alive()
+
+
+class SlowStream(six.StringIO):
+    """A stream that blocks writes until `release` is set."""
+
+    def __init__(self):
+        six.StringIO.__init__(self)
+        self.release = threading.Event()
+        self.writing = threading.Event()
+
+    def write(self, msg):
+        self.writing.set()
+        self.release.wait()
+        six.StringIO.write(self, msg)
+
+
+def test_async_writes(manager):
+    old_stream = SlowStream()
+    director = Director(manager, STDOUT, old_stream=old_stream, async_writes=True)
+    director.write(u'abc\n')
+    director.write(u'def\n')
+    # The slow stream doesn't block the writes
+    assert manager.get_value(u'{msg}') == u'abc\ndef\n'
+    assert old_stream.getvalue() == u''
+
+    old_stream.release.set()
+    director.flush()
+    assert old_stream.getvalue() == u'abc\ndef\n'
+
+    director.write(u'ghi\n')
+    director.close()
+    assert director.writer.closed
+    assert old_stream.closed
+
+
+@pytest.mark.parametrize(
+    'overflow,expected,dropped',
+    (
+        (AsyncWriter.BLOCK, u'abcde', 0),
+        (AsyncWriter.DROP_OLDEST, u'ade', 2),
+        (AsyncWriter.DROP, u'abc[2 writes were dropped]\n', 2),
+    ),
+)
+def test_async_writer_overflow(overflow, expected, dropped):
+    stream = SlowStream()
+    writer = AsyncWriter(stream, maxsize=2, overflow=overflow)
+    writer.write(u'a')
+    # Wait for the background thread to take "a" off the queue
+    assert stream.writing.wait(5)
+
+    if overflow == AsyncWriter.BLOCK:
+        # Blocks until the background thread makes room in the queue
+        thread = threading.Thread(target=lambda: [writer.write(c) for c in u'bcde'])
+        thread.start()
+        time.sleep(0.05)
+        assert thread.is_alive()
+        stream.release.set()
+        thread.join(5)
+    else:
+        for char in u'bcde':
+            writer.write(char)
+        stream.release.set()
+
+    # flush writes the notice of the dropped writes
+    writer.flush()
+    assert stream.getvalue() == expected
+    writer.close()
+    assert stream.getvalue() == expected
+    assert writer.dropped == dropped
+
+
+def test_async_writer_dropped_on_close():
+    stream = SlowStream()
+    writer = AsyncWriter(stream, maxsize=1, overflow=AsyncWriter.DROP)
+    writer.write(u'a')
+    assert stream.writing.wait(5)
+    for char in u'bcd':
+        writer.write(char)
+    stream.release.set()
+    writer.close()
+    assert stream.getvalue() == u'ab[2 writes were dropped]\n'
+
+
 def test_callback(manager, stdout, stderr):
     data = []
 
@@ -219,3 +375,602 @@ def test_install_to_std():
     assert inst_out
     assert inst_err
     assert isinstance(manager, Manager)
+
+
+def test_merge_writes():
+    writes = [('a', 1), ('b', 1), ('c', 2), ('d', 1), ('e', 1), ('f', 1)]
+    assert merge_writes(writes) == [('ab', 1), ('c', 2), ('def', 1)]
+    assert merge_writes([]) == []
+
+
+def test_dispatch_queued(manager, stdout, stderr):
+    """Writes from other threads are queued until dispatched on the gui thread."""
+    bound = Bound()
+    manager.add_callback(bound.write)
+    wakeups = []
+    manager.wakeup = lambda: wakeups.append(threading.current_thread())
+    manager.dispatch_thread = threading.current_thread()
+
+    def worker():
+        stdout.write(u'thread 1')
+        stdout.write(u'thread 2')
+        stderr.write(u'thread 3')
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+    # Nothing was delivered from the worker thread, but history was stored
+    assert bound.data == []
+    assert len(manager) == 3
+    # wakeup is only called when the queue changes from empty to not empty
+    assert wakeups == [thread]
+
+    # Writes from the dispatch thread deliver the queued writes first
+    stdout.write(u'main')
+    assert bound.data == [
+        ('thread 1thread 2', 'test_out'),
+        ('thread 3', 'test_err'),
+        ('main', 'test_out'),
+    ]
+    assert manager.dispatch_queued() == 0
+
+
+def test_dispatch_stopped(manager, stdout):
+    """Writes are delivered directly once the dispatch thread can't be woken."""
+    bound = Bound()
+    manager.add_callback(bound.write)
+    manager.wakeup = lambda: False
+    manager.dispatch_thread = threading.current_thread()
+
+    thread = threading.Thread(target=stdout.write, args=(u'thread',))
+    thread.start()
+    thread.join()
+    assert bound.data == [('thread', 'test_out')]
+    assert manager.dispatch_thread is None
+    assert manager.wakeup is None
+
+
+def test_dispatch_stopped_while_writing(manager):
+    """wakeup may be cleared by another thread as soon as write releases the lock."""
+    woken = []
+    lock = manager._lock
+
+    class ClearingLock(object):
+        def __enter__(self):
+            lock.acquire()
+
+        def __exit__(self, *args):
+            lock.release()
+            manager.wakeup = None
+
+    manager.wakeup = lambda: woken.append(True)
+    manager.dispatch_thread = threading.Thread()
+    manager._lock = ClearingLock()
+    try:
+        manager.write(u'queued', STDOUT)
+    finally:
+        manager._lock = lock
+    assert woken == [True]
+    assert manager.dispatch_queued() == 1
+
+
+def test_dispatch_queued_stress(manager):
+    """Write 1M lines from many threads and check they all arrive on the dispatch
+    thread exactly once and in order for each thread."""
+    thread_count = 16
+    line_count = 1000000 // thread_count
+    main_thread = threading.current_thread()
+    received = {}
+    wrong_thread = []
+
+    def callback(msg, state):
+        if threading.current_thread() is not main_thread:
+            wrong_thread.append(state)
+        received.setdefault(state, []).append(msg)
+
+    manager.store_writes = False
+    manager.dispatch_thread = main_thread
+    manager.add_callback(callback)
+
+    def worker(index):
+        for i in range(line_count):
+            manager.write(u'{}\n'.format(i), index)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    # Simulate the gui event loop draining the queue while the workers write
+    while any(thread.is_alive() for thread in threads):
+        manager.dispatch_queued()
+    for thread in threads:
+        thread.join()
+    manager.dispatch_queued()
+
+    assert not wrong_thread
+    assert sorted(received) == list(range(thread_count))
+    check = [u'{}'.format(i) for i in range(line_count)]
+    for index in range(thread_count):
+        assert ''.join(received[index]).splitlines() == check
+    # Writes were merged into blocks instead of calling the callback per write
+    assert sum(len(msgs) for msgs in received.values()) < thread_count * line_count
+
+
+def test_max_bytes():
+    manager = Manager(maxlen=None, max_bytes=20)
+    manager.write(u'a' * 5, STDOUT)
+    manager.write(u'b' * 5, STDOUT)
+    manager.write(u'c' * 5, STDERR)
+    # Consecutive writes with the same state are merged into one record
+    assert list(manager) == [(u'aaaaabbbbb', STDOUT), (u'ccccc', STDERR)]
+    assert manager.size == 15
+    assert manager.dropped_records == 0
+
+    # Exceeding max_bytes evicts whole records, oldest first
+    manager.write(u'd' * 10, STDOUT)
+    assert list(manager) == [(u'ccccc', STDERR), (u'd' * 10, STDOUT)]
+    assert manager.size == 15
+    assert manager.dropped_records == 1
+    assert manager.dropped_bytes == 10
+
+    # Replaying reports how much history was dropped before the history
+    bound = Bound()
+    manager.add_callback(bound.write, replay=True)
+    assert bound.data == [
+        (u'[10 bytes of older output were discarded]\n', STDERR),
+        (u'ccccc', STDERR),
+        (u'd' * 10, STDOUT),
+    ]
+
+    manager.clear()
+    assert manager.size == 0
+    assert manager.dropped_records == 0
+
+    # The size is measured in encoded bytes, not characters
+    manager.write(u'\xe9' * 5, STDOUT)
+    assert manager.size == 10
+    manager.write(u'\u2603' * 5, STDERR)
+    assert list(manager) == [(u'\u2603' * 5, STDERR)]
+    assert manager.size == 15
+    assert manager.dropped_bytes == 10
+
+
+def test_max_bytes_merge_limit():
+    manager = Manager(maxlen=None, max_bytes=100)
+    manager.merge_limit = 10
+    for _ in range(5):
+        manager.write(u'abcd', STDOUT)
+    assert list(manager) == [(u'abcdabcd', STDOUT)] * 2 + [(u'abcd', STDOUT)]
+
+
+def test_maxlen_dropped():
+    manager = Manager(maxlen=2)
+    for msg in (u'a', u'bb', u'ccc'):
+        manager.write(msg, STDOUT)
+    assert list(manager) == [(u'bb', STDOUT), (u'ccc', STDOUT)]
+    assert manager.size == 5
+    assert manager.dropped_records == 1
+    assert manager.dropped_bytes == 1
+
+
+def test_record_store():
+    store = RecordStore(timestamps=True)
+    store.append((u'abc', STDOUT))
+    store.append((u'd\u00e9f', STDERR))
+    store.append((u'', STDOUT))
+    store.append((u'ghi', STDOUT))
+    assert list(store) == [
+        (u'abc', STDOUT),
+        (u'd\u00e9f', STDERR),
+        (u'', STDOUT),
+        (u'ghi', STDOUT),
+    ]
+    assert store[1] == (u'd\u00e9f', STDERR)
+    assert store[-1] == (u'ghi', STDOUT)
+    assert store[1:3] == [(u'd\u00e9f', STDERR), (u'', STDOUT)]
+    with pytest.raises(IndexError):
+        store[4]
+
+    # Only the last record can be replaced, used when merging writes
+    store[-1] = (u'ghijk', STDOUT)
+    assert store[-1] == (u'ghijk', STDOUT)
+    with pytest.raises(IndexError):
+        store[0] = (u'x', STDOUT)
+
+    # Time range queries
+    store.times = array('d', [1.0, 2.0, 3.0, 4.0])
+    assert store.between(2.0, 3.0) == [(u'd\u00e9f', STDERR), (u'', STDOUT)]
+    assert store.between(3.5) == [(u'ghijk', STDOUT)]
+    assert store.between(end=1.5) == [(u'abc', STDOUT)]
+
+    assert store.popleft() == (u'abc', STDOUT)
+    assert len(store) == 3
+    assert store.time(0) == 2.0
+    assert store.between(end=2.0) == [(u'd\u00e9f', STDERR)]
+    store.compact()
+    assert list(store) == [(u'd\u00e9f', STDERR), (u'', STDOUT), (u'ghijk', STDOUT)]
+    assert list(store.times) == [2.0, 3.0, 4.0]
+
+    with pytest.raises(ValueError):
+        RecordStore().between()
+
+    # The state ids are widened as more unique states are added, for example
+    # the ProcessState of many captured processes.
+    store = RecordStore()
+    for i in range(70000):
+        store.append((u'', ProcessState('exe:{}'.format(i), STDOUT)))
+    assert store.states.typecode == 'L'
+    assert store[255][1].name == 'exe:255'
+    assert store[-1][1].name == 'exe:69999'
+
+
+def test_compact_manager():
+    # Matches the behavior of Manager
+    for kwargs in ({'maxlen': 2}, {'maxlen': None, 'max_bytes': 20}):
+        expected = Manager(**kwargs)
+        manager = CompactManager(**kwargs)
+        for i in range(3000):
+            msg = u'{}{}'.format(i, '\n' if i % 3 else '')
+            state = STDERR if i % 7 == 0 else STDOUT
+            expected.write(msg, state)
+            manager.write(msg, state)
+        assert list(manager) == list(expected)
+        assert manager.size == expected.size
+        assert manager.dropped_records == expected.dropped_records
+        assert manager.dropped_bytes == expected.dropped_bytes
+        assert manager.get_value() == expected.get_value()
+
+    manager = CompactManager(maxlen=None, timestamps=True)
+    start = time.time()
+    for i in range(10):
+        manager.write(u'line {}\n'.format(i), STDOUT)
+    assert manager[-2:] == [(u'line 8\n', STDOUT), (u'line 9\n', STDOUT)]
+    assert len(manager.between(start)) == 10
+    assert manager.between(time.time() + 1) == []
+
+    bound = Bound()
+    manager.add_callback(bound.write, replay=True, clear=True)
+    assert len(bound.data) == 10
+    assert list(manager) == []
+
+
+def test_compact_manager_clear():
+    """Cursors keep reading new writes after the manager is cleared."""
+    for manager in (Manager(maxlen=None), CompactManager(maxlen=None)):
+        cursor = manager.cursor()
+        manager.write(u'before\n', STDOUT)
+        manager.write(u'unread\n', STDERR)
+        assert cursor.read() == [(u'before\n', STDOUT), (u'unread\n', STDERR)]
+        manager.write(u'cleared\n', STDOUT)
+        manager.clear()
+        assert manager.first_index == 3
+        manager.write(u'after\n', STDOUT)
+        # The records removed by clear are counted as pending until read
+        assert cursor.pending()
+        assert cursor.read() == [(u'after\n', STDOUT)]
+        assert cursor.pending() == 0
+
+
+def test_compact_manager_deque():
+    """The deque methods use the records, not the empty inherited deque."""
+    manager = CompactManager(maxlen=3)
+    records = [(u'a', STDOUT), (u'b', STDERR), (u'c', STDOUT), (u'd', STDOUT)]
+    manager.extend(records)
+    assert list(manager) == records[1:]
+    assert list(reversed(manager)) == records[:0:-1]
+    assert records[2] in manager
+    assert records[0] not in manager
+    assert manager.index(records[3]) == 2
+    assert manager.count(records[2]) == 1
+    assert manager.copy() == collections.deque(records[1:])
+    assert manager == collections.deque(records[1:])
+
+    assert manager.pop() == records[3]
+    assert manager.popleft() == records[1]
+    manager += [records[3]]
+    del manager[-1]
+    assert list(manager) == [records[2]]
+    with pytest.raises(IndexError):
+        del manager[1]
+    for method, args in (
+        ('rotate', (1,)),
+        ('remove', (records[2],)),
+        ('insert', (0, records[0])),
+    ):
+        with pytest.raises(NotImplementedError):
+            getattr(manager, method)(*args)
+
+
+@pytest.mark.parametrize('cls', (Manager, CompactManager))
+def test_cursors(cls):
+    manager = cls(maxlen=None, max_bytes=100)
+    manager.write(u'abc', STDOUT)
+
+    first = manager.cursor()
+    assert isinstance(first, Cursor)
+    assert first.pending() == 1
+    assert first.read() == [(u'abc', STDOUT)]
+    assert first.read() == []
+    assert first.pending() == 0
+
+    # Writes merged into a record the cursor has already read are returned
+    manager.write(u'def', STDOUT)
+    assert list(manager) == [(u'abcdef', STDOUT)]
+    assert first.read() == [(u'def', STDOUT)]
+
+    # A cursor can join late and catch up, or only read new writes
+    late = manager.cursor()
+    new = manager.cursor(from_start=False)
+    manager.write(u'ghi', STDERR)
+    assert late.read() == [(u'abcdef', STDOUT), (u'ghi', STDERR)]
+    assert new.read() == [(u'ghi', STDERR)]
+    assert first.pending() == 1
+
+    # Records removed by max_bytes before a cursor read them are reported
+    manager.write(u'j' * 90, STDOUT)
+    assert first.read() == [(u'ghi', STDERR), (u'j' * 90, STDOUT)]
+    assert late.read() == [(u'j' * 90, STDOUT)]
+    manager.write(u'k' * 10, STDERR)
+    manager.write(u'l' * 95, STDOUT)
+    assert list(manager) == [(u'l' * 95, STDOUT)]
+    assert new.read() == [(u'l' * 95, STDOUT)]
+    assert new.missed_records == 2
+    assert first.read() == [(u'l' * 95, STDOUT)]
+    assert first.missed_records == 1
+
+    # Readers don't clear the history for others unless trim_consumed is enabled
+    assert manager.trim() == 0
+    assert len(manager) == 1
+    manager.trim_consumed = True
+    manager.write(u'm', STDERR)
+    first.read()
+    new.read()
+    assert len(manager) == 2
+    assert late.read() == [(u'l' * 95, STDOUT), (u'm', STDERR)]
+    assert list(manager) == []
+    manager.write(u'n', STDOUT)
+    for cursor in (first, late, new):
+        assert cursor.pending() == 1
+        assert cursor.read() == [(u'n', STDOUT)]
+
+    # Closed cursors no longer prevent trimming
+    first.close()
+    late.close()
+    new.close()
+    assert len(manager.cursors) == 0
+
+
+def test_retain_history(manager):
+    manager.write(u'abc', STDOUT)
+    bound = Bound()
+    manager.add_callback(bound.write, replay=True, disable_writes=True, clear=True)
+    manager.write(u'def', STDOUT)
+    # The console frees the history when it attaches
+    assert bound.data == [(u'abc', STDOUT), (u'def', STDOUT)]
+    assert list(manager) == []
+    assert manager.max_bytes is None
+
+    # Creating a cursor stores writes again with a bounded history
+    cursor = manager.cursor()
+    assert manager.retain_history
+    assert manager.max_bytes == Manager.history_max_bytes
+    manager.write(u'ghi', STDOUT)
+    assert cursor.read() == [(u'ghi', STDOUT)]
+
+    # Once the last cursor is closed writes are no longer stored, the history
+    # stored until then is kept
+    other = manager.cursor()
+    cursor.close()
+    assert manager.retain_history
+    other.close()
+    assert not manager.retain_history
+    assert not manager.store_writes
+    assert manager.max_bytes is None
+    manager.write(u'jkl', STDOUT)
+    assert list(manager) == [(u'ghi', STDOUT)]
+
+    # Setting retain_history keeps storing writes after cursors are closed
+    manager.cursor().close()
+    assert not manager.store_writes
+    manager.retain_history = True
+    cursor = manager.cursor()
+    cursor.close()
+    assert manager.retain_history
+    assert manager.store_writes
+    assert manager.max_bytes == Manager.history_max_bytes
+
+
+def test_flood_guard():
+    now = [0.0]
+    written = Bound()
+    suppressed = []
+    guard = FloodGuard(
+        written.write,
+        lambda lines, chars: suppressed.append((lines, chars)),
+        line_limit=10,
+        sample_interval=0.5,
+        window=1.0,
+        clock=lambda: now[0],
+    )
+
+    # Writes below the limit are passed through
+    for i in range(10):
+        guard.write(u'line {}\n'.format(i), STDOUT)
+    assert len(written.data) == 10
+    assert not guard.flooding
+
+    # Exceeding the limit starts suppressing writes
+    guard.write(u'line 10\n', STDOUT)
+    assert guard.flooding
+    for i in range(11, 100):
+        guard.write(u'line {}\n'.format(i), STDOUT)
+    assert len(written.data) == 11
+    assert suppressed == []
+
+    # A sample is shown every sample_interval, after reporting the suppressed text
+    now[0] = 0.6
+    guard.write(u'line 100\nline 101\n', STDERR)
+    assert suppressed == [(90, 89 * 8 + 9)]
+    assert written.data[-1] == (u'line 101\n', STDERR)
+
+    # Partial lines are never used as a sample
+    now[0] = 1.2
+    guard.write(u'partial', STDOUT)
+    assert len(written.data) == 12
+    assert guard.flooding
+
+    # The flood ends when a window has fewer lines than line_limit
+    now[0] = 2.3
+    assert not guard.poll()
+    assert suppressed[-1] == (0, 7)
+    guard.write(u'line 102\n', STDOUT)
+    assert written.data[-1] == (u'line 102\n', STDOUT)
+
+    # A line_limit of zero disables flood protection
+    guard.line_limit = 0
+    for _ in range(100):
+        guard.write(u'line\n', STDOUT)
+    assert len(written.data) == 113
+
+
+def test_flood_guard_print():
+    """print writes the text and the newline separately, samples are built from
+    both writes."""
+    now = [0.0]
+    written = Bound()
+    suppressed = []
+    guard = FloodGuard(
+        written.write,
+        lambda lines, chars: suppressed.append((lines, chars)),
+        line_limit=10,
+        clock=lambda: now[0],
+    )
+    for i in range(100):
+        guard.write(u'line {}'.format(i), STDOUT)
+        guard.write(u'\n', STDOUT)
+    assert guard.flooding
+    assert len(written.data) == 22
+
+    now[0] = 0.6
+    guard.write(u'line 100', STDOUT)
+    guard.write(u'\n', STDOUT)
+    assert written.data[-1] == (u'line 100\n', STDOUT)
+    # Lines 11 to 99 were suppressed
+    assert suppressed == [(89, 89 * 8)]
+
+    # Suppressed partial writes are used in the next sample
+    now[0] = 1.2
+    guard.write(u'line', STDOUT)
+    guard.write(u' 101', STDOUT)
+    guard.write(u'\nline 102', STDOUT)
+    assert written.data[-1] == (u'line 101\n', STDOUT)
+
+
+def _captured_target(count):
+    for i in range(count):
+        print('line {}'.format(i))
+    sys.stderr.write(u'done\n')
+
+
+def test_process_capture():
+    manager = Manager(maxlen=None)
+    capture = ProcessCapture(manager)
+
+    code = 'import sys\nfor i in range(1000): print(i)\nsys.stderr.write("err")'
+    proc = capture.popen([sys.executable, '-c', code], name='child')
+    proc.wait()
+    capture.join(5)
+    out = ProcessState('child', STDOUT)
+    err = ProcessState('child', STDERR)
+    assert merge_writes(sorted(manager, key=lambda r: r[1] != out)) == [
+        (u''.join(u'{}\n'.format(i) for i in range(1000)), out),
+        (u'err', err),
+    ]
+
+    manager.clear()
+    proc = capture.process(_captured_target, args=(100,), name='worker')
+    proc.start()
+    proc.join(10)
+    assert proc.exitcode == 0
+    # Wait for the connection from the process to be accepted and read
+    for _ in range(100):
+        capture.join(5)
+        if manager and manager[-1][0].endswith(u'done\n'):
+            break
+        time.sleep(0.05)
+    out = ProcessState('worker', STDOUT)
+    assert merge_writes(manager) == [
+        (u''.join(u'line {}\n'.format(i) for i in range(100)), out),
+        (u'done\n', ProcessState('worker', STDERR)),
+    ]
+    capture.close()
+    assert capture.address is None
+
+
+def test_spill_manager(tmpdir):
+    manager = SpillManager(
+        max_bytes=10, path=str(tmpdir), segment_size=32, max_age=None
+    )
+    # The console doesn't clear the history of a SpillManager
+    assert manager.retain_history
+    writes = []
+    for i in range(20):
+        state = STDERR if i % 3 else STDOUT
+        msg = u'line {}\n'.format(i)
+        writes.append((msg, state))
+        manager.write(msg, state)
+
+    # Only a small tail is kept in memory, the rest was spilled to disk and the
+    # segments were rotated as they filled up.
+    assert manager.size <= 10
+    assert len(manager.segments) > 1
+    assert len(tmpdir.listdir()) == len(manager.segments)
+    assert manager.dropped_records == 0
+
+    # Iterating streams the full history from disk and memory
+    assert ''.join(msg for msg, _ in manager) == ''.join(msg for msg, _ in writes)
+    assert merge_writes(manager) == merge_writes(writes)
+    assert list(manager.search(r'line 1\d')) == [
+        (u'line {}'.format(i), STDOUT if i % 3 == 0 else STDERR) for i in range(10, 20)
+    ]
+
+    # Records larger than segment_size get their own segment
+    manager.write(u'x' * 100, STDOUT)
+    manager.write(u'y', STDOUT)
+    assert list(manager)[-2:] == [(u'x' * 100, STDOUT), (u'y', STDOUT)]
+
+    # The spill files are removed when cleared
+    manager.clear()
+    assert list(manager) == []
+    assert tmpdir.listdir() == []
+
+
+def test_spill_manager_expire(tmpdir):
+    # Create a stale segment from a "previous session"
+    stale = tmpdir.join('history_1_1_0000.bin')
+    stale.write('old')
+    old = time.time() - 1000
+    os.utime(str(stale), (old, old))
+
+    manager = SpillManager(max_bytes=1, path=str(tmpdir), segment_size=8, max_age=100)
+    assert not stale.exists()
+
+    for i in range(4):
+        manager.write(u'{:07}\n'.format(i), STDOUT)
+    # Each record is larger than max_bytes so they are all spilled and each
+    # segment only has room for a single record
+    assert manager.size == 0
+    assert len(manager.segments) == 4
+
+    # Pretend the first segment was last written long ago
+    manager.segments[0].modified = old
+    manager.expire()
+    assert len(manager.segments) == 3
+    assert manager.dropped_records == 1
+    assert manager.dropped_bytes == 8
+
+    bound = Bound()
+    manager.add_callback(bound.write, replay=True)
+    assert bound.data[0] == (u'[8 bytes of older output were discarded]\n', STDERR)
+    assert ''.join(msg for msg, _ in bound.data[1:]) == u'0000001\n0000002\n0000003\n'
+    manager.clear()
@@ -0,0 +1,77 @@
+from __future__ import absolute_import
+
+from preditor.utils.traceback_links import Link, TracebackLinks
+
+
+def test_traceback_links():
+    links = TracebackLinks()
+    text = (
+        'Traceback (most recent call last):\n'
+        '  File "/path/to/module.py", line 12, in name\n'
+        '    raise ValueError()\n'
+        'ValueError\n'
+    )
+    start = text.index('/path')
+    assert links.feed(text) == [
+        Link(start, start + len('/path/to/module.py'), '/path/to/module.py', '12')
+    ]
+    assert links.partial == ''
+
+    # SyntaxError's don't include the name
+    text = '  File "<Workbox>:0,1", line 3\n    x = (\n        ^\nSyntaxError\n'
+    assert links.feed(text) == [Link(8, 21, '<Workbox>:0,1', '3')]
+
+    # Exception groups are indented and pytest output uses a different format
+    text = '  |   File "a.py", line 1, in f\ntests/test_a.py:20: AssertionError\n'
+    assert links.feed(text) == [
+        Link(12, 16, 'a.py', '1'),
+        Link(32, 47, 'tests/test_a.py', '20'),
+    ]
+
+    # Rows of pstats tables, builtins are not linked
+    text = (
+        '   ncalls  tottime  percall  cumtime  percall filename:lineno(function)\n'
+        '      3/1    0.000    0.000    0.500    0.500 <Workbox>:0,0:4(slow)\n'
+        '        1    0.500    0.500    0.500    0.500 ~:0(<built-in sleep>)\n'
+    )
+    start = text.index('<Workbox>')
+    assert links.feed(text) == [Link(start, start + 13, '<Workbox>:0,0', '4')]
+
+    # Filenames may contain spaces in every format
+    path = r'C:\Program Files\My App\module.py'
+    text = (
+        '  File "{0}", line 5, in name\n'
+        '{0}:6: AssertionError\n'
+        '        1    0.000    0.000    0.500    0.500 {0}:7(name)\n'
+    ).format(path)
+    first = text.index(path)
+    second = text.index(path, first + 1)
+    third = text.index(path, second + 1)
+    assert links.feed(text) == [
+        Link(first, first + len(path), path, '5'),
+        Link(second, second + len(path), path, '6'),
+        Link(third, third + len(path), path, '7'),
+    ]
+
+    # Other text is not linked
+    assert links.feed('File "a.py" line 1\nsee a.py:20 for details\n') == []
+
+
+def test_traceback_links_partial():
+    links = TracebackLinks()
+    assert links.feed('output\n  Fi') == []
+    assert links.partial == '  Fi'
+    assert links.feed('le "a.py", li') == []
+    # Links in lines started by previous writes have a negative start
+    assert links.feed('ne 4\nnext') == [Link(-9, -5, 'a.py', '4')]
+    assert links.partial == 'next'
+    links.reset()
+    assert links.partial == ''
+
+    # Lines longer than max_partial are not searched
+    links = TracebackLinks(max_partial=10)
+    assert links.feed('  File "long_name.py"') == []
+    assert links.partial == ''
+    assert links.feed(', line 1\n  File "a.py", line 2\n') == [
+        Link(17, 21, 'a.py', '2')
+    ]